@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("voice_agent.audio_ingest")
+
+
+class IngestStats:
+    """Totals across sessions for the microphone audio path (server and client side)"""
+
+    def __init__(self):
+        self.frames = 0
+        self.sends = 0
+        self.bytes = 0
+        self.hold_ms_total = 0.0
+        self.hold_ms_max = 0.0
+        self.backpressure_waits = 0
+        self.client_reports = 0
+        self.client_frame_ms = None
+        self.client_handoff_ms_total = 0.0
+        self.client_handoff_ms_max = 0.0
+
+    def record_client(self, report: dict):
+        self.client_reports += 1
+        self.client_frame_ms = float(report["frame_ms"])
+        self.client_handoff_ms_total += float(report["handoff_ms_avg"])
+        self.client_handoff_ms_max = max(self.client_handoff_ms_max, float(report["handoff_ms_max"]))
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "sends": self.sends,
+            "frames_per_send": round(self.frames / self.sends, 2) if self.sends else 0.0,
+            "bytes": self.bytes,
+            "hold_ms_avg": round(self.hold_ms_total / self.sends, 2) if self.sends else 0.0,
+            "hold_ms_max": round(self.hold_ms_max, 2),
+            "backpressure_waits": self.backpressure_waits,
+            "client_reports": self.client_reports,
+            "client_frame_ms": self.client_frame_ms,
+            "client_handoff_ms_avg": round(self.client_handoff_ms_total / self.client_reports, 2) if self.client_reports else None,
+            "client_handoff_ms_max": round(self.client_handoff_ms_max, 2),
+        }
+
+
+class PcmCoalescer:
+    """Batches small 16-bit PCM frames from the browser into upstream-sized chunks.
+
+    The browser sends 20-50 ms frames; AssemblyAI wants chunks of 50-1000 ms,
+    and one ``send`` per tiny frame is wasted work. Frames are appended to a
+    buffer that a sender task drains whenever it holds at least ``min_ms`` of
+    audio, up to ``max_ms`` per send, so while a send is in flight the next
+    chunk simply grows. If upstream falls behind by more than
+    ``max_buffered_ms``, ``push`` waits, which stops reading from the client
+    socket and lets TCP push back on the browser instead of buffering without
+    bound.
+    """
+
+    def __init__(self, send, sample_rate: int = 16000, min_ms: int = 50, max_ms: int = 1000,
+                 max_buffered_ms: int = 2000, stats: IngestStats = None):
+        bytes_per_ms = sample_rate * 2 // 1000
+        self.send = send
+        self.min_bytes = min_ms * bytes_per_ms
+        self.max_bytes = max_ms * bytes_per_ms
+        self.max_buffered = max_buffered_ms * bytes_per_ms
+        self.stats = stats or IngestStats()
+        self.pending = bytearray()
+        self.first_at = None
+        self.error = None
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.closing = False
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def push(self, frame: bytes):
+        if self.error is not None:
+            raise self.error
+        if len(self.pending) >= self.max_buffered:
+            self.stats.backpressure_waits += 1
+            self.space.clear()
+            await self.space.wait()
+            if self.error is not None:
+                raise self.error
+        if not self.pending:
+            self.first_at = time.perf_counter()
+        self.pending += frame
+        self.stats.frames += 1
+        if len(self.pending) >= self.min_bytes:
+            self.ready.set()
+
+    async def _run(self):
+        while True:
+            await self.ready.wait()
+            if not self.pending:
+                if self.closing:
+                    return
+                self.ready.clear()
+                continue
+            # Whole samples only, and never more than max_ms in one send
+            size = min(len(self.pending), self.max_bytes) & ~1
+            if not size:
+                # A lone trailing byte at close: half a sample, nothing to send
+                self.pending.clear()
+                continue
+            chunk = bytes(self.pending[:size])
+            del self.pending[:size]
+            hold_ms = (time.perf_counter() - self.first_at) * 1000
+            self.stats.sends += 1
+            self.stats.bytes += size
+            self.stats.hold_ms_total += hold_ms
+            self.stats.hold_ms_max = max(self.stats.hold_ms_max, hold_ms)
+            self.first_at = time.perf_counter() if self.pending else None
+            if len(self.pending) < self.min_bytes and not self.closing:
+                self.ready.clear()
+            if len(self.pending) < self.max_buffered:
+                self.space.set()
+            try:
+                await self.send(chunk)
+            except Exception as e:
+                # Upstream is gone: fail the next push instead of buffering forever
+                self.error = e
+                self.space.set()
+                raise
+
+    async def close(self, flush: bool = True):
+        """Send what is left (possibly under min_ms) and stop the sender task"""
+        if self.task is None:
+            return
+        if not flush:
+            self.pending.clear()
+        self.closing = True
+        self.ready.set()
+        self.space.set()
+        try:
+            await self.task
+        except Exception as e:
+            logger.error(f"❌ [Audio Ingest] Sender stopped with error: {e}")
+        self.task = None
@@ -0,0 +1,353 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+
+from python_multipart import MultipartParser
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import parse_options_header
+
+from blocking_pool import PoolSaturated
+
+
+class UploadRejected(Exception):
+    """Raised by spool_multipart for a body that isn't a usable batch upload"""
+
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+
+
+class BatchItem:
+    """One uploaded file of a batch, spooled to ``path``"""
+
+    __slots__ = ("index", "filename", "path", "size")
+
+    def __init__(self, index: int, filename: str, path: str):
+        self.index = index
+        self.filename = filename
+        self.path = path
+        self.size = 0
+
+
+async def spool_multipart(chunks, content_type: str, directory: str, max_files: int, max_bytes: int) -> list:
+    """Write each file part of a multipart/form-data body to its own file in ``directory`` as it arrives.
+
+    Only the chunk being parsed is held in memory, whatever the size or number
+    of files; parts without a filename (plain form fields) are skipped rather
+    than buffered. Returns the BatchItems in upload order.
+    """
+    kind, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if kind != b"multipart/form-data" or not boundary:
+        raise UploadRejected("expected a multipart/form-data upload")
+
+    items = []
+    headers = {}
+    header = [b"", b""]
+    current = None
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header[0] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header[1] += data[start:end]
+
+    def on_header_end():
+        headers[header[0].lower()] = header[1]
+        header[0] = header[1] = b""
+
+    def on_headers_finished():
+        nonlocal current
+        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+        filename = disposition.get(b"filename")
+        if filename is None:
+            return
+        if len(items) >= max_files:
+            raise UploadTooLarge(f"more than {max_files} files in one batch")
+        item = BatchItem(len(items), filename.decode("utf-8", "replace"), os.path.join(directory, f"{len(items):06d}.audio"))
+        items.append(item)
+        current = open(item.path, "wb")
+
+    def on_part_data(data, start, end):
+        if current is not None:
+            current.write(data[start:end])
+            items[-1].size += end - start
+
+    def on_part_end():
+        nonlocal current
+        if current is not None:
+            current.close()
+            current = None
+
+    parser = MultipartParser(boundary, callbacks={
+        "on_part_begin": on_part_begin, "on_part_data": on_part_data, "on_part_end": on_part_end,
+        "on_header_field": on_header_field, "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+    received = 0
+    try:
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise UploadTooLarge(f"upload is larger than {max_bytes} bytes")
+            # Writes go to the page cache a request chunk (~64 KB) at a time, which is cheaper than a thread hop
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError as e:
+        raise UploadRejected(f"malformed multipart body: {e}")
+    finally:
+        if current is not None:
+            current.close()
+    return items
+
+
+class UpstreamLimit:
+    """At most ``limit`` batch calls to one upstream at a time"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.active = 0
+        self.waiting = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def __aenter__(self):
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.calls += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "peak": self.peak, "calls": self.calls}
+
+
+class BatchJob:
+    """A batch of spooled files and its results, appended to ``results.ndjson`` as each file finishes"""
+
+    def __init__(self, job_id: str, directory: str, options: dict):
+        self.id = job_id
+        self.directory = directory
+        self.options = options
+        self.items = []
+        self.status = "receiving"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.completed = 0
+        self.failed = 0
+        self.results_path = os.path.join(directory, "results.ndjson")
+        self.results = open(self.results_path, "ab")
+        self.changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "cancelled")
+
+    def _notify(self):
+        # Wake everyone following the results; later waiters get a fresh event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def _finish(self, status: str):
+        self.status = status
+        self.finished = time.monotonic()
+        self.results.close()
+        self._notify()
+
+    def record(self, result: dict):
+        if self.done:
+            return
+        if result.get("ok"):
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.results.write(json.dumps(result, ensure_ascii=False).encode() + b"\n")
+        self.results.flush()
+        if self.completed + self.failed == len(self.items):
+            self._finish("done")
+        else:
+            self._notify()
+
+    def cancel(self):
+        if not self.done:
+            self._finish("cancelled")
+
+    async def follow(self):
+        """The NDJSON result lines written so far, then each new one, until the job is done"""
+        with open(self.results_path, "rb") as f:
+            while True:
+                changed, done = self.changed, self.done
+                line = f.readline()
+                while line:
+                    yield line
+                    line = f.readline()
+                if done:
+                    return
+                await changed.wait()
+
+    def stats(self) -> dict:
+        elapsed = ((self.finished or time.monotonic()) - self.started) if self.started else 0.0
+        processed = self.completed + self.failed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files": len(self.items),
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending": len(self.items) - processed if not self.done else 0,
+            "bytes": sum(item.size for item in self.items),
+            "created_at": self.created,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(processed / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class BatchRunner:
+    """Async worker pool that works through the files of batch jobs.
+
+    ``workers`` tasks take files from one queue shared by every job, so no
+    more than that many files are in flight however many jobs are queued,
+    and run ``await process(job, item)`` on each, which returns the file's
+    result dict. ``process`` holds ``runner.limits[upstream]`` around its
+    calls to each upstream, so every upstream has its own concurrency bound
+    and a slow one doesn't take every worker's slot for the others. A file's
+    spooled audio is deleted once it is processed; results live on disk, so
+    memory doesn't grow with the size of a batch. At most ``max_active_jobs``
+    jobs are queued or running at once, and finished jobs are kept for
+    ``job_ttl`` seconds for their status and results to be fetched.
+    """
+
+    def __init__(self, process, workers: int = 32, limits: dict = None, spool_dir: str = None,
+                 max_active_jobs: int = 4, job_ttl: float = 3600.0):
+        self.process = process
+        self.workers = workers
+        self.limits = {name: UpstreamLimit(limit) for name, limit in (limits or {}).items()}
+        self.spool_dir = spool_dir
+        self.max_active_jobs = max_active_jobs
+        self.job_ttl = job_ttl
+        self.jobs = OrderedDict()
+        self.queue = asyncio.Queue()
+        self.tasks = []
+        self.busy = 0
+        self.files_completed = 0
+        self.files_failed = 0
+        self.rejected = 0
+
+    def create_job(self, options: dict = None) -> BatchJob:
+        """A new job with an empty spool directory; raises PoolSaturated when too many jobs are active"""
+        self.prune()
+        active = sum(1 for job in self.jobs.values() if not job.done)
+        if active >= self.max_active_jobs:
+            self.rejected += 1
+            raise PoolSaturated(f"{active} batch jobs are already running", self.retry_after())
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex[:16]
+        job = BatchJob(job_id, tempfile.mkdtemp(prefix=f"batch-{job_id}-", dir=self.spool_dir), options or {})
+        self.jobs[job_id] = job
+        return job
+
+    def retry_after(self) -> int:
+        rates = [job.stats() for job in self.jobs.values() if not job.done and job.started]
+        eta = [s["pending"] / s["files_per_s"] for s in rates if s["files_per_s"]]
+        return max(1, int(min(eta))) if eta else 60
+
+    def submit(self, job: BatchJob, items: list):
+        job.items = items
+        job.status = "queued"
+        for item in items:
+            self.queue.put_nowait((job, item))
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def get(self, job_id: str):
+        self.prune()
+        return self.jobs.get(job_id)
+
+    def discard(self, job_id: str) -> bool:
+        """Cancel a job (its queued files are skipped) and delete its spool directory and results"""
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        job.cancel()
+        shutil.rmtree(job.directory, ignore_errors=True)
+        return True
+
+    def prune(self):
+        now = time.monotonic()
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and now - job.finished > self.job_ttl]:
+            self.discard(job_id)
+
+    async def _work(self):
+        while True:
+            job, item = await self.queue.get()
+            try:
+                if job.done:
+                    continue
+                if job.started is None:
+                    job.started = time.monotonic()
+                    job.status = "running"
+                self.busy += 1
+                started = time.perf_counter()
+                try:
+                    result = {"index": item.index, "filename": item.filename, "ok": True, **await self.process(job, item)}
+                    self.files_completed += 1
+                except Exception as e:
+                    if job.done:
+                        # Deleted while in flight (its spooled file may be gone already): not a failure
+                        continue
+                    result = {"index": item.index, "filename": item.filename, "ok": False, "error": str(e)}
+                    self.files_failed += 1
+                finally:
+                    self.busy -= 1
+                result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+                job.record(result)
+            finally:
+                self.queue.task_done()
+                try:
+                    os.remove(item.path)
+                except OSError:
+                    pass
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for job_id in list(self.jobs):
+            self.discard(job_id)
+
+    def stats(self) -> dict:
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "queued_files": self.queue.qsize(),
+            "jobs": statuses,
+            "files_completed": self.files_completed,
+            "files_failed": self.files_failed,
+            "rejected_jobs": self.rejected,
+            "upstreams": {name: limit.stats() for name, limit in self.limits.items()},
+        }
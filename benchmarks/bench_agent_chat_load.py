@@ -0,0 +1,135 @@
+"""WebSocket latency while /agent/chat requests are in flight: blocking SDK calls inline vs the SDK pool.
+
+Serves the app with uvicorn on 127.0.0.1 with the AssemblyAI, Gemini and Murf
+SDK clients replaced by fakes that block like network calls. A WebSocket
+client pings an echo route every few milliseconds while a burst of REST
+requests runs, and a ticker measures event-loop lag. A second phase fills
+the pool past its queue depth to show the 503/429 admission responses.
+
+    python benchmarks/bench_agent_chat_load.py --requests 8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import WebSocket, WebSocketDisconnect
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from blocking_pool import BlockingCallPool  # noqa: E402
+from mock_servers import install_fake_sdks  # noqa: E402
+
+
+# Stand-in for a live voice session: anything that needs the event loop to answer
+@main.app.websocket("/bench/echo")
+async def echo(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        while True:
+            await websocket.send_text(await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+
+
+# The pre-pool behaviour: SDK calls run on the event loop thread, no admission limit
+class InlinePool(BlockingCallPool):
+    async def run(self, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+async def ping_loop(url, stop, samples, interval=0.01):
+    async with websockets.connect(url) as ws:
+        while not stop.is_set():
+            started = time.perf_counter()
+            await ws.send("ping")
+            await ws.recv()
+            samples.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(interval)
+
+
+async def lag_loop(stop, samples, interval=0.01):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def post_chat(client, base, session_id):
+    started = time.perf_counter()
+    response = await client.post(f"{base}/agent/chat/{session_id}", files={"file": ("a.wav", b"\0" * 32000)})
+    return response.status_code, response.headers.get("retry-after"), time.perf_counter() - started
+
+
+async def burst(base, ws_url, session_ids):
+    stop = asyncio.Event()
+    pings, lags = [], []
+    background = [asyncio.create_task(ping_loop(ws_url, stop, pings)), asyncio.create_task(lag_loop(stop, lags))]
+    await asyncio.sleep(0.2)
+    async with httpx.AsyncClient(timeout=60) as client:
+        results = await asyncio.gather(*(post_chat(client, base, sid) for sid in session_ids))
+    stop.set()
+    await asyncio.gather(*background)
+    return pings, lags, results
+
+
+def pct(samples, q):
+    # Nearest rank: the inline run has only a handful of (very slow) pings
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, len(ordered) * q // 100)]
+
+
+async def bench(requests, workers, queue_depth):
+    install_fake_sdks(main)
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    base, ws_url = f"http://127.0.0.1:{port}", f"ws://127.0.0.1:{port}/bench/echo"
+
+    print(f"{requests} concurrent /agent/chat requests (fake SDKs: transcribe 1.0 s, LLM 0.8 s, TTS 0.3 s/chunk)\n")
+    print(f"{'SDK calls':<12}{'ws p50 ms':>11}{'ws p99 ms':>11}{'ws max ms':>11}{'loop lag max':>14}{'REST wall s':>13}")
+    for label, pool in (("inline", InlinePool(max_workers=requests, queue_depth=0)),
+                        ("pool", BlockingCallPool(max_workers=workers, queue_depth=max(queue_depth, requests)))):
+        main.sdk_pool = pool
+        started = time.perf_counter()
+        pings, lags, results = await burst(base, ws_url, [f"s{i}" for i in range(requests)])
+        wall = time.perf_counter() - started
+        assert all(status == 200 for status, _, _ in results), results
+        print(f"{label:<12}{statistics.median(pings):>11.1f}{pct(pings, 99):>11.1f}{max(pings):>11.1f}"
+              f"{max(lags):>12.1f}ms{wall:>13.2f}")
+        pool.shutdown()
+
+    # Admission control: more requests than workers + queue, plus a second request on a busy session
+    pool = main.sdk_pool = BlockingCallPool(max_workers=workers, queue_depth=queue_depth)
+    overload = workers + queue_depth + 4
+    session_ids = [f"o{i}" for i in range(overload)] + ["o0"]
+    _, _, results = await burst(base, ws_url, session_ids)
+    statuses = Counter(status for status, _, _ in results)
+    retry_afters = sorted({int(r) for status, r, _ in results if r})
+    print(f"\nadmission ({workers} workers, queue depth {queue_depth}, {len(session_ids)} requests): "
+          f"{dict(sorted(statuses.items()))}, Retry-After {retry_afters} s")
+    print(f"pool stats: {pool.stats()}")
+    pool.shutdown()
+
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-depth", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.workers, args.queue_depth))
@@ -0,0 +1,97 @@
+"""Microphone audio to AssemblyAI: one upstream send per browser frame vs the PcmCoalescer.
+
+A simulated browser produces 20 ms frames of 16 kHz PCM in real time; each
+frame starts with its creation timestamp so the mock AssemblyAI server can
+work out per-frame latency even after frames were merged. Reported: upstream
+messages, messages shorter than AssemblyAI's 50 ms minimum, and frame
+latency from capture to arrival upstream. A final run with an upstream link
+slower than real time shows the coalescer's bounded buffer pushing back on
+the sender instead of growing.
+
+    python benchmarks/bench_audio_ingest.py --seconds 5 --frame-ms 20
+"""
+import argparse
+import asyncio
+import os
+import struct
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from audio_ingest import IngestStats, PcmCoalescer  # noqa: E402
+from mock_servers import MockAssemblyAIServer  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+STAMP = struct.Struct("<d")
+
+
+def make_frame(frame_bytes):
+    return STAMP.pack(time.perf_counter()) + b"\0" * (frame_bytes - STAMP.size)
+
+
+def frame_latencies(received, frame_bytes):
+    latencies = []
+    for arrived, message in received:
+        for offset in range(0, len(message) - STAMP.size + 1, frame_bytes):
+            latencies.append((arrived - STAMP.unpack_from(message, offset)[0]) * 1000)
+    return sorted(latencies)
+
+
+async def run(mode, seconds, frame_ms, upstream_speed=None, max_buffered_ms=2000):
+    frame_bytes = SAMPLE_RATE * 2 * frame_ms // 1000
+    stats = IngestStats()
+    async with MockAssemblyAIServer() as aai:
+        async with websockets.connect(aai.url) as ws:
+            send = ws.send
+            if upstream_speed:
+                # A link that moves audio at `upstream_speed` x real time
+                async def send(chunk):
+                    await asyncio.sleep(len(chunk) / (SAMPLE_RATE * 2) / upstream_speed)
+                    await ws.send(chunk)
+            coalescer = None
+            if mode == "coalesced":
+                coalescer = PcmCoalescer(send, SAMPLE_RATE, max_buffered_ms=max_buffered_ms, stats=stats).start()
+            started = time.perf_counter()
+            for i in range(seconds * 1000 // frame_ms):
+                # Real-time pacing, like a microphone
+                await asyncio.sleep(max(0.0, started + i * frame_ms / 1000 - time.perf_counter()))
+                frame = make_frame(frame_bytes)
+                if coalescer is not None:
+                    await coalescer.push(frame)
+                else:
+                    await ws.send(frame)
+            if coalescer is not None:
+                await coalescer.close()
+            await asyncio.sleep(0.05)
+        received = aai.received
+    latencies = frame_latencies(received, frame_bytes)
+    short = sum(1 for _, m in received if len(m) < SAMPLE_RATE * 2 * 50 // 1000)
+    pct = lambda q: latencies[min(len(latencies) - 1, len(latencies) * q // 100)]  # noqa: E731
+    return len(received), short, pct(50), pct(95), stats
+
+
+async def bench(seconds, frame_ms):
+    print(f"{seconds} s of audio in {frame_ms} ms frames\n")
+    print(f"{'mode':<22}{'upstream msgs':>14}{'msgs < 50 ms':>14}{'latency p50 ms':>16}{'p95 ms':>9}")
+    for label, kwargs in (("per-frame send", {"mode": "direct"}),
+                          ("coalesced", {"mode": "coalesced"}),
+                          ("coalesced, slow link", {"mode": "coalesced", "upstream_speed": 0.8, "max_buffered_ms": 500})):
+        messages, short, p50, p95, stats = await run(seconds=seconds, frame_ms=frame_ms, **kwargs)
+        print(f"{label:<22}{messages:>14}{short:>14}{p50:>16.1f}{p95:>9.1f}")
+        if kwargs["mode"] == "coalesced":
+            s = stats.stats()
+            print(f"  {s['frames_per_send']} frames/send, hold avg {s['hold_ms_avg']} ms, "
+                  f"max {s['hold_ms_max']} ms, backpressure waits {s['backpressure_waits']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=5)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.seconds, args.frame_ms))
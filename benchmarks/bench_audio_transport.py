@@ -0,0 +1,104 @@
+"""Murf audio to the browser: base64-in-JSON text frames vs binary frames with a 12-byte header.
+
+First streams one reply through stream_to_murf_websocket against the mock
+Murf server in both modes, checking that the binary frames carry exactly the
+audio Murf sent and counting bytes on the wire (WebSocket framing included).
+Then it times the server's per-chunk forwarding work in a tight loop and
+reports CPU per second of 44.1 kHz 16-bit mono audio.
+
+    python benchmarks/bench_audio_transport.py --chunk-kb 16
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import FakeClientWebSocket, MockMurfServer  # noqa: E402
+
+
+AUDIO_BYTES_PER_SECOND = 44100 * 2
+REPLY = ("Arre boss, yeh toh simple sawaal hai. Mumbai ki baarish kabhi time pe nahi aati, "
+         "lekin local train ke liye log hamesha time pe aate hain.")
+
+
+def ws_frame_bytes(payload_len):
+    # Server-to-client frames are unmasked: 2-byte header, plus 2 or 8 bytes of extended length
+    return payload_len + (2 if payload_len < 126 else 4 if payload_len < 65536 else 10)
+
+
+class CountingClientWebSocket(FakeClientWebSocket):
+    def __init__(self):
+        super().__init__()
+        self.audio_wire_bytes = 0
+        self.audio = bytearray()
+
+    async def send_text(self, text):
+        await super().send_text(text)
+        data = json.loads(text)
+        if data.get("type") == "MurfAudioChunk":
+            self.audio_wire_bytes += ws_frame_bytes(len(text.encode()))
+            self.audio += base64.b64decode(data["audio"])
+
+    async def send_bytes(self, data, msg_type="binary"):
+        await super().send_bytes(data, msg_type)
+        self.audio_wire_bytes += ws_frame_bytes(len(data))
+        self.audio += data[main.AUDIO_FRAME_HEADER.size:]
+
+
+async def pipeline(bytes_per_char):
+    print("end to end (mock Murf, one reply):")
+    print(f"{'transport':<11}{'audio KB':>10}{'wire KB':>10}{'overhead':>10}{'frames':>8}")
+    received = {}
+    async with MockMurfServer(synth_delay=0.0, per_char_delay=0.0, bytes_per_char=bytes_per_char) as murf:
+        main.MURF_WS_URL = murf.url
+        for transport in ("json", "binary"):
+            client = CountingClientWebSocket()
+            await main.stream_to_murf_websocket(REPLY, "bench", client, "fake-murf", audio_transport=transport)
+            received[transport] = bytes(client.audio)
+            frames = sum(1 for _, e in client.events if not isinstance(e, dict) or e.get("type") == "MurfAudioChunk")
+            print(f"{transport:<11}{len(client.audio) / 1024:>10.0f}{client.audio_wire_bytes / 1024:>10.0f}"
+                  f"{client.audio_wire_bytes / len(client.audio) - 1:>10.1%}{frames:>8}")
+    assert received["json"] == received["binary"], "binary frames don't match the JSON audio"
+    await main.murf_pool.close()
+
+
+def forward_json(raw, turn_id, seq):
+    data = json.loads(raw)
+    return json.dumps({"type": "MurfAudioChunk", "audio": data["audio"]})
+
+
+def forward_binary(raw, turn_id, seq):
+    data = json.loads(raw)
+    return main.pack_audio_frame(turn_id, seq, base64.b64decode(data["audio"]))
+
+
+def cpu_per_audio_second(chunk_bytes, seconds):
+    raw = json.dumps({"audio": base64.b64encode(os.urandom(chunk_bytes)).decode(), "context_id": "c", "final": False})
+    chunks = max(1, int(seconds * AUDIO_BYTES_PER_SECOND / chunk_bytes))
+    print(f"\nserver forwarding CPU ({chunk_bytes // 1024} KB chunks, {seconds} s of audio per run):")
+    print(f"{'transport':<11}{'CPU ms per audio s':>20}{'wire KB per audio s':>21}")
+    for label, forward in (("json", forward_json), ("binary", forward_binary)):
+        best = float("inf")
+        for _ in range(5):
+            started = time.process_time()
+            for seq in range(chunks):
+                frame = forward(raw, 1, seq)
+            best = min(best, time.process_time() - started)
+        wire = ws_frame_bytes(len(frame)) * chunks / seconds
+        print(f"{label:<11}{best / seconds * 1000:>20.3f}{wire / 1024:>21.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-kb", type=int, default=16)
+    parser.add_argument("--seconds", type=int, default=60)
+    args = parser.parse_args()
+    asyncio.run(pipeline(bytes_per_char=900))
+    cpu_per_audio_second(args.chunk_kb * 1024, args.seconds)
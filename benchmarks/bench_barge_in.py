@@ -0,0 +1,98 @@
+"""Barge-in: how fast an in-flight reply is cancelled, vs waiting for it to finish.
+
+Runs main.respond_to_turn through a TurnScheduler against a fake Gemini
+stream and a local mock Murf WebSocket server, and interrupts it at several
+points: before Gemini's first token, while text and audio are both
+streaming, and once only audio is left. For each it reports the
+cancellation latency, what the old inline handler would have made the user
+wait (the rest of the reply), and checks that nothing from the old reply
+reached the client after TurnCancelled and that Murf was told to clear the
+context. Exits non-zero if any cancellation takes longer than --max-cancel-ms
+or leaks stale output, so it can gate changes to the reply pipeline.
+
+    python benchmarks/bench_barge_in.py --runs 5 --max-cancel-ms 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import FakeClientWebSocket, MockMurfServer, install_fake_gemini  # noqa: E402
+
+
+QUERY = "Mumbai ki baarish ke baare mein kya sochte ho?"
+REPLY_OUTPUT = ("LLMStreamChunk", "LLMStreamComplete", "MurfAudioChunk", "MurfStreamComplete")
+
+
+def is_reply_output(event):
+    return isinstance(event, bytes) or event.get("type") in REPLY_OUTPUT
+
+
+async def reply_duration(session_id):
+    """How long an uninterrupted reply takes, i.e. how long an inline handler blocks the next turn"""
+    client = FakeClientWebSocket()
+    await main.respond_to_turn(QUERY, session_id, client, "fake-gemini", "fake-murf", None)
+    await main.session_store.delete(session_id)
+    return client.first("MurfStreamComplete")
+
+
+async def interrupted_reply(session_id, delay, murf):
+    client = FakeClientWebSocket()
+    scheduler = main.TurnScheduler(session_id, stats=main.turn_stats)
+    clears_before = sum(1 for m in murf.messages if m.get("clear"))
+    await scheduler.start(main.respond_to_turn, QUERY, session_id, client, "fake-gemini", "fake-murf", None)
+    await asyncio.sleep(delay)
+    await main.cancel_reply(scheduler, client, "client")
+    cancelled_at = client.first("TurnCancelled")
+    # Anything the old reply still manages to send would show up after TurnCancelled
+    await asyncio.sleep(0.3)
+    stale = sum(1 for elapsed, event in client.events if elapsed > cancelled_at and is_reply_output(event))
+    audio_before = sum(1 for elapsed, event in client.events if elapsed <= cancelled_at and is_reply_output(event)
+                       and (isinstance(event, bytes) or event.get("type") == "MurfAudioChunk"))
+    cleared = sum(1 for m in murf.messages if m.get("clear")) - clears_before
+    await main.session_store.delete(session_id)
+    cancel_event = next(event for _, event in client.events if isinstance(event, dict) and event.get("type") == "TurnCancelled")
+    return cancel_event["cancel_ms"], stale, audio_before, cleared
+
+
+async def bench(runs, max_cancel_ms):
+    install_fake_gemini(main)
+    failures = 0
+    async with MockMurfServer() as murf:
+        main.MURF_WS_URL = murf.url
+        full = statistics.median([await reply_duration(f"full_{i}") for i in range(runs)]) * 1000
+        print(f"uninterrupted reply: {full:.0f} ms to MurfStreamComplete\n")
+        print(f"{'interrupt at':<30}{'cancel p50 ms':>14}{'max ms':>8}{'inline wait ms':>16}"
+              f"{'audio chunks sent':>19}{'stale msgs':>12}{'murf clears':>13}")
+        for label, delay in (("before first token (0.1 s)", 0.1), ("text + audio streaming (0.6 s)", 0.6),
+                             ("audio only (1.2 s)", 1.2)):
+            samples = []
+            for i in range(runs):
+                samples.append(await interrupted_reply(f"barge_{delay}_{i}", delay, murf))
+            cancel_ms = sorted(s[0] for s in samples)
+            stale = sum(s[1] for s in samples)
+            audio = statistics.median(s[2] for s in samples)
+            clears = sum(s[3] for s in samples)
+            inline_wait = max(0.0, full - delay * 1000)
+            print(f"{label:<30}{statistics.median(cancel_ms):>14.1f}{cancel_ms[-1]:>8.1f}{inline_wait:>16.0f}"
+                  f"{audio:>19.0f}{stale:>12}{clears:>13}")
+            if cancel_ms[-1] > max_cancel_ms or stale:
+                failures += 1
+    print(f"\nturn stats: {main.turn_stats.stats()}")
+    if failures:
+        print(f"FAIL: {failures} scenario(s) over {max_cancel_ms} ms or leaking stale output")
+        sys.exit(1)
+    print(f"OK: every cancellation under {max_cancel_ms} ms with no stale output")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-cancel-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.runs, args.max_cancel_ms))
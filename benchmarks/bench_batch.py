@@ -0,0 +1,206 @@
+"""Batch jobs: throughput and server peak RSS for a large batch of voice notes, against /agent/chat one file at a time.
+
+Generates --files WAV recordings (16 kHz mono, --seconds long on average) in
+a temp dir and serves the app in a separate uvicorn process with the
+blocking AssemblyAI, Gemini and Murf SDK clients replaced by the sleeping
+fakes from mock_servers.py (--asr-delay, --llm-delay, --tts-delay, plus
+--jitter), so the server's memory is measured on its own. Modes:
+
+    batch   every file in one streamed multipart POST /agent/batch, then the
+            results streamed from /agent/batch/{id}/results until the job is done
+    chat    POST /agent/chat/{session} per file, --chat-concurrency requests at a time
+
+Throughput is files per second from the start of the upload to the last
+result. RSS comes from /proc/<pid>/status: VmRSS once the server is up and
+idle, and VmHWM (peak) after the run, on a fresh server per mode.
+
+    python benchmarks/bench_batch.py --files 1000
+    python benchmarks/bench_batch.py --files 1000 --seconds 20 --modes batch --upstream-concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_load import free_port, percentile  # noqa: E402
+
+BOUNDARY = "batchbenchboundary7f3a"
+
+
+def write_recordings(directory: str, count: int, seconds: float, rng: np.random.Generator) -> list:
+    """Quiet noise WAVs of 0.5x-1.5x ``seconds`` each; returns their paths"""
+    paths = []
+    for i in range(count):
+        samples = int(16000 * seconds * rng.uniform(0.5, 1.5))
+        path = os.path.join(directory, f"note_{i:05d}.wav")
+        with wave.open(path, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(16000)
+            out.writeframes(rng.integers(-800, 800, samples, dtype="<i2").tobytes())
+        paths.append(path)
+    return paths
+
+
+async def multipart_body(paths: list):
+    """A multipart/form-data body with one "files" part per path, read from disk 64 KB at a time"""
+    for path in paths:
+        yield (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; "
+               f"filename=\"{os.path.basename(path)}\"\r\nContent-Type: audio/wav\r\n\r\n").encode()
+        with open(path, "rb") as f:
+            while chunk := f.read(65536):
+                yield chunk
+        yield b"\r\n"
+    yield f"--{BOUNDARY}--\r\n".encode()
+
+
+def memory_kb(pid: int) -> dict:
+    with open(f"/proc/{pid}/status") as f:
+        return {line.split(":")[0]: int(line.split()[1]) for line in f if line.startswith(("VmRSS", "VmHWM"))}
+
+
+async def start_server(args, port: int):
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "MURF_POOL_ENABLED": "false", "SDK_PREWARM": "false",
+           "PYTHONWARNINGS": "ignore::FutureWarning",
+           "BATCH_WORKERS": str(args.batch_workers), "BATCH_ASR_CONCURRENCY": str(args.upstream_concurrency),
+           "BATCH_LLM_CONCURRENCY": str(args.upstream_concurrency),
+           "BATCH_TTS_CONCURRENCY": str(args.upstream_concurrency)}
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--serve", str(port), "--asr-delay", str(args.asr_delay),
+        "--llm-delay", str(args.llm_delay), "--tts-delay", str(args.tts_delay), "--jitter", str(args.jitter),
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    async with httpx.AsyncClient() as http:
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline:
+            try:
+                await http.get(f"http://127.0.0.1:{port}/stats")
+                return process
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def run_batch(http: httpx.AsyncClient, base: str, paths: list) -> dict:
+    response = await http.post(f"{base}/agent/batch", content=multipart_body(paths),
+                               headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+    response.raise_for_status()
+    job = response.json()
+    uploaded = time.perf_counter()
+    latencies, failed = [], 0
+    async with http.stream("GET", base + job["results_url"]) as results:
+        async for line in results.aiter_lines():
+            if line:
+                result = json.loads(line)
+                latencies.append(result["ms"])
+                failed += not result["ok"]
+    status = (await http.get(base + job["status_url"])).json()
+    return {"latencies": latencies, "failed": failed, "uploaded": uploaded, "status": status["status"]}
+
+
+async def run_chat(http: httpx.AsyncClient, base: str, paths: list, concurrency: int) -> dict:
+    pending = list(reversed(paths))
+    latencies, failed = [], 0
+
+    async def worker(n):
+        nonlocal failed
+        while pending:
+            path = pending.pop()
+            started = time.perf_counter()
+            while True:
+                with open(path, "rb") as f:
+                    response = await http.post(f"{base}/agent/chat/bench_{n}",
+                                               files={"file": (os.path.basename(path), f, "audio/wav")})
+                if response.status_code not in (429, 503) or "Retry-After" not in response.headers:
+                    break
+                await asyncio.sleep(float(response.headers["Retry-After"]))
+            latencies.append((time.perf_counter() - started) * 1000)
+            failed += response.status_code != 200
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return {"latencies": latencies, "failed": failed, "uploaded": None, "status": "done"}
+
+
+async def bench(args):
+    rng = np.random.default_rng(args.seed)
+    directory = tempfile.mkdtemp(prefix="bench-batch-")
+    try:
+        paths = write_recordings(directory, args.files, args.seconds, rng)
+        total_mb = sum(os.path.getsize(path) for path in paths) / 1024 ** 2
+        print(f"{args.files} recordings, {total_mb:.0f} MB; fake AssemblyAI {args.asr_delay * 1000:.0f} ms, "
+              f"Gemini {args.llm_delay * 1000:.0f} ms, Murf {args.tts_delay * 1000:.0f} ms, "
+              f"jitter {args.jitter * 1000:.0f} ms; batch: {args.batch_workers} workers, "
+              f"{args.upstream_concurrency} per upstream; chat: {args.chat_concurrency} at a time\n")
+        print(f"{'mode':<8}{'files/s':>9}{'wall s':>9}{'upload s':>10}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'RSS idle':>10}{'RSS peak':>10}{'growth':>9}")
+        for mode in args.modes.split(","):
+            port = free_port()
+            process = await start_server(args, port)
+            try:
+                idle = memory_kb(process.pid)["VmRSS"]
+                base = f"http://127.0.0.1:{port}"
+                async with httpx.AsyncClient(timeout=None) as http:
+                    started = time.perf_counter()
+                    if mode == "batch":
+                        r = await run_batch(http, base, paths)
+                    else:
+                        r = await run_chat(http, base, paths, args.chat_concurrency)
+                    wall = time.perf_counter() - started
+                peak = memory_kb(process.pid)["VmHWM"]
+            finally:
+                process.terminate()
+                await process.wait()
+            latencies = sorted(r["latencies"])
+            upload = f"{r['uploaded'] - started:.1f}" if r["uploaded"] else "-"
+            print(f"{mode:<8}{len(latencies) / wall:>9.1f}{wall:>9.1f}{upload:>10}{r['failed']:>8}"
+                  f"{percentile(latencies, 50):>9.0f}{percentile(latencies, 95):>9.0f}"
+                  f"{idle / 1024:>8.0f}MB{peak / 1024:>8.0f}MB{(peak - idle) / 1024:>7.0f}MB")
+            if len(latencies) != args.files or r["status"] != "done":
+                print(f"  incomplete: {len(latencies)} of {args.files} results, job {r['status']}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def serve(args):
+    import uvicorn
+    import main
+    from mock_servers import install_fake_sdks
+
+    install_fake_sdks(main, transcribe_delay=args.asr_delay, llm_delay=args.llm_delay, tts_delay=args.tts_delay,
+                      jitter=args.jitter)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.serve, log_level="warning")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5.0, help="average recording length")
+    parser.add_argument("--modes", default="batch,chat")
+    parser.add_argument("--asr-delay", type=float, default=0.1)
+    parser.add_argument("--llm-delay", type=float, default=0.1)
+    parser.add_argument("--tts-delay", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--batch-workers", type=int, default=32)
+    parser.add_argument("--upstream-concurrency", type=int, default=8, help="BATCH_{ASR,LLM,TTS}_CONCURRENCY")
+    parser.add_argument("--chat-concurrency", type=int, default=4, help="/agent/chat requests at a time")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(bench(args))
@@ -0,0 +1,88 @@
+"""Calculator: the old replace()+eval() implementation vs calculator.calculate.
+
+Times both on a corpus of spoken expressions, counts how many each one
+answers correctly, and shows how long the new evaluator takes to reject
+pathological inputs (the old one is not run on those: "9**9**9" would pin
+the core for minutes). The run fails (exit 1) if any pathological input is
+evaluated or raises anything but CalculationError, which is what main.py
+turns into a spoken "can't calculate that" instead of a 500.
+
+    python benchmarks/bench_calculator.py --repeat 200
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calculator import CalculationError, calculate  # noqa: E402
+
+# (spoken input, expected result)
+CORPUS = [
+    ("2 plus 3", 5), ("what is 10 times 5", 50), ("100 divided by 4", 25), ("15 minus 7", 8),
+    ("(2+3)*4", 20), ("12 guna 12", 144), ("81 bhag 9", 9), ("7 jod 8", 15),
+    ("2 to the power 10", 1024), ("square root of 144", 12), ("sin 30", 0.5), ("log 1000", 3),
+    ("5 squared", 25), ("20 percent of 500", 100), ("do sau plus teen sau", 500),
+    ("twenty five times four", 100), ("paanch guna chhe", 30), ("ek lakh bhag das", 10000),
+    ("add 2 and 3", 5), ("subtract 3 from 10", 7), ("1,00,000 plus 1", 100001), ("2^8", 256),
+    ("5!", 120), ("what is (2+3)!?", 120), ("log(8, 2)", 3), ("round(2.567, 2)", 2.57),
+]
+PATHOLOGICAL = ["9**9**9", "2 ** 100000", "factorial 100000", "10 ** 10 ** 10", "+".join(["1"] * 90),
+                "99999999999 ** 40", "(-8) ** 0.5", "floor((-1)**0.5)", "sqrt((-8) ** 0.5)", "round((-2) ** 1.5)",
+                "factorial((-1) ** 0.5)", "abs((-27) ** (1/3))", "5 @ 3", "7 & 2", "sin(30, 5)", "sqrt(16, 2)",
+                "factorial(5, 2)"]
+
+
+# The pre-rewrite implementation, kept here as the baseline
+def legacy_calculation(calculation_query):
+    query = calculation_query.lower().strip()
+    query = query.replace("plus", "+").replace("add", "+").replace("jod", "+")
+    query = query.replace("minus", "-").replace("subtract", "-").replace("ghata", "-")
+    query = query.replace("times", "*").replace("multiply", "*").replace("guna", "*")
+    query = query.replace("divided by", "/").replace("divide", "/").replace("bhag", "/")
+    query = re.sub(r'[^\d+\-*/().]', '', query)
+    return query, eval(query)
+
+
+def run(fn, repeat):
+    correct = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        correct = 0
+        for text, expected in CORPUS:
+            try:
+                _, result = fn(text)
+                correct += abs(result - expected) < 1e-9
+            except Exception:
+                pass
+    per_call = (time.perf_counter() - started) / (repeat * len(CORPUS)) * 1e6
+    return per_call, correct
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'implementation':<22}{'µs/expression':>15}{'correct':>12}")
+    for label, fn in (("replace + eval", legacy_calculation), ("calculator.calculate", calculate)):
+        per_call, correct = run(fn, args.repeat)
+        print(f"{label:<22}{per_call:>15.1f}{f'{correct}/{len(CORPUS)}':>12}")
+
+    print("\npathological input              rejected in")
+    failures = 0
+    for text in PATHOLOGICAL:
+        started = time.perf_counter()
+        try:
+            calculate(text)
+            outcome = "evaluated?!"
+            failures += 1
+        except CalculationError as e:
+            outcome = str(e)
+        except Exception as e:
+            outcome = f"{type(e).__name__}: {e} (not a CalculationError)"
+            failures += 1
+        print(f"{text[:30]:<32}{(time.perf_counter() - started) * 1e6:>8.0f} µs  ({outcome})")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,207 @@
+"""Outbound /ws messages: inline json.dumps + send per message vs the per-connection ClientWriter.
+
+A uvicorn process (one worker, started by this script) serves a synthetic
+reply stream on /ws/{mode}: --chunks Gemini-style LLMStreamChunk messages
+--chunk-gap-ms apart, LLMStreamComplete, then --audio-frames MurfAudioChunk
+messages (base64 JSON, like the default audio transport) and
+MurfStreamComplete, --replies times per connection, each reply starting
+when the client asks for it after receiving the previous one. The modes are the old
+inline path (json.dumps, then await send_text on the producer's path), the
+writer without coalescing, and the writer as configured in main.py. Many
+concurrent clients read with the websockets library from this process;
+--slow-clients of them sleep --slow-read-ms after every frame.
+
+Reported per mode: messages produced per second, frames on the wire, server
+CPU per session and per message (process CPU time of the server), the text
+delay from when Gemini would have delivered a chunk (reply start plus its
+share of the gaps) to when the client read it, which counts both a producer
+held up by inline sends and chunks held back by coalescing (up to
+WS_COALESCE_MS), and how long each reply's producer took, which is the time
+the Gemini/Murf readers are kept from their upstream.
+Every client checks that the text it reassembles is exactly what was sent.
+
+    python benchmarks/bench_client_writer.py --sessions 100 --replies 3 --slow-clients 5
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_load import free_port, percentile  # noqa: E402
+
+MODES = ("inline", "writer-no-coalesce", "writer")
+WORDS = ("Arre boss, Mumbai ki baarish kabhi time pe nahi aati, lekin local train ke liye log hamesha "
+         "time pe aate hain. Chai aur vada pav ke saath monsoon ka mazaa hi kuch aur hai.").split()
+
+
+def chunk_text(i):
+    return WORDS[i % len(WORDS)] + " "
+
+
+# --- Server process --------------------------------------------------------
+
+def serve(args):
+    import uvicorn
+    from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+    import main
+    from client_writer import ClientWriter
+
+    app = FastAPI()
+    audio = base64.b64encode(os.urandom(args.audio_kb * 1024)).decode()
+
+    class InlineSender:
+        def __init__(self, websocket):
+            self.websocket = websocket
+
+        async def send_message(self, message):
+            await self.websocket.send_text(json.dumps(message))
+
+        async def close(self):
+            pass
+
+    @app.get("/cpu")
+    async def cpu():
+        return {"cpu": time.process_time()}
+
+    @app.websocket("/ws/{mode}")
+    async def reply_stream(websocket: WebSocket, mode: str):
+        await websocket.accept()
+        if mode == "inline":
+            client = InlineSender(websocket)
+        else:
+            coalesce_ms = 0 if mode == "writer-no-coalesce" else main.WS_COALESCE_MS
+            client = ClientWriter(websocket, mode, max_queue=main.WS_SEND_QUEUE, coalesce_ms=coalesce_ms,
+                                  stall_timeout=main.WS_STALL_TIMEOUT).start()
+        try:
+            for turn_id in range(args.replies):
+                # Like a user turn: the next reply starts once the client has played the previous one
+                await websocket.receive_text()
+                started, due = time.perf_counter(), time.time()
+                for i in range(args.chunks):
+                    # "due" is when Gemini would have delivered the chunk had nothing held up its reader
+                    await client.send_message({"type": "LLMStreamChunk", "text": chunk_text(i),
+                                               "due": due + i * args.chunk_gap_ms / 1000})
+                    await asyncio.sleep(args.chunk_gap_ms / 1000)
+                await client.send_message({"type": "LLMStreamComplete",
+                                           "complete_response": "".join(map(chunk_text, range(args.chunks)))})
+                for seq in range(args.audio_frames):
+                    await client.send_message({"type": "MurfAudioChunk", "audio": audio, "turn_id": turn_id,
+                                               "seq": seq, "server_ms": 0.0})
+                await client.send_message({"type": "MurfStreamComplete", "turn_id": turn_id,
+                                           "producer_ms": (time.perf_counter() - started) * 1000})
+            await client.close()
+            await websocket.receive()
+        except WebSocketDisconnect:
+            pass
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- Load generator --------------------------------------------------------
+
+async def client_session(url, args, slow, results):
+    expected = "".join(map(chunk_text, range(args.chunks))) * args.replies
+    text, frames, completes, delays, producer = [], 0, 0, [], []
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send("next")
+        async for raw in ws:
+            frames += 1
+            message = json.loads(raw)
+            if message["type"] == "LLMStreamChunk":
+                text.append(message["text"])
+                delays.append((time.time() - message["due"]) * 1000)
+            elif message["type"] == "MurfStreamComplete":
+                producer.append(message["producer_ms"])
+                completes += 1
+                if completes == args.replies:
+                    break
+                await ws.send("next")
+            if slow:
+                await asyncio.sleep(args.slow_read_ms / 1000)
+    results.append({"slow": slow, "frames": frames, "delays": delays, "producer": producer,
+                    "ok": "".join(text) == expected})
+
+
+async def run_mode(base, mode, args):
+    results = []
+    async with httpx.AsyncClient() as http:
+        cpu_before = (await http.get(f"{base}/cpu")).json()["cpu"]
+        started = time.perf_counter()
+        url = f"{base.replace('http', 'ws')}/ws/{mode}"
+        await asyncio.gather(*(client_session(url, args, i < args.slow_clients, results)
+                               for i in range(args.sessions)))
+        wall = time.perf_counter() - started
+        cpu = (await http.get(f"{base}/cpu")).json()["cpu"] - cpu_before
+    messages = args.sessions * args.replies * (args.chunks + args.audio_frames + 2)
+    frames = sum(r["frames"] for r in results)
+    def samples(key, slow):
+        return sorted(x for r in results if r["slow"] == slow for x in r[key])
+
+    delays, producer = samples("delays", False), samples("producer", False)
+    print(f"{mode:<20}{messages / wall:>8.0f}{frames / wall:>9.0f}{cpu / args.sessions * 1000:>9.1f}"
+          f"{cpu / messages * 1e6:>8.1f}{percentile(delays, 50):>8.1f}{percentile(delays, 99):>8.1f}"
+          f"{percentile(producer, 50):>8.0f}{percentile(producer, 99):>8.0f}"
+          f"{percentile(samples('delays', True), 50):>8.0f}{percentile(samples('producer', True), 50):>8.0f}"
+          f"{sum(r['ok'] for r in results):>5}/{len(results)}")
+
+
+async def run(args):
+    port = free_port()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--replies", str(args.replies),
+        "--chunks", str(args.chunks), "--chunk-gap-ms", str(args.chunk_gap_ms), "--audio-frames",
+        str(args.audio_frames), "--audio-kb", str(args.audio_kb),
+        env={**os.environ, "LOG_LEVEL": "WARNING"}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient() as http:
+            for _ in range(300):
+                try:
+                    await http.get(f"{base}/cpu")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+        print(f"{os.cpu_count()} CPU(s), shared with the clients; "
+              f"{args.sessions} clients ({args.slow_clients} reading {args.slow_read_ms:.0f} ms per frame) x "
+              f"{args.replies} replies of {args.chunks} text chunks {args.chunk_gap_ms:g} ms apart + "
+              f"{args.audio_frames} x {args.audio_kb} KB audio\n")
+        print(f"{'':<20}{'':>8}{'':>9}{'server CPU':>17}{'text delay ms':>16}{'producer ms':>16}"
+              f"{'slow clients':>16}")
+        print(f"{'mode':<20}{'msg/s':>8}{'frames/s':>9}{'ms/sess':>9}{'us/msg':>8}{'p50':>8}{'p99':>8}{'p50':>8}"
+              f"{'p99':>8}{'delay':>8}{'prod.':>8}{'text ok':>9}")
+        for mode in MODES:
+            await run_mode(base, mode, args)
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--replies", type=int, default=3)
+    parser.add_argument("--chunks", type=int, default=60)
+    parser.add_argument("--chunk-gap-ms", type=float, default=2.0)
+    parser.add_argument("--audio-frames", type=int, default=20)
+    parser.add_argument("--audio-kb", type=int, default=8)
+    parser.add_argument("--slow-clients", type=int, default=5)
+    parser.add_argument("--slow-read-ms", type=float, default=50.0)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(run(args))
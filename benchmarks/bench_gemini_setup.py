@@ -0,0 +1,112 @@
+"""Gemini setup overhead per turn: genai.configure + GenerativeModel per turn vs the model registry.
+
+Uses the real google-generativeai SDK objects but never calls the API. The
+"per-turn" path is what main.py used to do on every turn: genai.configure,
+a new GenerativeModel, and (on its first request) a new service client,
+because configure throws the cached clients away. Over the network each new
+client also means a new gRPC channel, i.e. a fresh TCP + TLS handshake that
+this benchmark can't see. The registry path is a dictionary lookup after
+the first turn for a key.
+
+The isolation check replays the /agent/chat pattern with several tenants:
+each configures its own key in the event loop, then the blocking call picks
+up the default client in the SDK thread pool. It counts how many requests
+would have gone out with another tenant's key.
+
+    python benchmarks/bench_gemini_setup.py --turns 200 --keys 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai  # noqa: E402
+from google.generativeai import client as genai_client  # noqa: E402
+
+from gemini_registry import GeminiModelRegistry  # noqa: E402
+
+
+SYSTEM_PROMPT = "Tum ek Mumbai tapori style assistant ho. " * 40
+
+
+def key_of(sdk_client):
+    return sdk_client._transport._credentials.token
+
+
+def per_turn_setup(api_key):
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel("gemini-1.5-flash", system_instruction=SYSTEM_PROMPT)
+    # What the first send_message_async does when the model has no client yet
+    model._async_client = genai_client.get_default_generative_async_client()
+    return model
+
+
+def registry_setup(registry, api_key):
+    return registry.get(api_key, system_instruction=SYSTEM_PROMPT)
+
+
+def time_setups(setup, keys, turns):
+    samples = []
+    for i in range(turns):
+        started = time.perf_counter()
+        setup(keys[i % len(keys)])
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+async def isolation_check(keys, requests, use_registry):
+    registry = GeminiModelRegistry()
+    pool = ThreadPoolExecutor(max_workers=4)
+    loop = asyncio.get_running_loop()
+
+    async def tenant_request(api_key):
+        if use_registry:
+            model = registry.get(api_key)
+        else:
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel("gemini-1.5-flash")
+        await asyncio.sleep(0)  # other sessions run while this one waits for a pool thread
+
+        def blocking_call():
+            if model._client is None:
+                model._client = genai_client.get_default_generative_client()
+            return key_of(model._client)
+
+        return api_key, await loop.run_in_executor(pool, blocking_call)
+
+    results = await asyncio.gather(*(tenant_request(keys[i % len(keys)]) for i in range(requests)))
+    pool.shutdown()
+    return sum(1 for expected, used in results if expected != used)
+
+
+def bench(turns, keys_count):
+    keys = [f"tenant-key-{i}" for i in range(keys_count)]
+    registry = GeminiModelRegistry()
+    runs = {
+        "per-turn configure": time_setups(per_turn_setup, keys, turns),
+        "registry": time_setups(lambda key: registry_setup(registry, key), keys, turns),
+    }
+    print(f"{turns} turns across {keys_count} API keys\n")
+    print(f"{'setup':<22}{'p50 us':>10}{'mean us':>10}{'max us':>10}{'total ms':>10}")
+    for label, samples in runs.items():
+        print(f"{label:<22}{statistics.median(samples):>10.1f}{statistics.mean(samples):>10.1f}"
+              f"{max(samples):>10.1f}{sum(samples) / 1000:>10.1f}")
+    print(f"registry: {registry.stats()}\n")
+
+    requests = 200
+    for label, use_registry in (("per-turn configure", False), ("registry", True)):
+        wrong = asyncio.run(isolation_check(keys, requests, use_registry))
+        print(f"{label:<22} {wrong}/{requests} concurrent requests used another tenant's key")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--keys", type=int, default=4)
+    args = parser.parse_args()
+    bench(args.turns, args.keys)
@@ -0,0 +1,54 @@
+"""Time-to-first-audio: full-reply TTS vs sentence-incremental TTS.
+
+Runs main.respond_to_turn against a fake Gemini stream and a local mock Murf
+WebSocket server, once with INCREMENTAL_TTS off and once with it on. The
+"heard" columns estimate when the user hears the reply: the old client plays
+only after MurfStreamComplete, the streaming client once its jitter buffer
+holds enough audio after the first chunk.
+
+    python benchmarks/bench_incremental_tts.py --turns 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import FakeClientWebSocket, MockMurfServer, install_fake_gemini  # noqa: E402
+
+
+async def run_turn(session_id):
+    client = FakeClientWebSocket()
+    await main.respond_to_turn("Mumbai ki baarish ke baare mein kya sochte ho?", session_id, client, "fake-gemini", "fake-murf", None)
+    await main.session_store.delete(session_id)
+    return client.first("MurfAudioChunk"), client.first("MurfStreamComplete"), client.first("LLMStreamComplete")
+
+
+async def bench(turns, jitter_ms):
+    install_fake_gemini(main)
+    async with MockMurfServer() as murf:
+        main.MURF_WS_URL = murf.url
+        results = {}
+        for incremental in (False, True):
+            main.INCREMENTAL_TTS = incremental
+            samples = [await run_turn(f"bench_{incremental}_{i}") for i in range(turns)]
+            results[incremental] = samples
+
+    print(f"{'mode':<14}{'first audio ms':>16}{'audio done ms':>16}{'llm done ms':>14}"
+          f"{'heard: after complete':>23}{'heard: streaming':>18}")
+    for incremental, samples in results.items():
+        first, done, llm = (statistics.median(s[i] for s in samples) * 1000 for i in range(3))
+        print(f"{'incremental' if incremental else 'full-reply':<14}{first:>16.0f}{done:>16.0f}{llm:>14.0f}"
+              f"{done:>23.0f}{first + jitter_ms:>18.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--jitter-ms", type=int, default=120, help="client jitter buffer (PLAYBACK_JITTER_MS in main.js)")
+    args = parser.parse_args()
+    asyncio.run(bench(args.turns, args.jitter_ms))
@@ -0,0 +1,117 @@
+"""Intent routing throughput: repeated keyword scans vs the compiled IntentRouter.
+
+Generates a corpus of synthetic transcripts (calculations, movie requests and
+general chat) and routes each one with the pre-router functions and with
+main.intent_router, checking that both agree, then repeats the comparison
+with extra synthetic skills registered to show how each approach scales.
+
+    python benchmarks/bench_intent_router.py --transcripts 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from intent_router import IntentRouter  # noqa: E402
+
+TEMPLATES = [
+    "what is {a} plus {b}",
+    "{a} times {b} kitna hota hai",
+    "calculate {a} divided by {b} please",
+    "{a} + {b} * {c}",
+    "{movie} ka famous dialogue sunao",
+    "{movie} movie ki koi line batao",
+    "mujhe {movie} film ka quote bolo",
+    "aaj mausam kaisa hai bhai",
+    "tell me a joke about mumbai traffic",
+    "how do I make cutting chai at home",
+    "who won the match yesterday and what was the final score",
+]
+MOVIES = ["Sholay", "Don", "Dabangg", "Golmaal", "Munna Bhai", "3 Idiots", "Lagaan", "Swades"]
+
+
+# The pre-router implementation, kept here as the baseline
+def is_calculation_query(user_query):
+    query_lower = user_query.lower()
+    has_numbers = any(char.isdigit() for char in query_lower)
+    has_calculation_words = any(keyword in query_lower for keyword in main.CALCULATION_KEYWORDS)
+    has_operators = any(op in query_lower for op in ['+', '-', '*', '/', '×', '÷'])
+    return (has_numbers and has_calculation_words) or has_operators
+
+
+def is_movie_dialogue_query(user_query):
+    query_lower = user_query.lower()
+    if any(keyword in query_lower for keyword in main.MOVIE_KEYWORDS):
+        movie_words = [w for w in user_query.split() if w.lower() not in main.MOVIE_STOP_WORDS and len(w) > 2]
+        if movie_words:
+            return True, ' '.join(movie_words)
+    return False, ""
+
+
+def legacy_route(query):
+    # agent_chat called is_movie_dialogue_query twice on the movie path
+    if is_calculation_query(query):
+        return "calculation"
+    if is_movie_dialogue_query(query)[0]:
+        is_movie_dialogue_query(query)
+        return "movie_dialogue"
+    return "chat"
+
+
+def corpus(n, rng):
+    return [rng.choice(TEMPLATES).format(a=rng.randint(1, 999), b=rng.randint(1, 99), c=rng.randint(2, 9),
+                                          movie=rng.choice(MOVIES)) for _ in range(n)]
+
+
+def throughput(fn, transcripts):
+    started = time.perf_counter()
+    for t in transcripts:
+        fn(t)
+    return len(transcripts) / (time.perf_counter() - started)
+
+
+def with_extra_skills(count, rng):
+    """The app's router plus `count` synthetic skills of 12 keywords each, and the matching scan chain"""
+    router = IntentRouter()
+    router.intents = list(main.intent_router.intents)
+    scans = []
+    for i in range(count):
+        keywords = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+                    for _ in range(12)]
+        router.register(f"skill_{i}", keywords=keywords)
+        scans.append((f"skill_{i}", keywords))
+
+    def scan_chain(query):
+        route = legacy_route(query)
+        if route != "chat":
+            return route
+        query_lower = query.lower()
+        for name, keywords in scans:
+            if any(keyword in query_lower for keyword in keywords):
+                return name
+        return "chat"
+
+    return router, scan_chain
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", type=int, default=20000)
+    parser.add_argument("--extra-skills", type=int, nargs="+", default=[0, 10, 50])
+    args = parser.parse_args()
+    rng = random.Random(3)
+    transcripts = corpus(args.transcripts, rng)
+
+    mismatches = sum(1 for t in transcripts if legacy_route(t) != main.intent_router.route(t).intent)
+    print(f"{'extra skills':<14}{'keywords':>10}{'scans/s (before)':>20}{'router/s':>12}")
+    for extra in args.extra_skills:
+        router, scan_chain = with_extra_skills(extra, rng)
+        router.compile()
+        keywords = len(router.owners)
+        print(f"{extra:<14}{keywords:>10}{throughput(scan_chain, transcripts):>20,.0f}"
+              f"{throughput(router.route, transcripts):>12,.0f}")
+    print(f"\nintent disagreements with the old functions: {mismatches}/{len(transcripts)}")
@@ -0,0 +1,392 @@
+"""Load test: concurrent /ws voice sessions and /agent/chat uploads against local mock upstreams.
+
+The app runs as its own uvicorn process (one worker) so that its event-loop
+lag and memory are measured apart from the load generator. AssemblyAI
+streaming, Murf stream-input and TMDB are mock servers on 127.0.0.1 in this
+process (see mock_servers.py), each with a configurable delay plus up to
+--jitter seconds of random extra latency; Gemini and the blocking SDK
+clients behind /agent/chat are faked inside the app process. Nothing
+touches the network, so this runs in CI.
+
+Each simulated /ws client streams PCM in real time, 20 ms frames the way the
+browser does: one utterance (a --pcm WAV, 16 kHz mono 16-bit, or a
+synthesized one), then silence until the reply's MurfStreamComplete, for
+--turns turns. The scripted transcripts cycle through a Gemini question, a
+local movie dialogue, a calculation and a TMDB movie. Turn latency runs from
+the end of the utterance's speech to the first reply audio the client
+receives. Alongside, --chat-clients upload the same audio to
+/agent/chat/{session_id} back to back.
+
+    python benchmarks/bench_load.py --sessions 20 --turns 3 --chat-clients 4
+    python benchmarks/bench_load.py --sessions 8 --turns 2 --max-p95-ms 4000   # exits 1 on failures / slow turns
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from collections import Counter
+
+import httpx
+import numpy as np
+import websockets
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_vad import synth_utterance  # noqa: E402
+from mock_servers import MockAssemblyAIStreamingServer, MockMurfServer, MockTMDBServer  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2
+SPEECH_RMS = 500
+
+TRANSCRIPTS = [
+    "Mumbai ki baarish ke baare mein kya sochte ho?",
+    "Sholay ka dialogue batao",
+    "12 plus 30 kitna hota hai?",
+    "Lagaan movie ka dialogue batao",
+]
+
+
+# --- App process -----------------------------------------------------------
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ProcessMonitor:
+    """Event-loop lag (how late a short timer fires) and resident memory, sampled inside the app"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags = []
+        self.baseline_rss = self.peak_rss = 0
+        self.task = None
+
+    def reset(self):
+        self.lags = []
+        self.baseline_rss = self.peak_rss = rss_bytes()
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        for tick in range(1, sys.maxsize):
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append((time.perf_counter() - started - self.interval) * 1000)
+            if tick % 10 == 0:
+                self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def report(self) -> dict:
+        lags = sorted(self.lags) or [0.0]
+        return {
+            "loop_lag_ms": {"p50": percentile(lags, 50), "p99": percentile(lags, 99), "max": lags[-1]},
+            "baseline_rss": self.baseline_rss,
+            "peak_rss": max(self.peak_rss, rss_bytes()),
+        }
+
+
+def serve(args):
+    import uvicorn
+
+    import main
+    from mock_servers import install_fake_sdks
+
+    install_fake_sdks(main, transcribe_delay=args.transcribe_delay, llm_delay=args.llm_delay,
+                      tts_delay=args.murf_delay, jitter=args.jitter)
+    monitor = ProcessMonitor()
+
+    @main.app.post("/bench/reset")
+    async def bench_reset():
+        monitor.reset()
+        return {"ok": True}
+
+    @main.app.get("/bench/process")
+    async def bench_process():
+        return monitor.report()
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# --- Load generator --------------------------------------------------------
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, len(ordered) * q // 100)] if ordered else float("nan")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def frame_rms(pcm: bytes) -> np.ndarray:
+    samples = np.frombuffer(pcm[:len(pcm) // FRAME_BYTES * FRAME_BYTES], dtype="<i2").astype(np.float32)
+    return np.sqrt(np.mean(samples.reshape(-1, FRAME_BYTES // 2) ** 2, axis=1))
+
+
+def load_utterance(path):
+    """PCM for one user turn and the offset (s) where its speech ends"""
+    if path:
+        with wave.open(path, "rb") as wav:
+            if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+                raise SystemExit(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit PCM")
+            pcm = wav.readframes(wav.getnframes())
+    else:
+        rng = np.random.default_rng(3)
+        speech = synth_utterance(rng, 1.6)
+        audio = np.concatenate([np.zeros(SAMPLE_RATE // 5), speech, np.zeros(SAMPLE_RATE // 5)])
+        audio += rng.normal(0, 30, len(audio))
+        pcm = np.clip(audio, -32768, 32767).astype("<i2").tobytes()
+    loud = np.nonzero(frame_rms(pcm) >= SPEECH_RMS)[0]
+    if not len(loud):
+        raise SystemExit("utterance has no speech above the mock's threshold")
+    return pcm, (loud[-1] + 1) * FRAME_MS / 1000
+
+
+def wav_bytes(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+SILENCE = np.random.default_rng(5).normal(0, 30, FRAME_BYTES // 2).astype("<i2").tobytes()
+
+
+async def send_paced(ws, pcm: bytes, started: float):
+    """Send PCM in 20 ms frames on a real-time schedule starting at `started`"""
+    for i, offset in enumerate(range(0, len(pcm), FRAME_BYTES)):
+        delay = started + i * FRAME_MS / 1000 - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await ws.send(pcm[offset:offset + FRAME_BYTES])
+
+
+async def send_silence_until(ws, done: asyncio.Event, deadline: float):
+    started = time.perf_counter()
+    i = 0
+    while not done.is_set() and time.perf_counter() < deadline:
+        delay = started + i * FRAME_MS / 1000 - time.perf_counter()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(done.wait(), delay)
+                return
+            except asyncio.TimeoutError:
+                pass
+        await ws.send(SILENCE)
+        i += 1
+
+
+async def voice_session(index, ws_url, utterance, speech_end, args, turns):
+    await asyncio.sleep(index * args.ramp / max(1, args.sessions))
+    turn = {}
+
+    async def reader(ws):
+        async for message in ws:
+            now = time.perf_counter()
+            if isinstance(message, bytes):
+                msg_type = "audio"
+            else:
+                msg_type = json.loads(message).get("type")
+                if msg_type == "MurfAudioChunk":
+                    msg_type = "audio"
+            if not turn:
+                continue
+            if msg_type == "audio" and "first_audio" not in turn:
+                turn["first_audio"] = now
+            elif msg_type == "MurfStreamComplete":
+                turn["complete"] = now
+                turn["done"].set()
+            elif msg_type in ("MurfStreamError", "LLMStreamError", "APIKeyError"):
+                turn["error"] = msg_type
+                turn["done"].set()
+
+    try:
+        async with websockets.connect(f"{ws_url}?audio_transport={args.audio_transport}", max_size=None) as ws:
+            reading = asyncio.create_task(reader(ws))
+            for _ in range(args.turns):
+                turn.clear()
+                turn["done"] = asyncio.Event()
+                started = time.perf_counter()
+                turn["speech_end"] = started + speech_end
+                await send_paced(ws, utterance, started)
+                await send_silence_until(ws, turn["done"], turn["speech_end"] + args.turn_timeout)
+                end = turn["speech_end"]
+                turns.append({
+                    "first_audio_ms": (turn["first_audio"] - end) * 1000 if "first_audio" in turn else None,
+                    "complete_ms": (turn["complete"] - end) * 1000 if "complete" in turn else None,
+                    "error": turn.get("error") or (None if turn["done"].is_set() else "timeout"),
+                })
+                await send_silence_until(ws, asyncio.Event(), time.perf_counter() + args.think)
+            reading.cancel()
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        turns.append({"first_audio_ms": None, "complete_ms": None, "error": f"connection: {e}"})
+
+
+async def chat_client(index, base, audio, args, results):
+    await asyncio.sleep(index * args.ramp / max(1, args.chat_clients))
+    async with httpx.AsyncClient(timeout=120) as client:
+        for i in range(args.chat_requests):
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"{base}/agent/chat/load_{index}",
+                                             files={"file": ("turn.wav", audio, "audio/wav")})
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            results.append((status, (time.perf_counter() - started) * 1000))
+
+
+async def start_app(args, env, log_path):
+    port = free_port()
+    server_args = ["--serve", "--port", str(port), "--llm-delay", str(args.llm_delay),
+                   "--transcribe-delay", str(args.transcribe_delay), "--murf-delay", str(args.murf_delay),
+                   "--jitter", str(args.jitter)]
+    with open(log_path, "w") as log:
+        process = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), *server_args, env=env,
+                                                       stdout=log, stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as client:
+        for _ in range(300):
+            if process.returncode is not None:
+                break
+            try:
+                if (await client.get(f"{base}/stats")).status_code == 200:
+                    return process, port
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    if process.returncode is None:
+        process.kill()
+    with open(log_path) as f:
+        raise SystemExit(f"app did not start:\n{f.read()[-2000:]}")
+
+
+def latency_row(label, samples):
+    ordered = sorted(samples)
+    return (f"{label:<44}{percentile(ordered, 50):>9.0f}{percentile(ordered, 95):>9.0f}"
+            f"{percentile(ordered, 99):>9.0f}{ordered[-1] if ordered else float('nan'):>9.0f}")
+
+
+async def run(args):
+    utterance, speech_end = load_utterance(args.pcm)
+    upload = wav_bytes(utterance)
+    mocks = (MockAssemblyAIStreamingServer(TRANSCRIPTS, speech_rms=SPEECH_RMS, turn_delay=args.aai_delay,
+                                           jitter=args.jitter),
+             MockMurfServer(synth_delay=args.murf_delay, jitter=args.jitter),
+             MockTMDBServer(response_delay=args.tmdb_delay, jitter=args.jitter))
+    async with mocks[0] as aai, mocks[1] as murf, mocks[2] as tmdb:
+        env = {**os.environ, "ASSEMBLYAI_WS_URL": aai.url, "MURF_WS_URL": murf.url, "TMDB_API_URL": tmdb.url,
+               "ASSEMBLYAI_API_KEY": "fake-key", "MURF_API_KEY": "fake-key", "GEMINI_API_KEY": "fake-key",
+               "TMDB_API_KEY": "fake-key", "LOG_LEVEL": args.app_log_level, "PYTHONUNBUFFERED": "1"}
+        with tempfile.TemporaryDirectory() as tmp:
+            process, port = await start_app(args, env, os.path.join(tmp, "app.log"))
+            base, ws_url = f"http://127.0.0.1:{port}", f"ws://127.0.0.1:{port}/ws"
+            try:
+                async with httpx.AsyncClient() as client:
+                    # One warm-up turn loads everything that is built lazily before the baseline is taken
+                    warmup = []
+                    await voice_session(0, ws_url, utterance, speech_end, argparse.Namespace(**{**vars(args), "turns": 1}), warmup)
+                    await client.post(f"{base}/bench/reset")
+
+                    turns, chats = [], []
+                    started = time.perf_counter()
+                    await asyncio.gather(
+                        *(voice_session(i, ws_url, utterance, speech_end, args, turns) for i in range(args.sessions)),
+                        *(chat_client(i, base, upload, args, chats) for i in range(args.chat_clients))
+                    )
+                    wall = time.perf_counter() - started
+                    process_stats = (await client.get(f"{base}/bench/process")).json()
+            finally:
+                # Waits without blocking this loop: the app's shutdown closes its sockets to the mocks served here
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), 15)
+                except asyncio.TimeoutError:
+                    print("⚠️ app did not shut down within 15 s of SIGTERM; killed it")
+                    process.kill()
+                    await process.wait()
+                if args.app_log:
+                    with open(os.path.join(tmp, "app.log")) as f, open(args.app_log, "w") as out:
+                        out.write(f.read())
+
+    ok = [t for t in turns if not t["error"]]
+    failed = Counter(t["error"].split(":")[0] for t in turns if t["error"])
+    print(f"app: 1 uvicorn worker; mocks: AssemblyAI turn {args.aai_delay * 1000:.0f} ms, Gemini first token "
+          f"{args.llm_delay * 1000:.0f} ms, Murf {args.murf_delay * 1000:.0f} ms, TMDB {args.tmdb_delay * 1000:.0f} ms, "
+          f"jitter up to {args.jitter * 1000:.0f} ms\n")
+    print(f"/ws: {args.sessions} sessions x {args.turns} turns in {wall:.1f} s: {len(ok)} completed, "
+          f"{sum(failed.values())} failed {dict(failed) if failed else ''}-> {len(ok) / wall:.2f} turns/s")
+    print(f"{'':<44}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    print(latency_row("end of speech -> first reply audio", [t["first_audio_ms"] for t in ok]))
+    print(latency_row("end of speech -> reply complete", [t["complete_ms"] for t in ok]))
+    if chats:
+        statuses = Counter(status for status, _ in chats)
+        print(f"\n/agent/chat: {len(chats)} uploads {dict(statuses)} -> {len(chats) / wall:.2f} req/s")
+        print(latency_row("upload -> response", [ms for status, ms in chats if status == 200]))
+    lag = process_stats["loop_lag_ms"]
+    baseline, peak = process_stats["baseline_rss"] / 1e6, process_stats["peak_rss"] / 1e6
+    print(f"\napp event-loop lag: p50 {lag['p50']:.1f} ms, p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms")
+    print(f"app memory: baseline {baseline:.1f} MB, peak {peak:.1f} MB, "
+          f"~{(peak - baseline) * 1000 / max(1, args.sessions):.0f} KB per session")
+
+    p95 = percentile(sorted(t["first_audio_ms"] for t in ok), 95)
+    problems = []
+    if sum(failed.values()) > args.max_failures:
+        problems.append(f"{sum(failed.values())} failed turns (max {args.max_failures})")
+    if args.max_p95_ms is not None and not p95 <= args.max_p95_ms:
+        problems.append(f"p95 first audio {p95:.0f} ms over {args.max_p95_ms:.0f} ms")
+    if problems:
+        print(f"\nFAIL: {'; '.join(problems)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--chat-clients", type=int, default=2)
+    parser.add_argument("--chat-requests", type=int, default=3)
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which clients connect")
+    parser.add_argument("--think", type=float, default=0.5, help="silence between a reply and the next turn")
+    parser.add_argument("--turn-timeout", type=float, default=20.0)
+    parser.add_argument("--pcm", help="WAV (16 kHz mono 16-bit) to replay as every user turn")
+    parser.add_argument("--audio-transport", choices=("binary", "json"), default="binary")
+    parser.add_argument("--aai-delay", type=float, default=0.15)
+    parser.add_argument("--llm-delay", type=float, default=0.35)
+    parser.add_argument("--murf-delay", type=float, default=0.25)
+    parser.add_argument("--tmdb-delay", type=float, default=0.05)
+    parser.add_argument("--transcribe-delay", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--max-failures", type=int, default=0)
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--app-log-level", default="WARNING")
+    parser.add_argument("--app-log", help="copy the app's output here")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,88 @@
+"""Movie lookup: linear substring scan vs the token/trigram MovieIndex.
+
+Builds synthetic corpora of romanized titles (10k and 100k by default),
+reports index build time and memory, and times exact, misspelled and
+unknown-title queries against both implementations.
+
+    python benchmarks/bench_movie_index.py --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_index import build_movie_index  # noqa: E402
+
+SYLLABLES = ["ka", "ra", "ma", "dil", "pyar", "raj", "dee", "waa", "sha", "hin", "dos", "tan", "lag",
+             "baa", "zin", "dag", "ish", "qui", "jan", "mo", "hab", "bat", "kal", "chan", "ni", "sa"]
+
+
+def make_title(rng):
+    return " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+                    for _ in range(rng.randint(1, 4)))
+
+
+def misspell(title, rng):
+    word = list(title.lower())
+    i = rng.randrange(1, len(word) - 1)
+    word[i] = {"a": "e", "e": "i", "i": "ee", "o": "u", "u": "oo"}.get(word[i], word[i] * 2)
+    return "".join(word)
+
+
+# The pre-index implementation, kept here as the baseline
+def linear_lookup(db, query):
+    query = query.lower().strip()
+    for key, movie in db.items():
+        if key in query or movie["title"].lower() in query:
+            return movie
+    return None
+
+
+def time_queries(fn, queries):
+    samples = []
+    for q in queries:
+        started = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples)
+
+
+def bench(size, rng):
+    titles = list({make_title(rng) for _ in range(size * 2)})[:size]
+    db = {t.lower(): {"title": t, "dialogues": [f"{t} ka dialogue"]} for t in titles}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump([{"title": t, "dialogues": [f"{t} ka dialogue"]} for t in titles], f)
+    try:
+        index = build_movie_index({}, f.name)
+    finally:
+        os.unlink(f.name)
+
+    sample = rng.sample(titles, 200)
+    exact = [f"{t} ka dialogue sunao" for t in sample]
+    fuzzy = [misspell(t, rng) for t in sample]
+    unknown = ["koi aur picture ka naam bolo na"] * 50
+
+    found = sum(1 for q, t in zip(fuzzy, sample) if (m := index.lookup(q)) and m["title"] == t)
+    print(f"\n{size:,} titles: build {index.build_seconds * 1000:.0f} ms, "
+          f"~{index.memory_bytes / 1e6:.1f} MB, {len(index.postings):,} trigrams")
+    print(f"{'query':<12}{'linear µs':>12}{'index µs':>12}")
+    for label, queries in (("exact", exact), ("misspelled", fuzzy), ("unknown", unknown)):
+        linear = time_queries(lambda q: linear_lookup(db, q), queries)
+        indexed = time_queries(index.lookup, queries)
+        print(f"{label:<12}{linear:>12.1f}{indexed:>12.1f}")
+    print(f"misspellings resolved to the right title: {found}/{len(fuzzy)} (linear scan: 0)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+    rng = random.Random(7)
+    for size in args.sizes:
+        bench(size, rng)
@@ -0,0 +1,124 @@
+"""Murf connection pool vs a fresh WebSocket per turn.
+
+Runs main.stream_to_murf_websocket against a local mock Murf server that adds
+a fixed handshake delay (standing in for TCP + TLS + WS upgrade), first with
+sequential turns and then with concurrent sessions sharing the pool.
+
+Before timing anything it checks that a barge-in doesn't leak audio across
+contexts: messages Murf sends for a closed context must not reach the next
+one on the same pooled connection. It exits 1 if they do.
+
+    python benchmarks/bench_murf_pool.py --turns 20 --sessions 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+from websockets.protocol import State
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import FakeClientWebSocket, MockMurfServer  # noqa: E402
+from murf_pool import MurfConnection, MurfConnectionPool  # noqa: E402
+
+REPLY = "Arre boss, pool se connection mila, handshake ka tension khatam."
+
+
+class ScriptedMurfSocket:
+    """Stands in for Murf's WebSocket: yields whatever the check feeds it, records what is sent"""
+
+    state = State.OPEN
+
+    def __init__(self):
+        self.incoming = asyncio.Queue()
+        self.sent = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+    async def close(self):
+        pass
+
+    def feed(self, **message):
+        self.incoming.put_nowait(json.dumps(message))
+
+
+async def check_barge_in() -> bool:
+    """Turn A is interrupted, turn B opens on the same connection, then A's in-flight audio and final arrive"""
+    pool = MurfConnectionPool()
+    url, voice_config = "wss://murf.invalid/stream-input", {"voiceId": "en-US-carter"}
+    ws = ScriptedMurfSocket()
+    conn = MurfConnection(ws, pool.make_key(url, voice_config))
+    pool.connections[conn.pool_key] = [conn]
+    async with pool.context(url, voice_config, "turn_a") as a:
+        await a.send_text("pehla jawab")
+    async with pool.context(url, voice_config, "turn_b") as b:
+        ws.feed(context_id="turn_a", audio="STALE_A", final=False)
+        ws.feed(context_id="turn_a", final=True)
+        ws.feed(context_id="turn_b", audio="FRESH_B", final=False)
+        first = await asyncio.wait_for(b.recv(), 1)
+        leaked = first.get("audio") != "FRESH_B" or b.finished or not b.queue.empty()
+    await conn.close()
+    cleared = any(m.get("clear") and m.get("context_id") == "turn_a" for m in ws.sent)
+    print(f"barge-in check: first message for turn B {first.get('audio')!r}, "
+          f"{conn.dropped} stale messages dropped, turn A cleared: {cleared}")
+    return not leaked and conn.dropped == 2 and cleared
+
+
+async def one_turn(session_id):
+    client = FakeClientWebSocket()
+    await main.stream_to_murf_websocket(REPLY, session_id, client, "fake-murf")
+    assert client.first("MurfStreamComplete") is not None, "turn did not complete"
+    return client.first("MurfAudioChunk") * 1000
+
+
+async def bench(turns, sessions, connect_delay):
+    async with MockMurfServer(synth_delay=0.05, connect_delay=connect_delay) as murf:
+        main.MURF_WS_URL = murf.url
+        print(f"mock handshake delay: {connect_delay * 1000:.0f} ms\n")
+        print(f"{'mode':<32}{'p50 first audio ms':>20}{'p95':>8}{'server conns':>14}")
+        for pooled in (False, True):
+            main.MURF_POOL_ENABLED = pooled
+            main.murf_pool = MurfConnectionPool()
+            # The Murf provider holds the pool and the pooling flag it was built with
+            main.tts_router = main.create_router("tts", main.TTS_PROVIDERS, main.TTS_SLOW_MS, main.TTS_TIMEOUT)
+            murf.connections = 0
+            samples = [await one_turn(f"seq{i}") for i in range(turns)]
+            label = "pooled" if pooled else "connect per turn"
+            p95 = statistics.quantiles(samples, n=20)[-1]
+            print(f"{label + ' (sequential)':<32}{statistics.median(samples):>20.1f}{p95:>8.1f}{murf.connections:>14}")
+
+            murf.connections = 0
+            samples = await asyncio.gather(*(one_turn(f"conc{i}") for i in range(sessions)))
+            p95 = statistics.quantiles(samples, n=20)[-1]
+            print(f"{label + ' (concurrent)':<32}{statistics.median(samples):>20.1f}{p95:>8.1f}{murf.connections:>14}")
+            if pooled:
+                stats = main.murf_pool.stats()
+            await main.murf_pool.close()
+
+        voice_configs = sum(1 for m in murf.messages if "voice_config" in m)
+        print(f"\npool stats: {json.dumps(stats, indent=2)}")
+        print(f"voice_config messages seen by server (both modes): {voice_configs}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--connect-delay", type=float, default=0.12)
+    args = parser.parse_args()
+    if not asyncio.run(check_barge_in()):
+        print("FAIL: audio from an interrupted turn reached the next context")
+        sys.exit(1)
+    asyncio.run(bench(args.turns, args.sessions, args.connect_delay))
@@ -0,0 +1,193 @@
+"""Provider routing under upstream slowdowns: tail latency with one provider, with failover, and with hedging.
+
+Runs main.py's own call paths in-process: open_chat_reply (the /ws Gemini
+stream, timed to its first chunk) for the LLM stage and synthesize_chunks
+(the /agent/chat Murf REST call, timed to the chunk's audio) for TTS. The
+upstreams are the fakes from mock_servers.py: a Gemini model whose first
+token takes --llm-delay and a blocking Murf client that takes --tts-delay,
+both with --jitter. The primary provider (gemini-1.5-flash, murf
+en-US-carter) is wrapped so that each scenario can slow it down or break it;
+the secondary (a second Gemini model / Murf voice, or with --secondary local
+the CPU-only template LLM and tone TTS) is left alone. Scenarios:
+
+    none       no injection
+    tail       --tail-prob of the primary's calls take --tail-delay longer
+    brownout   every primary call takes --brownout-delay longer, for the middle third of the run
+    outage     every primary call fails after 100 ms, for the middle third of the run
+
+Requests arrive open-loop at --rate per second. The configurations are the
+primary alone, primary + secondary with breakers and latency-aware ordering,
+and the same with hedging (PROVIDER_HEDGING). Router settings come from
+main.py (LLM_/TTS_SLOW_MS, *_TIMEOUT, PROVIDER_FAILURE_THRESHOLD, HEDGE_*),
+except --reset-timeout and --window, which are short so that within one run
+a breaker can close again and a demoted provider can get its traffic back.
+
+    python benchmarks/bench_providers.py --requests 360 --rate 30
+    python benchmarks/bench_providers.py --stages llm --scenarios tail,outage --secondary local
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+import providers  # noqa: E402
+from blocking_pool import BlockingCallPool  # noqa: E402
+from bench_load import percentile  # noqa: E402
+from mock_servers import FakeMurf, install_fake_gemini  # noqa: E402
+from providers import GeminiLLM, MurfTTS, ProviderRouter, TemplateLLM, ToneTTS  # noqa: E402
+
+SCENARIOS = ("none", "tail", "brownout", "outage")
+CONFIGS = ("single", "failover", "hedged")
+QUESTION = "Mumbai mein sabse achha vada pav kahan milta hai?"
+CHUNK = "Arre boss, Mumbai ka vada pav toh har nukkad pe jhakas milta hai!"
+
+
+class Injected:
+    """A provider whose calls get the scenario's extra delay or failure before reaching it"""
+
+    def __init__(self, provider, scenario: str, args, rng: random.Random, progress):
+        self.provider = provider
+        self.name = provider.name
+        self.voice_config = getattr(provider, "voice_config", None)
+        self.scenario = scenario
+        self.args = args
+        self.rng = rng
+        self.progress = progress
+
+    async def inject(self):
+        middle = 1 / 3 <= self.progress() < 2 / 3
+        if self.scenario == "tail" and self.rng.random() < self.args.tail_prob:
+            await asyncio.sleep(self.args.tail_delay)
+        elif self.scenario == "brownout" and middle:
+            await asyncio.sleep(self.args.brownout_delay)
+        elif self.scenario == "outage" and middle:
+            await asyncio.sleep(0.1)
+            raise ConnectionError("injected outage")
+
+    async def stream(self, *args):
+        await self.inject()
+        return await self.provider.stream(*args)
+
+    async def synthesize(self, *args, **kwargs):
+        await self.inject()
+        return await self.provider.synthesize(*args, **kwargs)
+
+
+def build_router(stage: str, config: str, scenario: str, args, rng, progress) -> ProviderRouter:
+    if stage == "llm":
+        primary = GeminiLLM(main.gemini_models, "gemini-1.5-flash", run_blocking=main.run_blocking)
+        secondary = TemplateLLM() if args.secondary == "local" else GeminiLLM(main.gemini_models, "gemini-1.5-flash-8b",
+                                                                              run_blocking=main.run_blocking)
+        slow_ms, timeout = main.LLM_SLOW_MS, main.LLM_TIMEOUT
+    else:
+        voice = {**main.MURF_VOICE_CONFIG, "voiceId": "en-US-natalie"}
+        primary = MurfTTS(main.murf_pool, main.murf_stream_url, main.MURF_VOICE_CONFIG, main.run_blocking)
+        secondary = ToneTTS() if args.secondary == "local" else MurfTTS(main.murf_pool, main.murf_stream_url, voice,
+                                                                        main.run_blocking)
+        slow_ms, timeout = main.TTS_SLOW_MS, main.TTS_TIMEOUT
+    providers = [Injected(primary, scenario, args, rng, progress)]
+    if config != "single":
+        providers.append(secondary)
+    return ProviderRouter(stage, providers, timeout=timeout, slow_ms=slow_ms,
+                          failure_threshold=main.PROVIDER_FAILURE_THRESHOLD, reset_timeout=args.reset_timeout,
+                          window=args.window, hedge_delay_ms=main.HEDGE_DELAY_MS, hedge_percentile=main.HEDGE_PERCENTILE)
+
+
+async def llm_request(i: int):
+    _, _, stream = await main.open_chat_reply(QUESTION, f"bench_{i}", "fake-key", [], {"session_id": f"bench_{i}"})
+    async for _ in stream:
+        break
+    await stream.aclose()
+
+
+async def tts_request(i: int):
+    async for _ in main.synthesize_chunks([CHUNK], "fake-key"):
+        break
+
+
+async def run(stage: str, config: str, scenario: str, args) -> dict:
+    rng = random.Random(args.seed)
+    sent = 0
+    router = build_router(stage, config, scenario, args, rng, lambda: sent / args.requests)
+    if stage == "llm":
+        main.llm_router = router
+    else:
+        main.tts_router = router
+    main.PROVIDER_HEDGING = config == "hedged"
+    request = llm_request if stage == "llm" else tts_request
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await request(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except Exception:
+            failures += 1
+
+    tasks = []
+    started = time.perf_counter()
+    for i in range(args.requests):
+        await asyncio.sleep(max(0.0, started + i / args.rate - time.perf_counter()))
+        sent = i
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    stats = router.stats()["providers"]
+    secondary = sum(s["served"] for name, s in stats.items() if name != router.primary.name)
+    latencies.sort()
+    return {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else float("nan"), "failed": failures,
+            "secondary": secondary / max(1, len(latencies)), "hedges": sum(s["hedges"] for s in stats.values()),
+            "trips": stats[router.primary.name]["trips"]}
+
+
+async def bench(args):
+    install_fake_gemini(main, first_token_delay=args.llm_delay, jitter=args.jitter)
+    providers.murf.Murf = type("BenchMurf", (FakeMurf,), {"delay": args.tts_delay, "jitter": args.jitter})
+    # Blocking fake Murf calls (hedge losers included) must not queue behind each other
+    main.sdk_pool = BlockingCallPool(max_workers=256, queue_depth=0, max_per_session=256)
+    main.response_cache = None
+
+    print(f"{args.requests} requests at {args.rate:g}/s per run; Gemini first token {args.llm_delay * 1000:.0f} ms, "
+          f"Murf {args.tts_delay * 1000:.0f} ms, jitter {args.jitter * 1000:.0f} ms; secondary: {args.secondary}")
+    print(f"tail: {args.tail_prob:.0%} +{args.tail_delay * 1000:.0f} ms; brownout +{args.brownout_delay * 1000:.0f} ms; "
+          f"hedge delay {main.HEDGE_DELAY_MS:.0f} ms until p{main.HEDGE_PERCENTILE:g} is known; "
+          f"breaker {main.PROVIDER_FAILURE_THRESHOLD} failures / {args.reset_timeout:g} s; "
+          f"slow over {main.LLM_SLOW_MS:.0f} ms (LLM) / {main.TTS_SLOW_MS:.0f} ms (TTS) in a {args.window:g} s window\n")
+    for stage in args.stages.split(","):
+        print(f"{stage.upper():<10}{'':<10}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'failed':>8}"
+              f"{'2nd':>7}{'hedges':>8}{'trips':>7}")
+        for scenario in args.scenarios.split(","):
+            for config in CONFIGS:
+                r = await run(stage, config, scenario, args)
+                print(f"{scenario:<10}{config:<10}{r['p50']:>8.0f}{r['p95']:>8.0f}{r['p99']:>8.0f}{r['max']:>8.0f}"
+                      f"{r['failed']:>8}{r['secondary']:>7.0%}{r['hedges']:>8}{r['trips']:>7}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", default="llm,tts")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--secondary", choices=("same", "local"), default="same",
+                        help="a second Gemini model / Murf voice, or the local template LLM / tone TTS")
+    parser.add_argument("--requests", type=int, default=360)
+    parser.add_argument("--rate", type=float, default=30.0)
+    parser.add_argument("--llm-delay", type=float, default=0.35)
+    parser.add_argument("--tts-delay", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tail-prob", type=float, default=0.05)
+    parser.add_argument("--tail-delay", type=float, default=2.0)
+    parser.add_argument("--brownout-delay", type=float, default=3.0)
+    parser.add_argument("--reset-timeout", type=float, default=2.0)
+    parser.add_argument("--window", type=float, default=3.0, help="provider latency window (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
@@ -0,0 +1,137 @@
+"""Response cache for generic Gemini questions: hit rate, wrong answers served, lookup cost, turn latency.
+
+A synthetic workload draws questions from groups of paraphrases ("what's the
+capital of France" / "capital of france?") with a Zipf popularity skew, so
+popular questions repeat the way they do in production. Neighbouring groups
+differ in one word ("... of Spain"), which is what a similarity match must
+not confuse, and some questions are time sensitive and must never be cached.
+Every cached answer is tagged with its group, so a hit from the wrong group
+counts as a wrong answer served. The last section runs stream_llm_response
+against the fake Gemini stream to show what a hit saves per turn.
+
+    python benchmarks/bench_response_cache.py --queries 3000 --similarity 0.9
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache  # noqa: E402
+
+
+TEMPLATES = {
+    "capital": (["Italy", "France", "Spain", "Japan", "Kenya", "Peru", "Canada", "Egypt", "Norway", "Chile"],
+                ["What is the capital of {x}?", "what's the capital of {x}", "capital of {x}?",
+                 "Tell me the capital of {x}", "{x} ki capital kya hai?"]),
+    "recipe": (["chai", "biryani", "pav bhaji", "dosa", "vada pav", "poha", "kheer", "upma"],
+               ["How do I make {x}?", "how to make {x}", "{x} kaise banate hain?", "How do you make {x}",
+                "{x} recipe please"]),
+    "joke": (["cats", "dogs", "doctors", "engineers", "teachers", "cricket", "traffic"],
+             ["Tell me a joke about {x}", "joke about {x} please", "Tell me a {x} joke", "ek {x} joke sunao"]),
+    "author": (["the Ramayana", "the Mahabharata", "Gitanjali", "Godaan", "Malgudi Days", "Train to Pakistan"],
+               ["Who wrote {x}?", "who is the author of {x}", "{x} kisne likha?", "Who wrote {x}"]),
+    "explain": (["photosynthesis", "gravity", "inflation", "black holes", "vaccines", "monsoon", "blockchain"],
+                ["Explain {x} in simple words", "what is {x}?", "Explain {x}", "{x} kya hota hai?",
+                 "Tell me about {x}"]),
+}
+TIME_SENSITIVE = ["What's the weather in {x} today?", "latest news about {x}", "{x} mein abhi kya ho raha hai",
+                  "What is the score of the {x} match now?"]
+PLACES = ["Mumbai", "Delhi", "Pune", "Goa", "Chennai"]
+
+
+def build_groups():
+    groups = []
+    for kind, (subjects, templates) in TEMPLATES.items():
+        for subject in subjects:
+            groups.append((f"{kind}:{subject}", [t.format(x=subject) for t in templates], True))
+    for template in TIME_SENSITIVE:
+        for place in PLACES:
+            groups.append((f"live:{template}:{place}", [template.format(x=place)], False))
+    return groups
+
+
+def workload(groups, queries, seed=7):
+    rng = random.Random(seed)
+    order = list(range(len(groups)))
+    rng.shuffle(order)
+    # Zipf(1.1) popularity over groups
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(len(groups))]
+    picks = rng.choices(order, weights=weights, k=queries)
+    return [(groups[i][0], rng.choice(groups[i][1]), groups[i][2]) for i in picks]
+
+
+def run_cache(cache, queries):
+    stats = {"hits": 0, "wrong": 0, "live_cached": 0}
+    lookup_us = []
+    for label, text, cacheable in queries:
+        started = time.perf_counter()
+        answer = cache.lookup(text) if cache is not None else None
+        lookup_us.append((time.perf_counter() - started) * 1e6)
+        if answer is not None:
+            stats["hits"] += 1
+            stats["wrong"] += answer != label
+            stats["live_cached"] += not cacheable
+        elif cache is not None:
+            cache.store(text, label)
+    return stats, sorted(lookup_us)
+
+
+async def turn_latency(similarity):
+    import main
+    from mock_servers import FakeClientWebSocket, install_fake_gemini
+
+    install_fake_gemini(main)
+    main.response_cache = ResponseCache(similarity=similarity)
+    results = {}
+    for label, question in (("miss (Gemini)", "What is the capital of Peru?"),
+                            ("exact hit", "what is the capital of peru"),
+                            ("similar hit", "Tell me the capital of Peru")):
+        client = FakeClientWebSocket()
+        await main.stream_llm_response(question, f"bench_{label}", client, "fake-gemini", None)
+        await main.session_store.delete(f"bench_{label}")
+        results[label] = (client.first("LLMStreamChunk"), client.first("LLMStreamComplete"))
+    return results
+
+
+def bench(queries, similarity, maxsize):
+    groups = build_groups()
+    stream = workload(groups, queries)
+    print(f"{queries} questions from {len(groups)} groups ({sum(1 for g in groups if not g[2])} time sensitive), "
+          f"cache size {maxsize}\n")
+    print(f"{'mode':<26}{'hit rate':>9}{'wrong answers':>15}{'live cached':>13}{'lookup p50 us':>15}{'p99 us':>9}")
+    for label, cache in (("no cache", None),
+                         ("exact", ResponseCache(maxsize=maxsize)),
+                         (f"similarity >= {similarity}", ResponseCache(maxsize=maxsize, similarity=similarity))):
+        stats, lookup_us = run_cache(cache, stream)
+        p50 = statistics.median(lookup_us)
+        p99 = lookup_us[min(len(lookup_us) - 1, len(lookup_us) * 99 // 100)]
+        print(f"{label:<26}{stats['hits'] / queries * 100:>8.1f}%{stats['wrong']:>15}{stats['live_cached']:>13}"
+              f"{p50:>15.1f}{p99:>9.1f}")
+
+    # Lookup cost with a full similarity index
+    full = ResponseCache(maxsize=maxsize, similarity=similarity)
+    for i in range(maxsize):
+        full.store(f"synthetic question number {i} about topic {i * 7919 % 104729}", "answer")
+    started = time.perf_counter()
+    for _ in range(200):
+        full.lookup("a question that is not in the cache at all")
+    print(f"\nsimilarity lookup with {maxsize} cached entries: {(time.perf_counter() - started) / 200 * 1e6:.0f} us\n")
+
+    print(f"{'turn':<16}{'first chunk ms':>16}{'complete ms':>13}")
+    for label, (first, done) in asyncio.run(turn_latency(similarity)).items():
+        print(f"{label:<16}{first * 1000:>16.1f}{done * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--similarity", type=float, default=0.9)
+    parser.add_argument("--maxsize", type=int, default=1000)
+    args = parser.parse_args()
+    bench(args.queries, args.similarity, args.maxsize)
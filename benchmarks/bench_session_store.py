@@ -0,0 +1,97 @@
+"""Chat history memory and prompt size: unbounded per-session histories vs the windowed session store.
+
+Simulates many long voice sessions. The baseline keeps every exchange, as
+the old chat_histories dict of ChatSession objects did. The store keeps a
+window of recent turns and evicts sessions past its limit. If fakeredis is
+installed, the same workload also runs against the Redis backend, with two
+stores sharing one fake server to stand in for two uvicorn workers.
+
+    python benchmarks/bench_session_store.py --sessions 500 --turns 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import SessionStore, MemorySessionBackend, RedisSessionBackend  # noqa: E402
+from ttl_cache import approx_size  # noqa: E402
+
+
+QUESTION = "Bhai, Mumbai mein aaj baarish hogi kya? Aur local train time pe chalegi?"
+ANSWER = ("Arre boss, Mumbai ki baarish kabhi time pe nahi aati, lekin local train ke liye log hamesha "
+          "time pe aate hain. Chhatri le ke nikalna, warna bheeg jaoge, bole toh ekdum jhakas!")
+
+
+def prompt_chars(history):
+    return sum(len(part) for message in history for part in message["parts"])
+
+
+def unbounded(sessions, turns):
+    histories = {}
+    for turn in range(turns):
+        for s in range(sessions):
+            history = histories.setdefault(f"s{s}", [])
+            history.append({"role": "user", "parts": [f"{QUESTION} ({turn})"]})
+            history.append({"role": "model", "parts": [f"{ANSWER} ({turn})"]})
+    return approx_size(histories), prompt_chars(histories["s0"])
+
+
+async def windowed(store, sessions, turns):
+    started = time.perf_counter()
+    for turn in range(turns):
+        for s in range(sessions):
+            await store.append(f"s{s}", f"{QUESTION} ({turn})", f"{ANSWER} ({turn})")
+    elapsed = time.perf_counter() - started
+    stats = await store.stats()
+    history = await store.get_history(f"s{sessions - 1}")
+    # One-off sessions past the limit push the oldest sessions out
+    for s in range(sessions, store.backend.max_sessions + sessions // 10):
+        await store.append(f"s{s}", QUESTION, ANSWER)
+    evictions = (await store.stats())["evictions"]
+    return stats, prompt_chars(history), elapsed / (sessions * turns) * 1e6, evictions
+
+
+async def bench(sessions, turns, max_sessions, max_turns):
+    print(f"{sessions} sessions x {turns} turns (store: max {max_sessions} sessions, {max_turns} turns each),\n"
+          f"then one-off sessions until {sessions // 10} past the limit\n")
+    total, chars = unbounded(sessions, turns)
+    print(f"{'history':<16}{'sessions':>10}{'total KB':>11}{'KB/session':>12}{'prompt chars':>14}{'µs/append':>11}")
+    print(f"{'unbounded':<16}{sessions:>10}{total / 1024:>11.0f}{total / sessions / 1024:>12.1f}{chars:>14}{'-':>11}")
+
+    store = SessionStore(MemorySessionBackend(max_sessions, idle_ttl=3600), max_turns=max_turns)
+    stats, chars, per_op, evictions = await windowed(store, sessions, turns)
+    print(f"{'store (memory)':<16}{stats['sessions']:>10}{stats['memory_bytes'] / 1024:>11.0f}"
+          f"{stats['avg_session_bytes'] / 1024:>12.1f}{chars:>14}{per_op:>11.1f}")
+    print(f"  turns trimmed {stats['turns_trimmed']}, evictions after the one-off sessions {evictions}")
+
+    try:
+        import fakeredis
+    except ImportError:
+        print("\nfakeredis not installed; skipping the Redis backend (pip install fakeredis)")
+        return
+    server = fakeredis.FakeServer()
+    workers = [SessionStore(RedisSessionBackend(fakeredis.FakeAsyncRedis(server=server), max_sessions, idle_ttl=3600),
+                            max_turns=max_turns) for _ in range(2)]
+    stats, chars, per_op, evictions = await windowed(workers[0], sessions, turns)
+    print(f"{'store (redis)':<16}{stats['sessions']:>10}{stats['memory_bytes'] / 1024:>11.0f}"
+          f"{stats['avg_session_bytes'] / 1024:>12.1f}{chars:>14}{per_op:>11.1f}")
+    # A turn written by one worker is visible to the other
+    await workers[0].append("shared", QUESTION, ANSWER)
+    await workers[1].append("shared", QUESTION, ANSWER)
+    print(f"  evictions after the one-off sessions {evictions}; 'shared' session seen by both workers: "
+          f"{len(await workers[0].get_history('shared')) // 2} turns")
+    for worker in workers:
+        await worker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--max-turns", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(bench(args.sessions, args.turns, args.max_sessions, args.max_turns))
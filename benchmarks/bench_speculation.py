@@ -0,0 +1,215 @@
+"""Speculative replies: how often a reply started on the unformatted transcript is kept, and what it saves.
+
+The app runs in-process under uvicorn with Gemini faked (--llm-delay to the
+first token) and Murf and TMDB as local mock servers. AssemblyAI is
+MockAssemblyAIReplayServer, replaying recorded v3 message sequences: partial
+Turns every 100 ms while words come in, the unformatted end of turn once the
+speaker has been quiet for the endpointing delay, and the formatted Turn a
+little later. The built-in recordings cover Gemini questions, a TMDB movie,
+a calculation, a mid-sentence pause and a turn whose formatting rewrites
+numbers; --turns takes a JSON file of real recordings instead (a list of
+turns, each a list of [offset_ms, message]).
+
+Every round plays all turns over one /ws session with speculation off, then
+on. Latency is from the unformatted end of turn (when AssemblyAI knew the
+user had stopped) to the first reply text and the first reply audio at the
+client.
+
+Before that it checks the counters on a prefetched Gemini reply: used, it is
+committed; found stale (the history moved on after it was started), it is
+counted as stale and not as committed. It exits 1 if they are off.
+
+    python benchmarks/bench_speculation.py --rounds 3 --llm-delay 0.5 --stable-partials 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import uvicorn
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import MockAssemblyAIReplayServer, MockMurfServer, MockTMDBServer, install_fake_gemini  # noqa: E402
+from speculation import SpeculationStats, Speculator  # noqa: E402
+from ttl_cache import AsyncTTLCache  # noqa: E402
+
+
+# (what AssemblyAI hears, word by word; "|" is a mid-sentence pause) -> formatted transcript
+UTTERANCES = [
+    ("mumbai ki baarish ke baare mein kya sochte ho", "Mumbai ki baarish ke baare mein kya sochte ho?"),
+    ("what is the capital of france", "What is the capital of France?"),
+    ("tell me a joke | about cricket", "Tell me a joke about cricket."),
+    ("lagaan movie ka dialogue batao", "Lagaan movie ka dialogue batao."),
+    ("twelve plus thirty kitna hota hai", "12 plus 30 kitna hota hai?"),
+    ("chai kaisi banate hain", "Chai kaise banate hain?"),
+    ("how much is two thousand five hundred rupees in dollars", "How much is ₹2,500 in dollars?"),
+    ("who wrote the ramayana", "Who wrote the Ramayana?"),
+]
+
+
+def record_turn(order, spoken, formatted, rng, partial_ms=100):
+    """A v3 message sequence for one turn, timed like a live session"""
+    words, t, finals = [], 0.0, []
+    for token in spoken.split():
+        if token == "|":
+            t += rng.uniform(350, 450)
+            continue
+        t += rng.uniform(180, 320)
+        words.append(token)
+        finals.append(t)
+    end_of_turn = finals[-1] + rng.uniform(400, 700)
+    messages, tick = [], partial_ms
+    while tick < end_of_turn:
+        heard = sum(1 for final in finals if final <= tick)
+        if heard:
+            messages.append([round(tick), {"type": "Turn", "turn_order": order, "turn_is_formatted": False,
+                                           "end_of_turn": False, "transcript": " ".join(words[:heard])}])
+        tick += partial_ms
+    messages.append([round(end_of_turn), {"type": "Turn", "turn_order": order, "turn_is_formatted": False,
+                                          "end_of_turn": True, "transcript": " ".join(words)}])
+    messages.append([round(end_of_turn + rng.uniform(150, 350)), {
+        "type": "Turn", "turn_order": order, "turn_is_formatted": True, "end_of_turn": True, "transcript": formatted}])
+    return messages
+
+
+def end_of_turn_index(turn):
+    return next(i for i, (_, m) in enumerate(turn) if m.get("end_of_turn") and not m.get("turn_is_formatted"))
+
+
+async def session(url, turns, timeout):
+    """Per turn: perf_counter times of the first reply text and the first reply audio"""
+    results = [{} for _ in turns]
+    turn = -1
+    async with websockets.connect(url, max_size=None) as ws:
+        deadline = time.perf_counter() + timeout
+        completed = 0
+        while completed < len(turns):
+            try:
+                raw = await asyncio.wait_for(ws.recv(), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                break
+            # Binary frames are reply audio
+            kind = "MurfAudioChunk" if isinstance(raw, bytes) else json.loads(raw).get("type")
+            if kind == "EndOfTurnTranscript":
+                turn += 1
+            elif kind == "LLMStreamChunk":
+                results[turn].setdefault("text", time.perf_counter())
+            elif kind == "MurfAudioChunk":
+                results[turn].setdefault("audio", time.perf_counter())
+            elif kind == "MurfStreamComplete":
+                completed += 1
+    return results
+
+
+async def check_counters() -> bool:
+    install_fake_gemini(main, first_token_delay=0.01)
+    main.speculation_stats = stats = SpeculationStats()
+    outcomes = []
+    for i, history in enumerate(([], [{"role": "user", "parts": ["pehle wala sawaal"]}])):
+        session_id = f"check_{i}"
+        speculator = Speculator(lambda text: main.PreparedReply(text, session_id, "fake", "fake"), stats=stats)
+        speculator.observe({"transcript": "chai kaise banate hain", "end_of_turn": True})
+        prepared = speculator.take("Chai kaise banate hain?")
+        # A new session's stored history is empty: the first reply is current, the second is stale
+        outcomes.append(await prepared.chat_reply(history) is not None)
+        prepared.cancel()
+    summary = stats.stats()
+    ok = (outcomes == [True, False] and summary["started"] == 2 and summary["committed"] == 1
+          and summary["stale"] == 1 and summary["commit_ratio"] == 0.5
+          and sum(counts["committed"] for counts in summary["by_trigger"].values()) == 1)
+    print(f"counter check: used {outcomes}, {summary['committed']} committed, {summary['stale']} stale, "
+          f"commit ratio {summary['commit_ratio']}")
+    return ok
+
+
+async def bench(args):
+    rng = random.Random(args.seed)
+    if args.turns:
+        with open(args.turns) as f:
+            turns = json.load(f)
+        labels = [t[end_of_turn_index(t) + 1][1]["transcript"] for t in turns]
+    else:
+        turns = [record_turn(i, spoken, formatted, rng) for i, (spoken, formatted) in enumerate(UTTERANCES)]
+        labels = [formatted for _, formatted in UTTERANCES]
+
+    install_fake_gemini(main, first_token_delay=args.llm_delay)
+    main.SPECULATIVE_STABLE_PARTIALS = args.stable_partials
+    main.SPECULATIVE_MIN_SIMILARITY = args.min_similarity
+    gap = args.llm_delay + args.tmdb_delay + args.murf_delay + 2.0
+    async with MockAssemblyAIReplayServer(turns, gap=gap) as aai, \
+            MockMurfServer(synth_delay=args.murf_delay) as murf, \
+            MockTMDBServer(response_delay=args.tmdb_delay, title="Lagaan") as tmdb:
+        main.ASSEMBLYAI_WS_URL, main.MURF_WS_URL, main.TMDB_API_URL = aai.url, murf.url, tmdb.url
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        url = (f"ws://127.0.0.1:{port}/ws?assemblyai_key=fake&murf_key=fake&gemini_key=fake&tmdb_key=fake"
+               f"&audio_transport=binary")
+
+        latency = {mode: [[] for _ in turns] for mode in ("off", "on")}
+        stats = SpeculationStats()
+        timeout = len(turns) * (gap + 5)
+        for _ in range(args.rounds):
+            for mode in ("off", "on"):
+                main.SPECULATIVE_REPLY = mode == "on"
+                main.speculation_stats = stats
+                # Movie lookups must not be served from the previous run's cache
+                main.dialogue_cache = AsyncTTLCache()
+                results = await session(url, turns, timeout)
+                sent = aai.sent[-1]
+                for i, (turn, result) in enumerate(zip(turns, results)):
+                    spoke = sent[i][end_of_turn_index(turn)] if i < len(sent) else None
+                    if spoke is not None and "text" in result and "audio" in result:
+                        latency[mode][i].append(((result["text"] - spoke) * 1000, (result["audio"] - spoke) * 1000))
+
+        server.should_exit = True
+        await serving
+        await main.murf_pool.close()
+
+    def median(samples, index):
+        return statistics.median(s[index] for s in samples) if samples else float("nan")
+
+    print(f"{len(turns)} recorded turns x {args.rounds} rounds; Gemini first token {args.llm_delay * 1000:.0f} ms, "
+          f"TMDB {args.tmdb_delay * 1000:.0f} ms, Murf {args.murf_delay * 1000:.0f} ms; "
+          f"stable partials {args.stable_partials}, min similarity {args.min_similarity}\n")
+    print(f"{'turn (formatted)':<46}{'first text ms':>16}{'first audio ms':>16}{'saved':>8}")
+    print(f"{'':<46}{'off':>8}{'on':>8}{'off':>8}{'on':>8}{'ms':>8}")
+    saved = []
+    for label, off, on in zip(labels, latency["off"], latency["on"]):
+        saved.append(median(off, 1) - median(on, 1))
+        print(f"{label[:45]:<46}{median(off, 0):>8.0f}{median(on, 0):>8.0f}{median(off, 1):>8.0f}"
+              f"{median(on, 1):>8.0f}{saved[-1]:>8.0f}")
+    summary = stats.stats()
+    print(f"\nfirst audio saved: median {statistics.median(saved):.0f} ms, mean {statistics.mean(saved):.0f} ms per turn")
+    print(f"speculations: {summary['started']} started, {summary['committed']} committed, {summary['wasted']} wasted, "
+          f"{summary['stale']} stale (commit ratio {summary['commit_ratio']:.0%}); head start avg "
+          f"{summary['head_start_ms_avg']:.0f} ms")
+    for trigger, counts in summary["by_trigger"].items():
+        print(f"  {trigger:<16}{counts['started']:>4} started{counts['committed']:>5} committed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--llm-delay", type=float, default=0.5)
+    parser.add_argument("--tmdb-delay", type=float, default=0.2)
+    parser.add_argument("--murf-delay", type=float, default=0.25)
+    parser.add_argument("--stable-partials", type=int, default=main.SPECULATIVE_STABLE_PARTIALS)
+    parser.add_argument("--min-similarity", type=float, default=main.SPECULATIVE_MIN_SIMILARITY)
+    parser.add_argument("--turns", help="JSON file of recorded turns to replay instead of the built-in ones")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+    if not asyncio.run(check_counters()):
+        print("FAIL: speculation counters don't match what was used")
+        sys.exit(1)
+    asyncio.run(bench(args))
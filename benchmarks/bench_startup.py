@@ -0,0 +1,163 @@
+"""Cold start: how long `import main` takes and how soon a fresh server answers its first request.
+
+Import time is the wall time of `import main` in a fresh interpreter per
+run (median of --runs); "main + SDKs" also imports every lazily loaded
+provider SDK (sdk_loader.prewarm), which is what the import cost before the
+SDKs were made lazy. A `python -X importtime -c "import main"` run lists the
+biggest of main's own imports. Time to first request starts a
+uvicorn process on main:app and polls /stats until it answers, with
+SDK_PREWARM off and on; with it on, "SDKs warm" is when /stats reports
+every SDK loaded by the background pre-warm. No API keys are needed and
+nothing touches the network.
+
+As a regression check, --max-import-ms / --max-first-request-ms fail the run
+(exit 1) above fixed limits, and --baseline compares against a JSON file
+written by an earlier --output, failing when a median grows by more than
+--tolerance.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.25 --max-import-ms 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_load import free_port  # noqa: E402
+
+
+def parse_importtime(stderr: str, module: str = "main"):
+    """(cumulative ms of module, [(cumulative ms, name)] of the imports it triggered directly)"""
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return int(cumulative) / 1000, sorted(children, reverse=True)
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def python(*argv) -> subprocess.CompletedProcess:
+    result = subprocess.run([sys.executable, *argv], cwd=ROOT, capture_output=True, text=True,
+                            env={**os.environ, "LOG_LEVEL": "WARNING"})
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result
+
+
+def measure_import(statement: str) -> float:
+    """Wall ms of running statement in a fresh interpreter (interpreter startup itself not included)"""
+    code = f"import time; started = time.perf_counter(); {statement}; print((time.perf_counter() - started) * 1000)"
+    return float(python("-c", code).stdout.strip().splitlines()[-1])
+
+
+async def measure_first_request(prewarm: bool, timeout: float = 60.0):
+    """Milliseconds from spawning uvicorn to the first /stats answer, and to all SDKs loaded (if pre-warming)"""
+    port = free_port()
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "SDK_PREWARM": "true" if prewarm else "false"}
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_request = sdks_warm = None
+    try:
+        async with httpx.AsyncClient() as http:
+            while time.perf_counter() - started < timeout:
+                try:
+                    stats = (await http.get(f"http://127.0.0.1:{port}/stats")).json()
+                except httpx.TransportError:
+                    await asyncio.sleep(0.005)
+                    continue
+                if first_request is None:
+                    first_request = time.perf_counter() - started
+                if not prewarm:
+                    break
+                if all(module["loaded"] for module in stats["sdk_modules"].values()):
+                    sdks_warm = time.perf_counter() - started
+                    break
+                await asyncio.sleep(0.01)
+    finally:
+        process.terminate()
+        await process.wait()
+    if first_request is None:
+        raise RuntimeError(f"server did not answer within {timeout:.0f} s")
+    return first_request * 1000, sdks_warm * 1000 if sdks_warm is not None else None
+
+
+async def run(args):
+    results = {}
+    _, top = parse_importtime(python("-X", "importtime", "-c", "import main").stderr)
+    samples = {"import_ms": [], "import_with_sdks_ms": []}
+    for _ in range(args.runs):
+        samples["import_ms"].append(measure_import("import main"))
+        samples["import_with_sdks_ms"].append(measure_import("import main, sdk_loader; sdk_loader.prewarm()"))
+    for mode in ("off", "on"):
+        samples[f"first_request_ms_prewarm_{mode}"] = []
+        for _ in range(args.runs):
+            first_request, sdks_warm = await measure_first_request(mode == "on")
+            samples[f"first_request_ms_prewarm_{mode}"].append(first_request)
+            if sdks_warm is not None:
+                samples.setdefault("sdks_warm_ms", []).append(sdks_warm)
+    for key, values in samples.items():
+        results[key] = round(statistics.median(values), 1)
+
+    print(f"{args.runs} runs each, medians ({sys.executable})\n")
+    print(f"import main                     {results['import_ms']:>8.0f} ms")
+    print(f"import main + SDKs (old eager)  {results['import_with_sdks_ms']:>8.0f} ms")
+    print(f"first request, SDK_PREWARM=off  {results['first_request_ms_prewarm_off']:>8.0f} ms")
+    print(f"first request, SDK_PREWARM=on   {results['first_request_ms_prewarm_on']:>8.0f} ms")
+    if "sdks_warm_ms" in results:
+        print(f"SDKs warm,     SDK_PREWARM=on   {results['sdks_warm_ms']:>8.0f} ms")
+    print("\nlargest imports under main (-X importtime, cumulative):")
+    for cumulative, name in top[:args.top]:
+        print(f"  {name:<32}{cumulative:>8.1f} ms")
+
+    failures = []
+    if args.max_import_ms and results["import_ms"] > args.max_import_ms:
+        failures.append(f"import main {results['import_ms']:.0f} ms > {args.max_import_ms:.0f} ms")
+    for mode in ("off", "on"):
+        value = results[f"first_request_ms_prewarm_{mode}"]
+        if args.max_first_request_ms and value > args.max_first_request_ms:
+            failures.append(f"first request (pre-warm {mode}) {value:.0f} ms > {args.max_first_request_ms:.0f} ms")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key, value in results.items():
+            if key in baseline and value > baseline[key] * (1 + args.tolerance):
+                failures.append(f"{key} {value:.0f} ms > baseline {baseline[key]:.0f} ms + {args.tolerance:.0%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="how many of main's imports to list")
+    parser.add_argument("--max-import-ms", type=float, help="fail if importing main takes longer")
+    parser.add_argument("--max-first-request-ms", type=float, help="fail if the first request takes longer")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed growth over the baseline")
+    parser.add_argument("--output", help="write the results as JSON (to use as a later --baseline)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
@@ -0,0 +1,63 @@
+"""TMDB lookup latency: a fresh httpx.AsyncClient per call vs the shared client.
+
+Runs against a local stub TMDB server that charges a fixed delay for every
+new TCP connection (standing in for DNS + TCP + TLS to the real API).
+
+    python benchmarks/bench_tmdb_client.py --lookups 30
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+from mock_servers import MockTMDBServer  # noqa: E402
+
+
+# The pre-shared-client implementation, kept here as the baseline
+async def search_with_fresh_client(movie_name, tmdb_api_key):
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{main.TMDB_API_URL}/search/movie",
+                                    params={"api_key": tmdb_api_key, "query": movie_name, "language": "hi-IN"})
+        if response.status_code == 200 and response.json()["results"]:
+            return response.json()["results"][0]
+
+
+async def timed(lookup, n):
+    samples = []
+    for i in range(n):
+        started = time.perf_counter()
+        result = await lookup(f"movie {i}", "fake-tmdb")
+        samples.append((time.perf_counter() - started) * 1000)
+        assert result and result["title"], "lookup failed"
+    return samples
+
+
+async def bench(lookups, connect_delay):
+    async with MockTMDBServer(connect_delay=connect_delay) as tmdb:
+        main.TMDB_API_URL = tmdb.url
+        print(f"stub connect cost: {connect_delay * 1000:.0f} ms, response time: {tmdb.response_delay * 1000:.0f} ms\n")
+        print(f"{'client':<16}{'p50 ms':>10}{'p95 ms':>10}{'connections':>14}")
+        rows = {}
+        for label, lookup in (("fresh per call", search_with_fresh_client), ("shared", main.search_movie_tmdb)):
+            tmdb.connections = 0
+            samples = await timed(lookup, lookups)
+            rows[label] = statistics.median(samples)
+            print(f"{label:<16}{rows[label]:>10.1f}{statistics.quantiles(samples, n=20)[-1]:>10.1f}{tmdb.connections:>14}")
+        print(f"\nsaved per lookup (p50): {rows['fresh per call'] - rows['shared']:.1f} ms")
+        await main.get_http_client().aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=30)
+    parser.add_argument("--connect-delay", type=float, default=0.08)
+    args = parser.parse_args()
+    asyncio.run(bench(args.lookups, args.connect_delay))
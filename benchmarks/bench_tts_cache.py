@@ -0,0 +1,135 @@
+"""TTS audio cache for fixed phrases and skill replies: pre-warm, hit rate, and served latency on hits.
+
+Murf is faked on both paths: the blocking REST client (/agent/chat) sleeps
+for --murf-delay, and the stream-input WebSocket (/ws) is the local mock
+server. The cache lives in a temp directory. After pre-warming the static
+phrases, a mixed workload of fixed replies (no-speech, error fallback, movie
+dialogues) and calculation results goes through synthesize_chunks, the same
+path /agent/chat uses, to get hit rates per reply kind. Served latency is
+measured for a REST reply (time to its audio URL, then GET /tts-cache/{key}
+through the ASGI app) and for a /ws reply (time to the first audio chunk).
+
+    python benchmarks/bench_tts_cache.py --requests 300 --murf-delay 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import providers  # noqa: E402
+from blocking_pool import BlockingCallPool  # noqa: E402
+from mock_servers import FakeClientWebSocket, FakeMurf, MockMurfServer  # noqa: E402
+from tts_cache import AudioCache  # noqa: E402
+
+
+def workload(requests, seed=11):
+    rng = random.Random(seed)
+    dialogues = [text for text in main.static_replies() if text.kind == "movie_dialogue"]
+    replies = []
+    for _ in range(requests):
+        roll = rng.random()
+        if roll < 0.45:
+            replies.append(rng.choice(dialogues))
+        elif roll < 0.65:
+            replies.append(main.StaticText(main.NO_SPEECH_REPLY, "no_speech"))
+        elif roll < 0.7:
+            replies.append(main.StaticText(main.FALLBACK_ERROR_REPLY, "error_fallback"))
+        else:
+            a, b = rng.randint(1, 6), rng.randint(1, 6)
+            replies.append(main.StaticText(main.perform_calculation(f"{a} plus {b}")["response"], "calculation"))
+    return replies
+
+
+async def rest_reply(text):
+    started = time.perf_counter()
+    async for _, audio_url, timing in main.synthesize_chunks([text], "fake-key", cache_kind=text.kind):
+        return (time.perf_counter() - started) * 1000, audio_url
+
+
+async def ws_reply(text):
+    client = FakeClientWebSocket()
+    await main.stream_to_murf_websocket(text, "bench_tts_cache", client, "fake-key")
+    return client.first("MurfAudioChunk") * 1000
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, len(samples) * 99 // 100)]
+
+
+async def bench(requests, murf_delay, rounds):
+    providers.murf.Murf = type("BenchMurf", (FakeMurf,), {"delay": murf_delay})
+    main.sdk_pool = BlockingCallPool(max_workers=8, queue_depth=0)
+    phrase = main.StaticText(main.static_replies()[3], "movie_dialogue")
+
+    async with MockMurfServer(synth_delay=murf_delay) as murf:
+        main.MURF_WS_URL = murf.url.split("?")[0]
+        with tempfile.TemporaryDirectory() as directory:
+            # Without the cache every fixed reply is synthesized from scratch
+            main.audio_cache = None
+            rest_miss = [(await rest_reply(phrase))[0] for _ in range(rounds)]
+            ws_miss = [await ws_reply(phrase) for _ in range(rounds)]
+
+            main.audio_cache = AudioCache(directory)
+            started = time.perf_counter()
+            await main.prewarm_tts_cache("fake-key", concurrency=4)
+            prewarm_s = time.perf_counter() - started
+            prewarmed = main.audio_cache.stats()
+            print(f"pre-warm: {prewarmed['entries']} entries ({prewarmed['bytes'] / 1e6:.1f} MB) in {prewarm_s:.1f} s "
+                  f"with fake Murf at {murf_delay * 1000:.0f} ms\n")
+
+            rest_hit = [(await rest_reply(phrase))[0] for _ in range(rounds)]
+            ws_hit = [await ws_reply(phrase) for _ in range(rounds)]
+            _, audio_url = await rest_reply(phrase)
+            transport = httpx.ASGITransport(app=main.app)
+            fetch_ms = []
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    response = await client.get(audio_url)
+                    fetch_ms.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200 and response.content[:4] == b"RIFF"
+
+            print(f"{'served latency':<36}{'p50 ms':>9}{'p99 ms':>9}")
+            for label, samples in (("REST audio URL, no cache", rest_miss), ("REST audio URL, cache hit", rest_hit),
+                                   ("GET /tts-cache/{key}", fetch_ms),
+                                   ("/ws first audio chunk, no cache", ws_miss),
+                                   ("/ws first audio chunk, cache hit", ws_hit)):
+                p50, p99 = summary(samples)
+                print(f"{label:<36}{p50:>9.2f}{p99:>9.2f}")
+
+            # Mixed traffic after pre-warm: fixed replies hit, calculations fill in as they repeat
+            main.audio_cache = AudioCache(directory)
+            replies = workload(requests)
+            started = time.perf_counter()
+            for i in range(0, len(replies), 20):
+                await asyncio.gather(*(rest_reply(text) for text in replies[i:i + 20]))
+            elapsed = time.perf_counter() - started
+            stats = main.audio_cache.stats()
+            print(f"\n{requests} /agent/chat replies in {elapsed:.1f} s, hit rate {stats['hit_ratio'] * 100:.0f}% "
+                  f"({stats['stores']} synthesized and stored)")
+            print(f"{'kind':<18}{'hits':>6}{'misses':>8}{'hit rate':>10}")
+            for kind, counts in sorted(stats["by_kind"].items()):
+                total = counts["hits"] + counts["misses"]
+                print(f"{kind:<18}{counts['hits']:>6}{counts['misses']:>8}{counts['hits'] / total * 100:>9.0f}%")
+    await main.murf_pool.close()
+    main.sdk_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--murf-delay", type=float, default=0.3)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.murf_delay, args.rounds))
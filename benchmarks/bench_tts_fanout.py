@@ -0,0 +1,67 @@
+"""/agent/chat TTS for long replies: chunks synthesized one at a time vs concurrently (fan-out).
+
+Uses a fake blocking Murf client whose synthesis time grows with the chunk
+length, and runs the same synthesize_chunks() path /agent/chat uses, so both
+the all-chunks time (JSON response) and the first-chunk time (NDJSON stream)
+are measured.
+
+    python benchmarks/bench_tts_fanout.py --chunks 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main  # noqa: E402
+import providers  # noqa: E402
+from blocking_pool import BlockingCallPool  # noqa: E402
+from mock_servers import FakeMurf  # noqa: E402
+
+
+class PacedMurf(FakeMurf):
+    delay = 0.25
+    per_char_delay = 0.0004
+
+
+def reply_chunks(count, chars_per_chunk=600):
+    sentence = "Arre boss, Mumbai ki baarish kabhi time pe nahi aati, lekin local train hamesha bhari rehti hai. "
+    chunk = (sentence * (chars_per_chunk // len(sentence) + 1))[:chars_per_chunk]
+    return [chunk] * count
+
+
+async def timed(chunks, fanout):
+    started = time.perf_counter()
+    first = None
+    order = []
+    async for index, audio_url, timing in main.synthesize_chunks(chunks, "fake-key", fanout=fanout):
+        if first is None:
+            first = time.perf_counter() - started
+        order.append(index)
+    assert order == list(range(len(chunks))), order
+    return first * 1000, (time.perf_counter() - started) * 1000
+
+
+async def bench(chunk_counts, fanout):
+    providers.murf.Murf = PacedMurf
+    main.sdk_pool = BlockingCallPool(max_workers=max(fanout, 4), queue_depth=0)
+    print(f"fake Murf: {PacedMurf.delay * 1000:.0f} ms + {PacedMurf.per_char_delay * 1e6:.0f} µs/char, "
+          f"600-char chunks, fan-out {fanout}\n")
+    print(f"{'chunks':>6}{'sequential ms':>16}{'fan-out ms':>13}{'first chunk ms':>17}{'speedup':>10}")
+    for count in chunk_counts:
+        chunks = reply_chunks(count)
+        _, sequential = await timed(chunks, fanout=1)
+        first, parallel = await timed(chunks, fanout=fanout)
+        print(f"{count:>6}{sequential:>16.0f}{parallel:>13.0f}{first:>17.0f}{sequential / parallel:>9.1f}x")
+    main.sdk_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--fanout", type=int, default=main.TTS_FANOUT)
+    args = parser.parse_args()
+    asyncio.run(bench(args.chunks, args.fanout))
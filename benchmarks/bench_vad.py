@@ -0,0 +1,159 @@
+"""Silence gating before AssemblyAI: bytes saved and CPU cost of the VAD per stream.
+
+Each WAV fixture (16 kHz mono 16-bit) is fed through VoiceActivityGate in
+20 ms frames, the way the browser sends it. Reported: audio forwarded
+upstream vs received, the share of each fixture that is labelled speech (the
+best possible saving is the rest), speech segments detected vs the labels,
+how much labelled speech was dropped (clipped onsets/words), and CPU time per
+second of audio, i.e. roughly how many concurrent streams one core can gate.
+
+Without --wav, fixtures are synthesized into --fixtures-dir: voiced
+"utterances" (harmonic stacks with syllable-rate modulation and fricative
+bursts) separated by pauses, over quiet and noisy backgrounds, with labels.
+
+    python benchmarks/bench_vad.py
+    python benchmarks/bench_vad.py --wav recording1.wav recording2.wav
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import VadStats, VoiceActivityGate  # noqa: E402
+
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+
+
+def synth_utterance(rng, seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    # Syllables: ~4 Hz envelope with short dips between them
+    envelope = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t) * 1.5 + 0.3, 0, 1)
+    signal = voiced * envelope * rng.uniform(2500, 6000)
+    # Fricative bursts ("s", "sh"): quiet high-frequency noise
+    for _ in range(int(seconds * 1.5)):
+        start = rng.integers(0, max(1, len(t) - 1600))
+        burst = np.diff(rng.normal(0, 1200, 1601))
+        signal[start:start + 1600] += burst[:len(signal) - start]
+    return signal
+
+
+def synth_fixture(path, seed, noise_rms, seconds=60):
+    rng = np.random.default_rng(seed)
+    total = seconds * SAMPLE_RATE
+    audio = rng.normal(0, noise_rms, total)
+    # Mains hum makes the "noisy" backgrounds less white
+    audio += noise_rms * 0.5 * np.sin(2 * np.pi * 50 * np.arange(total) / SAMPLE_RATE)
+    labels = []
+    cursor = rng.uniform(1, 3)
+    while True:
+        length = rng.uniform(1.0, 4.0)
+        if cursor + length > seconds - 1:
+            break
+        start = int(cursor * SAMPLE_RATE)
+        audio[start:start + int(length * SAMPLE_RATE)] += synth_utterance(rng, length)[:total - start]
+        labels.append([round(cursor, 3), round(cursor + length, 3)])
+        # Users pause between turns, and sometimes think for a while
+        cursor += length + rng.choice([rng.uniform(0.3, 0.8), rng.uniform(2, 8)])
+    pcm = np.clip(audio, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    with open(path + ".json", "w") as f:
+        json.dump({"speech": labels}, f)
+
+
+def make_fixtures(directory):
+    fixtures = []
+    for name, seed, noise_rms in (("quiet_room", 1, 60), ("office", 2, 250), ("noisy_fan", 3, 600)):
+        path = os.path.join(directory, f"{name}.wav")
+        if not os.path.exists(path):
+            synth_fixture(path, seed, noise_rms)
+        fixtures.append(path)
+    return fixtures
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wav:
+        if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, 2, SAMPLE_RATE):
+            raise SystemExit(f"{path}: expected 16 kHz mono 16-bit PCM")
+        pcm = wav.readframes(wav.getnframes())
+    labels = None
+    if os.path.exists(path + ".json"):
+        with open(path + ".json") as f:
+            labels = json.load(f)["speech"]
+    return pcm, labels
+
+
+def run(pcm, labels, **gate_options):
+    stats = VadStats()
+    gate = VoiceActivityGate(sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS, stats=stats, **gate_options)
+    frame_bytes = SAMPLE_RATE * 2 * FRAME_MS // 1000
+    # Remember which input frames were forwarded, to measure clipped speech
+    forwarded = np.zeros(len(pcm) // frame_bytes, dtype=bool)
+    cpu_started = time.process_time()
+    pending = []
+    for i in range(len(forwarded)):
+        audio, _ = gate.process(pcm[i * frame_bytes:(i + 1) * frame_bytes])
+        pending.append(i)
+        if audio:
+            sent = len(audio) // frame_bytes
+            forwarded[pending[-sent:]] = True
+        if not gate.speaking:
+            # Frames before the pre-roll window can no longer be forwarded
+            del pending[:-gate.preroll.maxlen]
+    cpu_ms = (time.process_time() - cpu_started) * 1000
+
+    missed = share = None
+    if labels:
+        speech = np.zeros(len(forwarded), dtype=bool)
+        for start, end in labels:
+            speech[int(start * 1000 / FRAME_MS):int(end * 1000 / FRAME_MS)] = True
+        missed = (speech & ~forwarded).sum() / speech.sum() * 100
+        share = speech.mean() * 100
+    seconds = len(pcm) / (SAMPLE_RATE * 2)
+    return stats.stats(), share, missed, cpu_ms / seconds
+
+
+def bench(paths, hangover_ms, preroll_ms):
+    print(f"hangover {hangover_ms} ms, pre-roll {preroll_ms} ms, {FRAME_MS} ms frames\n")
+    print(f"{'fixture':<16}{'audio s':>8}{'sent KB':>9}{'of KB':>8}{'saved':>8}{'speech':>8}{'segments':>10}{'truth':>7}"
+          f"{'speech lost':>13}{'CPU ms/s':>10}{'streams/core':>14}")
+    for path in paths:
+        pcm, labels = read_wav(path)
+        stats, share, missed, cpu_ms_per_s = run(pcm, labels, hangover_ms=hangover_ms, preroll_ms=preroll_ms)
+        seconds = len(pcm) / (SAMPLE_RATE * 2)
+        truth = len(labels) if labels else "-"
+        lost = f"{missed:.2f}%" if missed is not None else "-"
+        share = f"{share:.0f}%" if share is not None else "-"
+        print(f"{os.path.basename(path):<16}{seconds:>8.1f}{stats['bytes_out'] / 1024:>9.0f}{stats['bytes_in'] / 1024:>8.0f}"
+              f"{stats['saved_ratio'] * 100:>7.1f}%{share:>8}{stats['speech_segments']:>10}{truth:>7}{lost:>13}"
+              f"{cpu_ms_per_s:>10.3f}{1000 / cpu_ms_per_s:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--wav", nargs="*", help="16 kHz mono 16-bit WAV files (labels from <file>.json if present)")
+    parser.add_argument("--fixtures-dir", default=os.path.join(tempfile.gettempdir(), "vad_fixtures"))
+    parser.add_argument("--hangover-ms", type=int, default=1000)
+    parser.add_argument("--preroll-ms", type=int, default=300)
+    args = parser.parse_args()
+    if args.wav:
+        paths = args.wav
+    else:
+        os.makedirs(args.fixtures_dir, exist_ok=True)
+        paths = make_fixtures(args.fixtures_dir)
+    bench(paths, args.hangover_ms, args.preroll_ms)
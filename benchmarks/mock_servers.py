@@ -0,0 +1,498 @@
+"""Local stand-ins for the upstream services, used by the benchmark scripts.
+
+Nothing in here talks to the network: Gemini is replaced in-process with a
+fake model whose stream is paced by configurable delays, while Murf's
+stream-input API, AssemblyAI's streaming API and TMDB's movie search are
+real servers bound to 127.0.0.1 that answer after a configurable delay. The
+synchronous AssemblyAI and Murf SDK clients used by /agent/chat are replaced
+with fakes that block for a configurable time. Every delay can be given
+``jitter``: up to that many extra seconds, drawn uniformly per call.
+"""
+import asyncio
+import base64
+import itertools
+import json
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import websockets
+
+import gemini_registry
+import providers
+from client_writer import encode_json
+
+
+# Fake Gemini model / chat session with a paced token stream
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    async def send_message_async(self, content, stream=False):
+        reply = self.model.reply_for(content)
+        if not stream:
+            await asyncio.sleep(self.model.first_token_delay + self.model.chunk_delay * len(reply.split()))
+            return FakeResponse(reply)
+        return self._stream(reply)
+
+    async def _stream(self, reply):
+        words = reply.split(" ")
+        await asyncio.sleep(self.model.first_token_delay + random.uniform(0, self.model.jitter))
+        for i in range(0, len(words), self.model.words_per_chunk):
+            if i:
+                await asyncio.sleep(self.model.chunk_delay)
+            text = " ".join(words[i:i + self.model.words_per_chunk])
+            yield FakeChunk(text + (" " if i + self.model.words_per_chunk < len(words) else ""))
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel with a scripted reply"""
+
+    reply = (
+        "Arre boss, yeh toh simple sawaal hai. Mumbai ki baarish kabhi time pe nahi aati, "
+        "lekin local train ke liye log hamesha time pe aate hain. Chai peeni hai toh tapri pe chalo, "
+        "wahan ka cutting sabse jhakas hai. Aur haan, traffic mein phasne se pehle nikal lena, "
+        "warna ghante bhar ka tension pakka hai. Bole toh, life mein jugaad zaroori hai."
+    )
+    first_token_delay = 0.35
+    chunk_delay = 0.08
+    words_per_chunk = 4
+    jitter = 0.0
+
+    def __init__(self, model_name="gemini-1.5-flash", system_instruction=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def reply_for(self, content):
+        return self.reply
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.first_token_delay + random.uniform(0, self.jitter))
+        return FakeResponse(self.reply)
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.first_token_delay + random.uniform(0, self.jitter))
+        return FakeResponse(self.reply)
+
+
+def install_fake_gemini(main_module, **overrides):
+    """Point main.py's Gemini usage at FakeGenerativeModel"""
+    model_cls = type("ConfiguredFakeGenerativeModel", (FakeGenerativeModel,), overrides)
+    gemini_registry.genai.configure = lambda **kwargs: None
+    gemini_registry.genai.GenerativeModel = model_cls
+    # Models built before the fake was installed would still be handed out
+    main_module.gemini_models.clear()
+    return model_cls
+
+
+# Blocking SDK clients used by /agent/chat (they sleep like the real ones wait on the network)
+class FakeTranscriber:
+    delay = 1.0
+    jitter = 0.0
+    text = "Mumbai ki baarish ke baare mein kya sochte ho?"
+
+    def __init__(self, api_key=None, config=None):
+        self.api_key = api_key
+        self.config = config
+
+    def transcribe(self, audio):
+        # The real SDK uploads a file 64 KB at a time before transcribing it
+        if hasattr(audio, "read"):
+            while audio.read(65536):
+                pass
+        time.sleep(self.delay + random.uniform(0, self.jitter))
+        return SimpleNamespace(status="completed", text=self.text, error=None)
+
+
+class FakeMurf:
+    delay = 0.3
+    per_char_delay = 0.0
+    bytes_per_char = 900
+    jitter = 0.0
+
+    def __init__(self, api_key=None):
+        self.text_to_speech = SimpleNamespace(generate=self.generate)
+
+    def generate(self, text, encode_as_base_64=False, **kwargs):
+        time.sleep(self.delay + self.per_char_delay * len(text) + random.uniform(0, self.jitter))
+        encoded_audio = base64.b64encode(b"RIFF" + b"\0" * (len(text) * self.bytes_per_char)).decode() if encode_as_base_64 else None
+        return SimpleNamespace(audio_file=f"https://murf.invalid/{abs(hash(text))}.wav", encoded_audio=encoded_audio)
+
+
+def install_fake_sdks(main_module, transcribe_delay=1.0, llm_delay=0.8, tts_delay=0.3, jitter=0.0):
+    """Point /agent/chat's blocking AssemblyAI, Gemini and Murf calls at sleeping fakes"""
+    providers.aai.Transcriber = type("ConfiguredFakeTranscriber", (FakeTranscriber,),
+                                       {"delay": transcribe_delay, "jitter": jitter})
+    providers.murf.Murf = type("ConfiguredFakeMurf", (FakeMurf,), {"delay": tts_delay, "jitter": jitter})
+    install_fake_gemini(main_module, first_token_delay=llm_delay, jitter=jitter)
+    for name in ("ASSEMBLYAI_API_KEY", "MURF_API_KEY", "GEMINI_API_KEY"):
+        setattr(main_module, name, "fake-key")
+
+
+# Mock Murf stream-input WebSocket server
+class MockMurfServer:
+    """Speaks just enough of Murf's stream-input protocol for the pipeline.
+
+    Every text message is synthesized (in arrival order, per connection) after
+    ``synth_delay`` plus ``per_char_delay`` per character, producing one audio
+    chunk per ``chars_per_chunk`` characters. ``end`` marks the context final
+    once its queued text has been synthesized, and ``clear`` drops it.
+    ``connect_delay`` stands in for the TCP/TLS/handshake cost of the real API.
+    """
+
+    def __init__(self, synth_delay=0.25, per_char_delay=0.002, chars_per_chunk=40, bytes_per_char=900,
+                 connect_delay=0.0, jitter=0.0):
+        self.connect_delay = connect_delay
+        self.jitter = jitter
+        self.synth_delay = synth_delay
+        self.per_char_delay = per_char_delay
+        self.chars_per_chunk = chars_per_chunk
+        self.bytes_per_char = bytes_per_char
+        self.connections = 0
+        self.messages = []
+        self._server = None
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/v1/speech/stream-input"
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0, process_request=self._delay_handshake)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _delay_handshake(self, connection, request):
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay + random.uniform(0, self.jitter))
+        return None
+
+    async def _handle(self, ws):
+        self.connections += 1
+        contexts = {}
+        workers = []
+        try:
+            async for raw in ws:
+                data = json.loads(raw)
+                self.messages.append(data)
+                context_id = data.get("context_id")
+                if data.get("clear"):
+                    work = contexts.pop(context_id, None)
+                    if work is not None:
+                        work.put_nowait(None)
+                    continue
+                if "voice_config" in data:
+                    continue
+                if context_id not in contexts:
+                    # Contexts on one connection are synthesized concurrently, like the real API
+                    contexts[context_id] = asyncio.Queue()
+                    workers.append(asyncio.create_task(self._synthesize(ws, context_id, contexts[context_id])))
+                contexts[context_id].put_nowait(data)
+                if data.get("end"):
+                    contexts.pop(context_id)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def _synthesize(self, ws, context_id, work):
+        while True:
+            data = await work.get()
+            if data is None:
+                return
+            text = data.get("text")
+            if text:
+                await asyncio.sleep(self.synth_delay + self.per_char_delay * len(text) + random.uniform(0, self.jitter))
+                for i in range(0, len(text), self.chars_per_chunk):
+                    piece = text[i:i + self.chars_per_chunk]
+                    audio = base64.b64encode(b"\0" * (len(piece) * self.bytes_per_char)).decode()
+                    await ws.send(json.dumps({"audio": audio, "context_id": context_id, "final": False}))
+            if data.get("end"):
+                await ws.send(json.dumps({"context_id": context_id, "final": True}))
+                return
+
+
+# Mock AssemblyAI streaming endpoint (audio side only)
+class MockAssemblyAIServer:
+    """Accepts binary audio messages and records (arrival time, payload) for each"""
+
+    def __init__(self):
+        self.received = []
+        self._server = None
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/v3/ws"
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, ws):
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    self.received.append((time.perf_counter(), message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class MockAssemblyAIStreamingServer:
+    """AssemblyAI's v3 streaming API, ending turns on silence like the real endpointing.
+
+    Each connection is greeted with a Begin message. Incoming PCM (16-bit
+    mono) counts as speech while its RMS is at least ``speech_rms``. After
+    ``min_speech_ms`` of speech, a turn ends on ``endpoint_ms`` of quiet
+    audio, on that long without any audio (the server's VAD holds silence
+    back), or on ForceEndpoint; the formatted Turn follows ``turn_delay``
+    (+ jitter) later. Each connection cycles through ``transcripts``,
+    starting one further along than the previous connection.
+    """
+
+    def __init__(self, transcripts, speech_rms=500, min_speech_ms=200, endpoint_ms=700, turn_delay=0.15,
+                 jitter=0.0, sample_rate=16000):
+        self.transcripts = list(transcripts)
+        self.speech_rms = speech_rms
+        self.min_speech_ms = min_speech_ms
+        self.endpoint_ms = endpoint_ms
+        self.turn_delay = turn_delay
+        self.jitter = jitter
+        self.sample_rate = sample_rate
+        self.connections = 0
+        self.turns = 0
+        self.audio_bytes = 0
+        self._server = None
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/v3/ws"
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, ws):
+        self.connections += 1
+        offset = self.connections - 1
+        transcripts = itertools.islice(itertools.cycle(self.transcripts), offset, None)
+        state = {"speech_ms": 0.0, "quiet_ms": 0.0, "last_audio": time.monotonic()}
+        await ws.send(json.dumps({"type": "Begin", "id": f"mock-{self.connections}", "expires_at": int(time.time()) + 3600}))
+        watchdog = asyncio.create_task(self._watch(ws, state, transcripts))
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    self.audio_bytes += len(message)
+                    samples = np.frombuffer(message[:len(message) // 2 * 2], dtype="<i2").astype(np.float32)
+                    if not len(samples):
+                        continue
+                    ms = len(samples) / self.sample_rate * 1000
+                    state["last_audio"] = time.monotonic()
+                    if np.sqrt(np.mean(samples ** 2)) >= self.speech_rms:
+                        state["speech_ms"] += ms
+                        state["quiet_ms"] = 0.0
+                    elif state["speech_ms"]:
+                        state["quiet_ms"] += ms
+                else:
+                    msg_type = json.loads(message).get("type")
+                    if msg_type == "ForceEndpoint":
+                        self._end_turn(ws, state, transcripts)
+                    elif msg_type == "Terminate":
+                        await ws.send(json.dumps({"type": "Termination"}))
+                        break
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            watchdog.cancel()
+
+    async def _watch(self, ws, state, transcripts):
+        while True:
+            await asyncio.sleep(0.05)
+            silent_ms = (time.monotonic() - state["last_audio"]) * 1000
+            if state["quiet_ms"] >= self.endpoint_ms or silent_ms >= self.endpoint_ms:
+                self._end_turn(ws, state, transcripts)
+
+    def _end_turn(self, ws, state, transcripts):
+        if state["speech_ms"] < self.min_speech_ms:
+            return
+        state["speech_ms"] = state["quiet_ms"] = 0.0
+        self.turns += 1
+        asyncio.create_task(self._send_turn(ws, next(transcripts)))
+
+    async def _send_turn(self, ws, transcript):
+        await asyncio.sleep(self.turn_delay + random.uniform(0, self.jitter))
+        try:
+            await ws.send(json.dumps({"type": "Turn", "transcript": transcript, "end_of_turn": True,
+                                      "turn_is_formatted": True}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class MockAssemblyAIReplayServer:
+    """Replays recorded AssemblyAI v3 streaming sessions, message for message.
+
+    ``turns`` is a list of recorded turns, each a list of ``(offset_ms,
+    message)`` pairs (partial Turns, the unformatted end of turn, the
+    formatted one). Each connection gets a Begin, then every turn played at
+    its recorded offsets with ``gap`` seconds between turns (time for the
+    reply), then a Termination. Audio from the client is read and ignored.
+    ``sent[connection][turn]`` holds the perf_counter time each message went
+    out, so latency can be measured from any point in the turn.
+    """
+
+    def __init__(self, turns, gap=3.0):
+        self.turns = turns
+        self.gap = gap
+        self.sent = []
+        self._server = None
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/v3/ws"
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, ws):
+        sent = []
+        self.sent.append(sent)
+        reader = asyncio.create_task(self._drain(ws))
+        try:
+            await ws.send(json.dumps({"type": "Begin", "id": f"replay-{len(self.sent)}", "expires_at": int(time.time()) + 3600}))
+            for turn in self.turns:
+                times = []
+                sent.append(times)
+                started = time.perf_counter()
+                for offset_ms, message in turn:
+                    await asyncio.sleep(max(0.0, started + offset_ms / 1000 - time.perf_counter()))
+                    await ws.send(json.dumps(message))
+                    times.append(time.perf_counter())
+                await asyncio.sleep(self.gap)
+            await ws.send(json.dumps({"type": "Termination"}))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            reader.cancel()
+
+    async def _drain(self, ws):
+        try:
+            async for _ in ws:
+                pass
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+# Records what the server would have sent to the browser
+class FakeClientWebSocket:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = []
+
+    async def send_text(self, text):
+        self.events.append((time.perf_counter() - self.started, json.loads(text)))
+
+    async def send_bytes(self, data, msg_type="binary"):
+        self.events.append((time.perf_counter() - self.started, data))
+
+    # The ClientWriter interface main.py sends through; messages go out unqueued here
+    async def send_message(self, message):
+        await self.send_text(encode_json(message))
+
+    def discard(self, msg_types):
+        return 0
+
+    def first(self, msg_type):
+        for elapsed, event in self.events:
+            if isinstance(event, dict) and event.get("type") == msg_type:
+                return elapsed
+        return None
+
+
+# Stub TMDB HTTP/1.1 server with keep-alive
+class MockTMDBServer:
+    """Answers GET /3/search/movie with a canned result.
+
+    ``connect_delay`` is charged once per new TCP connection (standing in for
+    DNS + TCP + TLS to the real API) and ``response_delay`` on every request,
+    so reused keep-alive connections only pay the latter.
+    """
+
+    def __init__(self, connect_delay=0.08, response_delay=0.02, title="Sholay", jitter=0.0):
+        self.connect_delay = connect_delay
+        self.response_delay = response_delay
+        self.jitter = jitter
+        self.title = title
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self):
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/3"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.requests += 1
+                await asyncio.sleep(self.response_delay + random.uniform(0, self.jitter))
+                body = json.dumps({"results": [{"id": 1, "title": self.title}]}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: keep-alive\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Keep-alive connections are still open when the stub shuts down
+            pass
+        finally:
+            writer.close()
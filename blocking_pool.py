@@ -0,0 +1,161 @@
+import asyncio
+import functools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AdmissionRejected(Exception):
+    """Raised by BlockingCallPool.admit() when a request can't be taken on right now"""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PoolSaturated(AdmissionRejected):
+    status_code = 503
+
+
+class SessionBusy(AdmissionRejected):
+    status_code = 429
+
+
+class Admission:
+    """A request's slot in the pool; call release() (or leave the ``with`` block) when done"""
+
+    def __init__(self, pool, session_id: str):
+        self.pool = pool
+        self.session_id = session_id
+        self.started = time.monotonic()
+        self.released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release(self)
+
+
+class BlockingCallPool:
+    """Bounded thread pool for synchronous SDK calls, with admission control.
+
+    Requests are admitted up front, before they read or call anything: at most
+    ``max_workers`` run at once and ``queue_depth`` more may wait for a
+    worker. Beyond that ``admit`` raises PoolSaturated, and a session that
+    already has ``max_per_session`` requests in flight gets SessionBusy. Both
+    carry a Retry-After estimate based on recent request durations. Admitted
+    requests run their blocking calls with ``await pool.run(fn, ...)``, which
+    keeps the event loop (and every live WebSocket) free while they wait.
+    A call whose caller stops waiting (a timeout, a cancelled request) can't
+    be stopped once its thread has it, so until the thread is done it still
+    takes one of the ``capacity`` slots, whether or not its request has been
+    released.
+    """
+
+    def __init__(self, max_workers: int = 4, queue_depth: int = 8, max_per_session: int = 1,
+                 default_duration: float = 5.0):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.max_per_session = max_per_session
+        self.executor = None
+        self.admitted = 0
+        self.running = 0
+        self.abandoned = 0
+        self.per_session = {}
+        self.avg_duration = default_duration
+        self.completed = 0
+        self.rejected_saturated = 0
+        self.rejected_session = 0
+        self.calls = 0
+        self.call_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_depth
+
+    def retry_after(self) -> int:
+        # Requests ahead of a new one drain max_workers at a time
+        waves = (self.admitted + self.abandoned) / self.max_workers
+        return max(1, math.ceil(self.avg_duration * waves))
+
+    def admit(self, session_id: str) -> Admission:
+        if self.per_session.get(session_id, 0) >= self.max_per_session:
+            self.rejected_session += 1
+            raise SessionBusy(f"session {session_id} already has a request in flight",
+                              max(1, math.ceil(self.avg_duration)))
+        if self.admitted + self.abandoned >= self.capacity:
+            self.rejected_saturated += 1
+            raise PoolSaturated("server is busy, try again shortly", self.retry_after())
+        self.admitted += 1
+        self.per_session[session_id] = self.per_session.get(session_id, 0) + 1
+        return Admission(self, session_id)
+
+    def _release(self, admission: Admission):
+        self.admitted -= 1
+        remaining = self.per_session.get(admission.session_id, 1) - 1
+        if remaining:
+            self.per_session[admission.session_id] = remaining
+        else:
+            self.per_session.pop(admission.session_id, None)
+        duration = time.monotonic() - admission.started
+        self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+        self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sdk")
+        started = time.perf_counter()
+        self.running += 1
+        future = self.executor.submit(functools.partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancel():
+                # Already running: the thread carries on, so it keeps its slot until it returns
+                self.abandoned += 1
+                future.add_done_callback(lambda _: self._call_soon(loop, self._abandoned_done))
+            raise
+        finally:
+            self.running -= 1
+            self.calls += 1
+            self.call_seconds += time.perf_counter() - started
+
+    @staticmethod
+    def _call_soon(loop, callback):
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop is gone (shutdown); nothing is left to admit
+            pass
+
+    def _abandoned_done(self):
+        self.abandoned -= 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "waiting": max(0, self.admitted - self.max_workers),
+            "running_calls": self.running,
+            "abandoned_calls": self.abandoned,
+            "completed": self.completed,
+            "rejected_saturated": self.rejected_saturated,
+            "rejected_session": self.rejected_session,
+            "avg_request_seconds": round(self.avg_duration, 3),
+            "avg_call_seconds": round(self.call_seconds / self.calls, 3) if self.calls else 0.0,
+        }
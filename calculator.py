@@ -0,0 +1,342 @@
+import ast
+import math
+import operator
+import re
+import time
+from functools import lru_cache
+
+
+class CalculationError(Exception):
+    """The spoken text couldn't be turned into a safe, evaluable expression"""
+
+
+# Limits that keep one request from pinning a worker ("9**9**9", "1000!" ...)
+MAX_EXPRESSION_CHARS = 200
+MAX_NODES = 64
+MAX_RESULT_DIGITS = 300
+MAX_FACTORIAL = 170
+TIME_BUDGET_SECONDS = 0.05
+
+# Trig functions take degrees, which is what people mean when they say "sin 30"
+ANGLE_IN_DEGREES = True
+
+# Multi-word phrases, rewritten in one regex pass before tokenizing
+PHRASES = {
+    "divided by": " / ", "multiplied by": " * ", "into": " * ", "over": " / ",
+    "to the power of": " ** ", "to the power": " ** ", "raised to": " ** ", "ki power": " ** ",
+    "square root of": " sqrt ", "square root": " sqrt ", "cube root of": " cbrt ", "cube root": " cbrt ",
+    "percent of": " /100* ", "% of": " /100* ", "pratishat": " /100* ",
+    "sum of": " sum ", "product of": " product ", "difference of": " difference ",
+    "difference between": " difference ", "quotient of": " quotient ",
+}
+PHRASE_RE = re.compile("|".join(re.escape(p) for p in sorted(PHRASES, key=len, reverse=True)))
+
+WORD_OPERATORS = {
+    "plus": "+", "add": "+", "jod": "+", "jodo": "+", "sum": "+",
+    "minus": "-", "subtract": "-", "ghata": "-", "ghatao": "-", "difference": "-",
+    "times": "*", "multiply": "*", "guna": "*", "x": "*", "product": "*",
+    "divide": "/", "bhag": "/", "quotient": "/",
+    "mod": "%", "modulo": "%", "power": "**", "squared": "**2", "cubed": "**3",
+}
+SYMBOLS = {"^": "**", "×": "*", "÷": "/"}
+
+FUNCTIONS = {
+    "sqrt": math.sqrt, "cbrt": lambda x: math.copysign(abs(x) ** (1 / 3), x),
+    "log": math.log10, "ln": math.log, "exp": math.exp, "abs": abs,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "asin": math.asin, "acos": math.acos, "atan": math.atan,
+    "floor": math.floor, "ceil": math.ceil, "round": round, "factorial": math.factorial,
+}
+# log(x, base) and round(x, digits); every other function takes exactly one argument
+TWO_ARGUMENT_FUNCTIONS = {"log", "round"}
+TRIG = {"sin", "cos", "tan"}
+INVERSE_TRIG = {"asin", "acos", "atan"}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+# Number words (English and romanized Hindi); "do"/"saath" are only numbers next to an operator
+UNITS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+    "shunya": 0, "ek": 1, "do": 2, "teen": 3, "char": 4, "chaar": 4, "paanch": 5, "panch": 5,
+    "chhe": 6, "chhah": 6, "cheh": 6, "saat": 7, "aath": 8, "nau": 9, "das": 10,
+    "gyarah": 11, "barah": 12, "baarah": 12, "terah": 13, "chaudah": 14, "pandrah": 15, "solah": 16,
+    "satrah": 17, "atharah": 18, "unnees": 19, "bees": 20, "pachees": 25, "tees": 30,
+    "chalis": 40, "chaalis": 40, "pachas": 50, "pachaas": 50, "saath": 60, "sattar": 70,
+    "assi": 80, "nabbe": 90, "dedh": 1.5, "dhai": 2.5,
+}
+HUNDREDS = {"hundred": 100, "sau": 100}
+SCALES = {
+    "thousand": 10 ** 3, "hazaar": 10 ** 3, "hazar": 10 ** 3, "lakh": 10 ** 5, "lac": 10 ** 5,
+    "million": 10 ** 6, "crore": 10 ** 7, "karod": 10 ** 7, "billion": 10 ** 9,
+}
+AMBIGUOUS_NUMBER_WORDS = {"do", "saath", "char", "das"}
+NUMBER_WORD_RE = re.compile(r"\b(?:" + "|".join(sorted(set(UNITS) | set(HUNDREDS) | set(SCALES))) + r")\b")
+
+# Connectives in prefix forms: "add 2 and 3", "subtract 3 from 10", "divide 10 by 2";
+# outside a prefix form "by" means divide ("10 by 2")
+CONNECTIVES = {"and", "aur", "to", "with", "se", "from", "by"}
+
+# Anything else that isn't a letter must be sentence punctuation, or the text is refused: dropping a
+# symbol silently can turn the question into a different calculation
+TOKEN_RE = re.compile(r"\d*\.\d+|\d+(?:\.\d+)?|[a-z]+|\*\*|/100\*|[-+*/%(),!]|\S")
+IGNORED_PUNCTUATION = set("?.:;'\"=₹$")
+
+
+def has_number_words(text: str) -> bool:
+    """Whether the text spells out a number ("twenty five", "do sau")"""
+    return any(word not in AMBIGUOUS_NUMBER_WORDS for word in NUMBER_WORD_RE.findall(text.lower()))
+
+
+def _rewrite_phrases(text: str) -> str:
+    # Digit grouping: "1,000" and "1,00,000", but not the argument separator in "log(8,100)"
+    text = text.lower()
+    text = re.sub(r"(?<=\d),(?=\d{2,3}\b)",
+                  lambda m: "," if text.count("(", 0, m.start()) > text.count(")", 0, m.start()) else "", text)
+    for symbol, replacement in SYMBOLS.items():
+        text = text.replace(symbol, f" {replacement} ")
+    return PHRASE_RE.sub(lambda m: PHRASES[m.group(0)], text)
+
+
+def _tokens(text: str) -> list:
+    """(kind, value) tokens: num, op, func, const, paren, comma, postfix (!), word"""
+    tokens = []
+    for raw in TOKEN_RE.findall(_rewrite_phrases(text)):
+        if raw[0].isdigit() or (raw[0] == "." and len(raw) > 1):
+            tokens.append(("num", float(raw) if "." in raw else int(raw)))
+        elif raw in ("(", ")"):
+            tokens.append(("paren", raw))
+        elif raw == ",":
+            tokens.append(("comma", raw))
+        elif raw == "!":
+            tokens.append(("postfix", raw))
+        elif len(raw) == 1 and not raw.isalpha() and raw not in "+-*/%":
+            if raw not in IGNORED_PUNCTUATION:
+                raise CalculationError(f"don't know what '{raw}' means")
+        elif raw in ("+", "-", "*", "/", "%", "**", "/100*"):
+            tokens.append(("op", raw))
+        elif raw in WORD_OPERATORS:
+            op = WORD_OPERATORS[raw]
+            if op.startswith("**") and len(op) > 2:
+                tokens += [("op", "**"), ("num", int(op[2:]))]
+            else:
+                tokens.append(("op", op))
+        elif raw in FUNCTIONS:
+            tokens.append(("func", raw))
+        elif raw in CONSTANTS:
+            tokens.append(("const", raw))
+        elif raw in UNITS or raw in HUNDREDS or raw in SCALES:
+            tokens.append(("word_num", raw))
+        else:
+            tokens.append(("word", raw))
+    return _merge_number_words(tokens)
+
+
+def _merge_number_words(tokens: list) -> list:
+    """Collapse runs like "do sau pachaas" or "2 lakh" into a single number token"""
+    merged = []
+    i = 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        starts_run = kind == "word_num" or (
+            kind == "num" and i + 1 < len(tokens) and tokens[i + 1][0] == "word_num"
+            and (tokens[i + 1][1] in HUNDREDS or tokens[i + 1][1] in SCALES)
+        )
+        if not starts_run:
+            merged.append((kind, value))
+            i += 1
+            continue
+        total, current, words = 0, 0, []
+        while i < len(tokens) and (tokens[i][0] == "word_num" or (tokens[i][0] == "num" and not words)):
+            kind, value = tokens[i]
+            if kind == "num":
+                current += value
+            elif value in HUNDREDS:
+                current = (current or 1) * HUNDREDS[value]
+            elif value in SCALES:
+                total += (current or 1) * SCALES[value]
+                current = 0
+            else:
+                current += UNITS[value]
+            words.append(value)
+            i += 1
+        ambiguous = len(words) == 1 and words[0] in AMBIGUOUS_NUMBER_WORDS
+        merged.append(("maybe_num" if ambiguous else "num", total + current))
+    return merged
+
+
+def _expand_factorials(tokens: list) -> list:
+    """"5!" and "(2 + 3)!" -> factorial(5) and factorial((2 + 3))"""
+    expanded = []
+    for token in tokens:
+        if token[0] != "postfix":
+            expanded.append(token)
+            continue
+        start = len(expanded) - 1
+        if start >= 0 and expanded[start] == ("paren", ")"):
+            depth = 0
+            while start >= 0:
+                depth += {("paren", ")"): 1, ("paren", "("): -1}.get(expanded[start], 0)
+                if depth == 0:
+                    break
+                start -= 1
+            if start > 0 and expanded[start - 1][0] == "func":
+                start -= 1
+        if start < 0 or expanded[start][0] not in ("num", "const", "paren", "func"):
+            raise CalculationError("nothing to take the factorial of")
+        expanded[start:] = [("func", "factorial"), ("paren", "("), *expanded[start:], ("paren", ")")]
+    return expanded
+
+
+def _is_operand_edge(token) -> bool:
+    return token is not None and token[0] in ("op", "func")
+
+
+def spoken_to_expression(text: str) -> str:
+    """Turn "do sau plus twenty five" / "square root of 16" into a Python expression string"""
+    tokens = _tokens(text)
+    # "do" (two / do) and friends only count as numbers right next to an operator
+    resolved = []
+    for i, (kind, value) in enumerate(tokens):
+        if kind == "maybe_num":
+            before = tokens[i - 1] if i else None
+            after = tokens[i + 1] if i + 1 < len(tokens) else None
+            kind = "num" if _is_operand_edge(before) or _is_operand_edge(after) else "word"
+        resolved.append((kind, value))
+
+    # Prefix forms: <op> A <connective> B  ->  A <op> B  (B - A for "subtract A from B")
+    meaningful = [t for t in resolved if t[0] != "word" or t[1] in CONNECTIVES]
+    if (len(meaningful) >= 4 and meaningful[0][0] == "op" and meaningful[1][0] == "num"
+            and meaningful[2][1] in CONNECTIVES and meaningful[3][0] == "num"):
+        op, a, conj, b = meaningful[:4]
+        first, second = (b, a) if conj[1] == "from" and op[1] == "-" else (a, b)
+        meaningful = [first, op, second] + meaningful[4:]
+
+    parts = []
+    pending_call = 0
+    tokens = [("op", "/") if t == ("word", "by") else t for t in meaningful]
+    tokens = _expand_factorials([t for t in tokens if t[0] != "word"])
+    for i, (kind, value) in enumerate(tokens):
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if kind in ("num", "const") and nxt is not None and nxt[0] in ("num", "const"):
+            # "2 and 3" must not silently become 23
+            raise CalculationError("missing operator between numbers")
+        if kind == "func":
+            parts.append(value)
+            if nxt is None or nxt != ("paren", "("):
+                # "sqrt 16" -> "sqrt(16": close it after the next operand
+                parts.append("(")
+                pending_call += 1
+            continue
+        parts.append(str(value) if kind == "num" else value)
+        if pending_call and kind in ("num", "const") and not (nxt and nxt[0] == "func"):
+            parts.append(")" * pending_call)
+            pending_call = 0
+    parts.append(")" * pending_call)
+    expression = "".join(parts)
+    if not expression:
+        raise CalculationError("no expression found")
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise CalculationError("expression too long")
+    return expression
+
+
+# Parsed once per distinct expression; spoken calculations repeat a lot
+@lru_cache(maxsize=1024)
+def parse_expression(expression: str) -> ast.Expression:
+    try:
+        return ast.parse(expression, mode="eval")
+    except SyntaxError:
+        raise CalculationError(f"can't parse '{expression}'")
+
+
+class SafeEvaluator:
+    """Evaluates a whitelisted subset of Python expression syntax with size and time limits"""
+
+    BINARY = {
+        ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+        ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+        ast.Pow: operator.pow,
+    }
+    UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+    def __init__(self, time_budget: float = TIME_BUDGET_SECONDS):
+        self.time_budget = time_budget
+
+    def evaluate(self, expression: str):
+        tree = parse_expression(expression)
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes_left = MAX_NODES
+        try:
+            return self._visit(tree.body)
+        except (ZeroDivisionError, OverflowError, ValueError, TypeError) as e:
+            raise CalculationError(str(e))
+
+    def _check_size(self, value):
+        if isinstance(value, complex):
+            raise CalculationError("result is not a real number")
+        if isinstance(value, int) and value.bit_length() > MAX_RESULT_DIGITS * 3.33:
+            raise CalculationError("number too large")
+        return value
+
+    def _visit(self, node):
+        self.nodes_left -= 1
+        if self.nodes_left < 0:
+            raise CalculationError("expression too complex")
+        if time.perf_counter() > self.deadline:
+            raise CalculationError("calculation took too long")
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return self._check_size(node.value)
+        if isinstance(node, ast.Name) and node.id in CONSTANTS:
+            return CONSTANTS[node.id]
+        if isinstance(node, ast.UnaryOp) and type(node.op) in self.UNARY:
+            return self.UNARY[type(node.op)](self._visit(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in self.BINARY:
+            left, right = self._visit(node.left), self._visit(node.right)
+            if isinstance(node.op, ast.Pow):
+                self._check_power(left, right)
+            return self._check_size(self.BINARY[type(node.op)](left, right))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+                and not node.keywords and 1 <= len(node.args) <= 2):
+            return self._call(node.func.id, [self._visit(arg) for arg in node.args])
+        raise CalculationError(f"unsupported syntax: {type(node).__name__}")
+
+    def _check_power(self, base, exponent):
+        if abs(exponent) > 10000:
+            raise CalculationError("exponent too large")
+        # (-8) ** 0.5 is a complex number, which nothing downstream can format or pass to floor/sqrt
+        if base < 0 and exponent != int(exponent):
+            raise CalculationError("negative number to a fractional power")
+        if exponent > 0 and abs(base) > 1 and exponent * math.log10(abs(base)) > MAX_RESULT_DIGITS:
+            raise CalculationError("result too large")
+
+    def _call(self, name, args):
+        if len(args) == 2 and name not in TWO_ARGUMENT_FUNCTIONS:
+            raise CalculationError(f"{name} takes one argument")
+        if name == "log" and len(args) == 2:
+            return self._check_size(math.log(*args))
+        if name == "factorial":
+            if args[0] != int(args[0]) or not 0 <= args[0] <= MAX_FACTORIAL:
+                raise CalculationError(f"factorial needs a whole number up to {MAX_FACTORIAL}")
+            return math.factorial(int(args[0]))
+        if ANGLE_IN_DEGREES and name in TRIG:
+            args = [math.radians(args[0])]
+        result = FUNCTIONS[name](*args)
+        if ANGLE_IN_DEGREES and name in INVERSE_TRIG:
+            result = math.degrees(result)
+        return self._check_size(result)
+
+
+def format_number(value):
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return int(value)
+        return float(f"{value:.10g}")
+    return value
+
+
+def calculate(text: str):
+    """Returns (expression, result) for a spoken calculation, or raises CalculationError"""
+    expression = spoken_to_expression(text)
+    return expression, format_number(SafeEvaluator().evaluate(expression))
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger("voice_agent.client_writer")
+
+try:
+    import orjson
+
+    def encode_json(message: dict) -> str:
+        return orjson.dumps(message).decode()
+except ImportError:
+    import json
+
+    def encode_json(message: dict) -> str:
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+# Consecutive queued messages of this type are merged into one (their texts concatenated)
+COALESCED_TYPE = "LLMStreamChunk"
+# Informational messages that are dropped rather than waited for when the queue is full
+LOSSY_TYPES = frozenset({"SpeechStarted", "SpeechEnded"})
+
+
+class WriterStats:
+    """Totals across sessions for messages sent to /ws clients, plus the live queue depth"""
+
+    def __init__(self):
+        self.queued = 0
+        self.frames = 0
+        self.bytes = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.discarded = 0
+        self.producer_waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.depth_max = 0
+        self.slow_clients = 0
+        self.writers = set()
+
+    def depth(self) -> int:
+        return sum(len(writer.pending) for writer in self.writers)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.writers),
+            "queue_depth": self.depth(),
+            "queue_depth_max": self.depth_max,
+            "queued": self.queued,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "discarded": self.discarded,
+            "producer_waits": self.producer_waits,
+            "wait_ms_avg": round(self.wait_ms_total / self.producer_waits, 2) if self.producer_waits else 0.0,
+            "wait_ms_max": round(self.wait_ms_max, 2),
+            "slow_clients": self.slow_clients,
+        }
+
+
+class ClientWriter:
+    """Sends one /ws client's outbound messages from a single writer task.
+
+    Producers (the Gemini and Murf readers, the AssemblyAI reader) hand
+    messages to ``send_message`` or ``send_bytes`` and go straight back to
+    their upstream instead of waiting on the client socket. JSON is encoded
+    once, with orjson when it is installed. Consecutive ``LLMStreamChunk``s
+    still in the queue are merged into one frame, and a chunk arriving within
+    ``coalesce_ms`` of the previous one written is held for the rest of that
+    window so the chunks behind it ride along; the first chunk of a reply
+    goes out at once. With ``max_queue`` messages waiting, VAD speech events
+    are dropped and every other producer waits for room, which slows Gemini
+    and Murf to the pace the client reads at. A client that does not take a
+    frame for ``stall_timeout`` seconds is disconnected.
+    """
+
+    def __init__(self, websocket, session_id: str = "", max_queue: int = 256, coalesce_ms: float = 20,
+                 stall_timeout: float = 10.0, stats: WriterStats = None):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.max_queue = max_queue
+        self.coalesce_s = coalesce_ms / 1000
+        self.stall_timeout = stall_timeout
+        self.stats = stats or WriterStats()
+        self.pending = deque()  # [msg_type, payload]; payload is a dict for chunks being merged, else str/bytes
+        self.last_chunk_at = 0.0
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.closing = False
+        self.closed = False
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.stats.writers.add(self)
+            self.task = asyncio.create_task(self._run())
+        return self
+
+    async def send_message(self, message: dict):
+        msg_type = message.get("type")
+        if msg_type == COALESCED_TYPE:
+            if self.pending and self.pending[-1][0] == COALESCED_TYPE and not self.closed:
+                tail = self.pending[-1][1]
+                tail["text"] += message["text"]
+                self.stats.coalesced += 1
+                return
+            # Copied, since later chunks are appended to it in place
+            await self._put(msg_type, dict(message))
+        else:
+            await self._put(msg_type, encode_json(message))
+
+    async def send_bytes(self, data: bytes, msg_type: str = "binary"):
+        await self._put(msg_type, data)
+
+    def discard(self, msg_types) -> int:
+        """Drop queued messages of the given types (e.g. a cancelled reply's output); returns how many"""
+        kept = deque(item for item in self.pending if item[0] not in msg_types)
+        dropped = len(self.pending) - len(kept)
+        self.pending = kept
+        self.stats.discarded += dropped
+        if len(self.pending) < self.max_queue:
+            self.space.set()
+        return dropped
+
+    async def _put(self, msg_type: str, payload):
+        if len(self.pending) >= self.max_queue and msg_type in LOSSY_TYPES:
+            self.stats.dropped += 1
+            return
+        if len(self.pending) >= self.max_queue and not self.closed:
+            self.stats.producer_waits += 1
+            started = time.perf_counter()
+            while len(self.pending) >= self.max_queue and not self.closed:
+                self.space.clear()
+                await self.space.wait()
+            wait_ms = (time.perf_counter() - started) * 1000
+            self.stats.wait_ms_total += wait_ms
+            self.stats.wait_ms_max = max(self.stats.wait_ms_max, wait_ms)
+        if self.closed:
+            # The client is gone; the session's own cleanup stops whatever is still producing
+            self.stats.dropped += 1
+            return
+        self.pending.append([msg_type, payload])
+        self.stats.queued += 1
+        self.stats.depth_max = max(self.stats.depth_max, len(self.pending))
+        self.ready.set()
+
+    async def _run(self):
+        while True:
+            await self.ready.wait()
+            if not self.pending:
+                if self.closing:
+                    return
+                self.ready.clear()
+                continue
+            msg_type, payload = self.pending[0]
+            if msg_type == COALESCED_TYPE:
+                hold = self.last_chunk_at + self.coalesce_s - time.perf_counter()
+                if hold > 0 and not self.closing:
+                    await asyncio.sleep(hold)
+                    continue
+                self.last_chunk_at = time.perf_counter()
+                payload = encode_json(payload)
+            self.pending.popleft()
+            if len(self.pending) < self.max_queue:
+                self.space.set()
+            try:
+                if isinstance(payload, bytes):
+                    await asyncio.wait_for(self.websocket.send_bytes(payload), self.stall_timeout)
+                else:
+                    await asyncio.wait_for(self.websocket.send_text(payload), self.stall_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"🐢 [Client Writer] {self.session_id} took no data for {self.stall_timeout}s, disconnecting",
+                               extra={"session_id": self.session_id})
+                self.stats.slow_clients += 1
+                self._fail()
+                try:
+                    await asyncio.wait_for(self.websocket.close(code=1008, reason="client too slow"), 1.0)
+                except Exception:
+                    pass
+                return
+            except Exception:
+                # Client disconnected; its receive loop ends the session
+                self._fail()
+                return
+            self.stats.frames += 1
+            self.stats.bytes += len(payload)
+
+    def _fail(self):
+        self.closed = True
+        self.stats.dropped += len(self.pending)
+        self.pending.clear()
+        self.space.set()
+
+    async def close(self, timeout: float = 2.0):
+        """Send what is still queued (for up to ``timeout`` seconds) and stop the writer task"""
+        if self.task is None:
+            return
+        self.closing = True
+        self.ready.set()
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ [Client Writer] Writer for {self.session_id} stopped with error: {e}",
+                         extra={"session_id": self.session_id})
+        self._fail()
+        self.stats.writers.discard(self)
+        self.task = None
@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from sdk_loader import lazy_import, prewarm
+
+# Imported on first use (see sdk_loader); the google SDKs take most of a second to load
+genai = lazy_import("google.generativeai")
+glm = lazy_import("google.ai.generativelanguage")
+
+
+class GeminiModelRegistry:
+    """GenerativeModel handles per (API key, model name, system prompt), built once and reused.
+
+    ``genai.configure`` sets process-global state, so with per-session keys
+    two concurrent turns could end up calling Gemini with each other's key.
+    Instead, each API key gets its own pair of generative service clients
+    (sync for the SDK thread pool, async for streaming) that are attached to
+    the models built for that key; nothing global is touched. Keys are kept
+    in LRU order and at most ``max_keys`` of them (with their clients and
+    models) are held at once. On the event loop use ``aget``, which
+    never imports the SDK on the loop.
+    """
+
+    def __init__(self, max_keys: int = 64):
+        self.max_keys = max_keys
+        self.keys = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def fingerprint(api_key: str) -> str:
+        # Stats and logs never need the key itself
+        return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+    def get(self, api_key: str, model_name: str = "gemini-1.5-flash", system_instruction: str = None):
+        fingerprint = self.fingerprint(api_key)
+        entry = self.keys.get(fingerprint)
+        if entry is None:
+            entry = self.keys[fingerprint] = {"api_key": api_key, "clients": None, "models": {}}
+            while len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+                self.evictions += 1
+        self.keys.move_to_end(fingerprint)
+
+        model = entry["models"].get((model_name, system_instruction))
+        if model is not None:
+            self.hits += 1
+            return model
+        self.misses += 1
+        model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        if hasattr(model, "_client"):
+            # The SDK only falls back to the global (genai.configure) clients when these are unset
+            if entry["clients"] is None:
+                client_options = {"api_key": api_key}
+                entry["clients"] = (glm.GenerativeServiceClient(client_options=client_options),
+                                    glm.GenerativeServiceAsyncClient(client_options=client_options))
+            model._client, model._async_client = entry["clients"]
+        entry["models"][(model_name, system_instruction)] = model
+        return model
+
+    async def aget(self, api_key: str, model_name: str = "gemini-1.5-flash", system_instruction: str = None):
+        """get() for the event loop: the SDKs are imported in a worker thread if they aren't loaded yet"""
+        if not (genai._loaded and glm._loaded):
+            # Most of a second of imports; the startup pre-warm usually gets there first, but may be off or still running
+            await asyncio.to_thread(prewarm, [genai._name, glm._name])
+        return self.get(api_key, model_name, system_instruction)
+
+    def clear(self):
+        self.keys.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "keys": len(self.keys),
+            "models": sum(len(entry["models"]) for entry in self.keys.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,135 @@
+import re
+from typing import NamedTuple
+
+
+OPERATOR_CHARS = "+-*/×÷"
+
+
+def trie_regex(words) -> str:
+    """Regex alternation factored by common prefixes ("add|addition" -> "add(?:ition)?").
+
+    Python's re engine tries alternatives one by one, so a flat list of N
+    keywords costs N attempts at every position; the trie form only follows
+    branches that can still match. Longer words are preferred at each branch,
+    so the longest keyword at a position is the one reported.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node):
+        end = node.get("") is True
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if end else body
+
+    return render(trie)
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    slots: dict
+    confidence: float
+
+
+class Features:
+    """What one scan of a transcript found: keyword hits per intent, digits and operators"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.hits = {}
+        self.has_digits = False
+        self.has_operators = False
+
+    def keywords(self, intent: str) -> set:
+        return self.hits.get(intent, set())
+
+
+class Intent:
+    def __init__(self, name: str, keywords=(), condition=None, extract=None, confidence=None):
+        self.name = name
+        self.keywords = tuple(keywords)
+        # condition(features) -> bool decides whether the intent fires (default: any keyword hit);
+        # extract(text, features) -> dict of slots, or None to decline after all
+        self.condition = condition or (lambda features: bool(features.keywords(name)))
+        self.extract = extract or (lambda text, features: {})
+        self.confidence = confidence or (lambda features: min(1.0, 0.5 + 0.15 * len(features.keywords(name))))
+
+
+class IntentRouter:
+    """Classifies a transcript in one regex pass over the text.
+
+    All keywords of all registered intents are compiled into a single
+    prefix-factored alternation inside a lookahead, so ``findall`` visits every position
+    once and reports every keyword occurrence, overlapping ones included.
+    Keywords keep the old substring semantics (``'add' in query``). Intents
+    are tried in registration order and the first whose condition holds and
+    whose extractor returns slots wins; otherwise the fallback intent is
+    returned.
+    """
+
+    def __init__(self, fallback: str = "chat"):
+        self.fallback = fallback
+        self.intents = []
+        self.pattern = None
+        self.owners = {}
+
+    def register(self, name: str, keywords=(), condition=None, extract=None, confidence=None) -> Intent:
+        intent = Intent(name, keywords, condition, extract, confidence)
+        self.intents.append(intent)
+        self.pattern = None
+        return intent
+
+    def skill(self, name: str, keywords=(), condition=None, confidence=None):
+        """Decorator form of register(); the decorated function is the slot extractor"""
+        def decorator(extract):
+            self.register(name, keywords, condition, extract, confidence)
+            return extract
+        return decorator
+
+    def compile(self):
+        intents_by_keyword = {}
+        for intent in self.intents:
+            for keyword in intent.keywords:
+                intents_by_keyword.setdefault(keyword.lower(), set()).add(intent.name)
+        keywords = set(intents_by_keyword)
+        # The regex reports only the longest keyword starting at a position; every
+        # keyword that is a prefix of it matches there too, so credit those as well
+        self.owners = {
+            keyword: {(name, other) for other in keywords if keyword.startswith(other)
+                      for name in intents_by_keyword[other]}
+            for keyword in keywords
+        }
+        alternatives = [trie_regex(keywords), r"\d", f"[{re.escape(OPERATOR_CHARS)}]"]
+        self.pattern = re.compile(f"(?=({'|'.join(alternatives)}))")
+
+    def features(self, text: str) -> Features:
+        if self.pattern is None:
+            self.compile()
+        features = Features(text)
+        owners = self.owners
+        for token in self.pattern.findall(text.lower()):
+            hit = owners.get(token)
+            if hit is not None:
+                for intent, keyword in hit:
+                    features.hits.setdefault(intent, set()).add(keyword)
+            elif token.isdigit():
+                features.has_digits = True
+            else:
+                features.has_operators = True
+        return features
+
+    def route(self, text: str) -> IntentMatch:
+        features = self.features(text)
+        for intent in self.intents:
+            if not intent.condition(features):
+                continue
+            slots = intent.extract(text, features)
+            if slots is not None:
+                return IntentMatch(intent.name, slots, round(intent.confidence(features), 2))
+        return IntentMatch(self.fallback, {}, 1.0)
@@ -1,44 +1,424 @@
 from fastapi import FastAPI, Request, HTTPException, File, UploadFile, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
 import os
 import asyncio
 import json
 import websockets
-from urllib.parse import urlencode, parse_qs
+from urllib.parse import parse_qs
 import base64
 import httpx
 import random
 import re
+import itertools
+import contextvars
+import uuid
+import statistics
+import struct
+import time
+from collections import deque
+from types import SimpleNamespace
 
-# AssemblyAI imports
-import assemblyai as aai
-
-from murf import Murf
-
-# Gemini import
-import google.generativeai as genai
+from murf_pool import MurfConnectionPool, MurfContextClosed
+from ttl_cache import AsyncTTLCache, SqliteCacheBackend
+from movie_index import LazyMovieIndex
+from intent_router import IntentRouter
+from calculator import calculate, has_number_words, CalculationError
+from blocking_pool import BlockingCallPool, AdmissionRejected
+from session_store import SessionStore, MemorySessionBackend, RedisSessionBackend
+from audio_ingest import PcmCoalescer, IngestStats
+from vad import VoiceActivityGate, VadStats
+from turn_scheduler import TurnScheduler, TurnStats
+from telemetry import configure_logging, create_tracer, TurnTelemetry, TurnTrace
+from gemini_registry import GeminiModelRegistry
+from response_cache import ResponseCache, normalize as normalize_text
+from tts_cache import AudioCache, pack_chunks, iter_chunks
+from client_writer import ClientWriter, WriterStats
+from speculation import Speculator, SpeculationStats
+from batch_jobs import BatchRunner, UploadRejected, spool_multipart
+from providers import ProviderRouter, GeminiLLM, TemplateLLM, MurfTTS, ToneTTS, AssemblyAIASR
+import sdk_loader
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# Structured, level-controlled logging for the voice pipeline (LOG_FORMAT=json for one JSON
+# object per line); records are written from a background thread, off the event loop
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+logger, log_listener = configure_logging("voice_agent", LOG_LEVEL, LOG_FORMAT)
+
+# Per-turn stage timings, exported at /metrics; OTEL_ENABLED also emits one OpenTelemetry span per turn
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+turn_telemetry = TurnTelemetry(logger, create_tracer("voice-agent") if OTEL_ENABLED else None)
+
+# Fire-and-forget work (startup pre-warming): the loop only keeps weak references to tasks, so they are
+# held here until done, their failures are logged, and whatever is still running is cancelled at shutdown
+background_tasks = set()
+
+def start_background(coro, name: str) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(finish_background)
+    return task
+
+def finish_background(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"❌ [Background] {task.get_name()} failed: {task.exception()!r}")
+
+async def stop_background():
+    tasks = list(background_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+# App lifespan: start/stop shared upstream resources
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = create_http_client()
+    # Build the movie index in the background so startup isn't blocked on a large corpus
+    start_background(asyncio.to_thread(movie_index.get), "movie index build")
+    if SDK_PREWARM:
+        start_background(asyncio.to_thread(sdk_loader.prewarm), "SDK pre-warm")
+    murf_pool.start()
+    if MURF_POOL_ENABLED and MURF_API_KEY:
+        for tts in tts_router.providers:
+            start_background(tts.prewarm(MURF_API_KEY, keep_warm=True), f"{tts.name} pre-warm")
+    if audio_cache is not None and TTS_CACHE_PREWARM and MURF_API_KEY:
+        start_background(prewarm_tts_cache(MURF_API_KEY), "TTS cache pre-warm")
+    yield
+    await stop_background()
+    await murf_pool.close()
+    await http_client.aclose()
+    http_client = None
+    sdk_pool.shutdown()
+    await batch_runner.close()
+    batch_pool.shutdown()
+    await session_store.close()
+    log_listener.stop()
 
-# Dictionary to store chat session objects
-chat_histories = {}
+app = FastAPI(lifespan=lifespan)
 
 # Mount static and template directories
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+# Gemini models per API key / system prompt, reused across turns (no global genai.configure)
+gemini_models = GeminiModelRegistry(max_keys=int(os.getenv("GEMINI_MAX_KEYS", "64")))
+
+# Opt-in cache of generic Gemini replies for context-free questions. Exact matches on normalised
+# text; RESPONSE_CACHE_SIMILARITY > 0 also serves near-duplicates at that cosine similarity
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "21600")),
+    similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0"))
+) if RESPONSE_CACHE_ENABLED else None
+
+# Cached replies are replayed in Gemini-sized pieces, so the client and the TTS segmenter see a normal stream
+async def replay_reply(text: str, words_per_chunk: int = 8):
+    words = re.findall(r"\S+\s*", text)
+    for i in range(0, len(words), words_per_chunk):
+        yield SimpleNamespace(text="".join(words[i:i + words_per_chunk]))
+
 # Get API keys from environment (fallback)
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
 MURF_API_KEY = os.getenv("MURF_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 
+# Upstream endpoints (overridable so the pipeline can run against local mock servers)
+MURF_WS_URL = os.getenv("MURF_WS_URL", "wss://api.murf.ai/v1/speech/stream-input")
+ASSEMBLYAI_WS_URL = os.getenv("ASSEMBLYAI_WS_URL", "wss://streaming.assemblyai.com/v3/ws")
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3")
+
+# Import the provider SDKs in a background thread at startup, so the first turn doesn't pay for
+# them; off leaves each one to load on first use (e.g. for CLI tools and short-lived workers)
+SDK_PREWARM = os.getenv("SDK_PREWARM", "true").lower() != "false"
+
+# Shared HTTP client settings (HTTP/2 needs the optional `h2` package: pip install "httpx[http2]")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.2"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# Chat history per session: bounded, evicted when idle, windowed to cap prompt size.
+# Set SESSION_REDIS_URL (needs the `redis` package) to share sessions between workers.
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "12"))
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", "8000"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL")
+
+def create_session_backend():
+    if SESSION_REDIS_URL:
+        try:
+            import redis.asyncio as redis_asyncio
+            return RedisSessionBackend(redis_asyncio.from_url(SESSION_REDIS_URL), SESSION_MAX_SESSIONS, SESSION_IDLE_TTL)
+        except ImportError:
+            logger.warning("⚠️ SESSION_REDIS_URL is set but the 'redis' package is missing; keeping sessions in memory")
+    return MemorySessionBackend(SESSION_MAX_SESSIONS, SESSION_IDLE_TTL)
+
+session_store = SessionStore(create_session_backend(), max_turns=SESSION_MAX_TURNS, max_chars=SESSION_MAX_CHARS)
+
+# Thread pool for the blocking AssemblyAI/Gemini/Murf SDK calls made by /agent/chat
+sdk_pool = BlockingCallPool(
+    max_workers=int(os.getenv("SDK_POOL_WORKERS", "4")),
+    queue_depth=int(os.getenv("SDK_POOL_QUEUE_DEPTH", "8")),
+    max_per_session=int(os.getenv("SDK_POOL_MAX_PER_SESSION", "1"))
+)
+
+# Batch jobs (/agent/batch): BATCH_WORKERS files in flight across all jobs, and at most BATCH_*_CONCURRENCY
+# batch calls to each upstream at once. Uploads are spooled to BATCH_SPOOL_DIR (default: the temp dir);
+# finished jobs and their results are kept for BATCH_JOB_TTL seconds
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "32"))
+BATCH_ASR_CONCURRENCY = int(os.getenv("BATCH_ASR_CONCURRENCY", "8"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+BATCH_TTS_CONCURRENCY = int(os.getenv("BATCH_TTS_CONCURRENCY", "8"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "10000"))
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+BATCH_MAX_ACTIVE_JOBS = int(os.getenv("BATCH_MAX_ACTIVE_JOBS", "4"))
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL", "3600"))
+BATCH_SPOOL_DIR = os.getenv("BATCH_SPOOL_DIR")
+# Threads for the batch's blocking SDK calls: one per call the upstream limits allow at once
+batch_pool = BlockingCallPool(max_workers=BATCH_ASR_CONCURRENCY + BATCH_LLM_CONCURRENCY + BATCH_TTS_CONCURRENCY,
+                              queue_depth=0)
+
+# Murf REST synthesis for /agent/chat: reply chunk size and how many chunks render at once
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "2900"))
+TTS_FANOUT = int(os.getenv("TTS_FANOUT", "4"))
+
+# Cache for movie dialogues resolved through TMDB + Gemini (set DIALOGUE_CACHE_PATH to persist it in sqlite)
+DIALOGUE_CACHE_SIZE = int(os.getenv("DIALOGUE_CACHE_SIZE", "512"))
+DIALOGUE_CACHE_TTL = float(os.getenv("DIALOGUE_CACHE_TTL", "86400"))
+DIALOGUE_CACHE_NEGATIVE_TTL = float(os.getenv("DIALOGUE_CACHE_NEGATIVE_TTL", "600"))
+DIALOGUE_CACHE_PATH = os.getenv("DIALOGUE_CACHE_PATH")
+dialogue_cache = AsyncTTLCache(
+    maxsize=DIALOGUE_CACHE_SIZE,
+    ttl=DIALOGUE_CACHE_TTL,
+    negative_ttl=DIALOGUE_CACHE_NEGATIVE_TTL,
+    backend=SqliteCacheBackend(DIALOGUE_CACHE_PATH) if DIALOGUE_CACHE_PATH else None
+)
+
+# Stream LLM text into Murf sentence by sentence instead of waiting for the full reply
+INCREMENTAL_TTS = os.getenv("INCREMENTAL_TTS", "true").lower() != "false"
+
+# Murf voice used for every reply
+MURF_VOICE_CONFIG = {
+    "voiceId": "en-US-carter",
+    "style": "Conversational",
+    "multiNativeLocale": "hi-IN"
+}
+
+# Reuse warm Murf WebSocket connections across turns and sessions
+MURF_POOL_ENABLED = os.getenv("MURF_POOL_ENABLED", "true").lower() != "false"
+murf_pool = MurfConnectionPool(
+    max_connections_per_key=int(os.getenv("MURF_POOL_MAX_CONNECTIONS", "4")),
+    max_contexts_per_connection=int(os.getenv("MURF_POOL_MAX_CONTEXTS", "8")),
+    idle_timeout=float(os.getenv("MURF_POOL_IDLE_TIMEOUT", "300")),
+    health_interval=float(os.getenv("MURF_POOL_HEALTH_INTERVAL", "20"))
+)
+murf_context_ids = itertools.count(1)
+
+# On-disk cache of synthesized speech for fixed phrases and skill replies (set TTS_CACHE_DIR to enable);
+# TTS_CACHE_PREWARM synthesizes the known fixed phrases at startup
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR")
+TTS_CACHE_PREWARM = os.getenv("TTS_CACHE_PREWARM", "true").lower() != "false"
+audio_cache = AudioCache(
+    TTS_CACHE_DIR,
+    max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024)
+) if TTS_CACHE_DIR else None
+
+# Audio formats the cache keys include: Murf's stream-input chunks (see murf_stream_url) and REST files
+TTS_STREAM_FORMAT = "stream-input:44100:mono:wav"
+TTS_REST_FORMAT = "generate:wav"
+
+class StaticText(str):
+    """Reply text that comes out the same every time (fixed phrases, skill replies), so its audio is cacheable"""
+
+    def __new__(cls, text: str, kind: str):
+        obj = super().__new__(cls, text)
+        obj.kind = kind
+        return obj
+
+# Fixed replies
+NO_SPEECH_REPLY = "Arre bidu, apun ko kuch sunai nahi diya. Wapas se bolo na, jhakas awaaz mein!"
+FALLBACK_ERROR_REPLY = "Arre bidu, apun ko kuch technical problem aa rahi hai. Thoda baad mein try karo na, boss!"
+
+def movie_dialogue_reply(movie: str, dialogue: str) -> str:
+    return f"Arre boss! '{movie}' picture ka dialogue? Ekdum jhakas! \n\n🎭 \"{dialogue}\" 🎭\n\nBole toh, yeh dialogue hai dum ke saath! Kya bolti public? 😎"
+
+# Binary audio transport (negotiated per connection with ?audio_transport=binary; JSON stays the default).
+# Each Murf chunk goes out as one binary frame: a 12-byte big-endian header
+# (version u8, flags u8, 2 pad bytes, turn id u32, sequence u32) followed by the raw WAV bytes.
+BINARY_AUDIO_ENABLED = os.getenv("BINARY_AUDIO_ENABLED", "true").lower() != "false"
+AUDIO_FRAME_VERSION = 1
+AUDIO_FRAME_HEADER = struct.Struct(">BBxxII")
+
+def pack_audio_frame(turn_id: int, seq: int, audio: bytes, flags: int = 0) -> bytes:
+    return AUDIO_FRAME_HEADER.pack(AUDIO_FRAME_VERSION, flags, turn_id & 0xFFFFFFFF, seq) + audio
+
+# Microphone audio is coalesced into chunks of at least INGEST_MIN_MS before going to AssemblyAI
+# (which accepts 50-1000 ms per message); INGEST_MAX_BUFFERED_MS bounds how far upstream may lag
+INGEST_MIN_MS = int(os.getenv("INGEST_MIN_MS", "50"))
+INGEST_MAX_MS = int(os.getenv("INGEST_MAX_MS", "1000"))
+INGEST_MAX_BUFFERED_MS = int(os.getenv("INGEST_MAX_BUFFERED_MS", "2000"))
+ingest_stats = IngestStats()
+
+# Voice activity gate: silence is dropped before it reaches AssemblyAI (VAD_PREROLL_MS of lead-in is
+# kept so word onsets survive). After VAD_HANGOVER_MS without speech the turn is closed with
+# ForceEndpoint, since AssemblyAI can't time the silence it no longer receives
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() != "false"
+VAD_SNR_DB = float(os.getenv("VAD_SNR_DB", "10"))
+VAD_MIN_RMS = float(os.getenv("VAD_MIN_RMS", "200"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "1000"))
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "300"))
+VAD_FORCE_ENDPOINT = os.getenv("VAD_FORCE_ENDPOINT", "true").lower() != "false"
+vad_stats = VadStats()
+
+# Barge-in: each reply runs as a cancellable task; a new user turn or a client Interrupt cancels
+# it, giving its Gemini/Murf cleanup up to BARGE_IN_CANCEL_TIMEOUT seconds to unwind
+BARGE_IN_CANCEL_TIMEOUT = float(os.getenv("BARGE_IN_CANCEL_TIMEOUT", "2"))
+turn_stats = TurnStats()
+
+# Outbound /ws messages go through a per-connection writer task: up to WS_SEND_QUEUE messages are
+# buffered before producers wait, Gemini text chunks within WS_COALESCE_MS are merged into one frame,
+# and a client that takes nothing for WS_STALL_TIMEOUT seconds is disconnected
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "256"))
+WS_COALESCE_MS = float(os.getenv("WS_COALESCE_MS", "20"))
+WS_STALL_TIMEOUT = float(os.getenv("WS_STALL_TIMEOUT", "10"))
+writer_stats = WriterStats()
+# Everything a reply sends; still-queued messages of these types are dropped when the reply is cancelled
+REPLY_MESSAGE_TYPES = frozenset({
+    "CalculationSkillActivated", "MovieSkillActivated", "LLMStreamChunk", "LLMStreamComplete", "LLMStreamError",
+    "MurfAudioChunk", "MurfStreamComplete", "MurfStreamError"
+})
+
+# Speculative replies (opt-in): routing and the Gemini request (or movie lookup) start on AssemblyAI's
+# unformatted end of turn, or on a partial transcript unchanged for SPECULATIVE_STABLE_PARTIALS messages
+# (0 turns that off), and are kept if the formatted transcript is at least SPECULATIVE_MIN_SIMILARITY alike
+SPECULATIVE_REPLY = os.getenv("SPECULATIVE_REPLY", "false").lower() == "true"
+SPECULATIVE_MIN_SIMILARITY = float(os.getenv("SPECULATIVE_MIN_SIMILARITY", "0.9"))
+SPECULATIVE_STABLE_PARTIALS = int(os.getenv("SPECULATIVE_STABLE_PARTIALS", "4"))
+speculation_stats = SpeculationStats()
+
+# Playback metrics reported back by clients (time to first audio as heard, underruns), for /stats
+playback_reports = deque(maxlen=int(os.getenv("PLAYBACK_REPORTS_KEPT", "500")))
+
+def record_playback_metrics(session_id: str, report: dict):
+    try:
+        entry = {key: float(report[key]) for key in ("ttfa_ms", "first_chunk_ms")}
+        entry["underruns"] = int(report.get("underruns") or 0)
+    except (KeyError, TypeError, ValueError):
+        logger.warning(f"⚠️ [Playback] Ignoring malformed metrics from {session_id}: {report}",
+                       extra={"session_id": session_id})
+        return
+    playback_reports.append(entry)
+    logger.info(f"📈 [Playback] {session_id} turn {report.get('turn_id')}: first audio heard after {entry['ttfa_ms']:.0f} ms "
+                f"(first chunk {entry['first_chunk_ms']:.0f} ms, server {report.get('server_first_audio_ms')} ms, "
+                f"{entry['underruns']} underruns)", extra={"session_id": session_id})
+
+def playback_stats() -> dict:
+    if not playback_reports:
+        return {"reports": 0}
+    def percentile(key, q):
+        values = sorted(report[key] for report in playback_reports)
+        return round(values[min(len(values) - 1, len(values) * q // 100)], 1)
+    return {
+        "reports": len(playback_reports),
+        "ttfa_ms_p50": percentile("ttfa_ms", 50),
+        "ttfa_ms_p95": percentile("ttfa_ms", 95),
+        "first_chunk_ms_p50": percentile("first_chunk_ms", 50),
+        "underruns_per_turn": round(statistics.fmean(r["underruns"] for r in playback_reports), 2)
+    }
+
+def murf_stream_url(murf_key: str) -> str:
+    return f"{MURF_WS_URL}?api-key={murf_key}&sample_rate=44100&channel_type=MONO&format=WAV"
+
+# Providers per pipeline stage, in order of preference (comma-separated, "name:model" / "name:voice"):
+# gemini[:model] and template for LLM_PROVIDERS, murf[:voice] and tone for TTS_PROVIDERS, assemblyai
+# for ASR_PROVIDERS. template and tone are local CPU-only stand-ins that need no network
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "gemini:gemini-1.5-flash")
+TTS_PROVIDERS = os.getenv("TTS_PROVIDERS", f"murf:{MURF_VOICE_CONFIG['voiceId']}")
+ASR_PROVIDERS = os.getenv("ASR_PROVIDERS", "assemblyai")
+
+# Every provider has a circuit breaker: PROVIDER_FAILURE_THRESHOLD failures in a row open it for
+# PROVIDER_RESET_TIMEOUT seconds, then one trial call decides. A provider whose recent median latency
+# (to the first token / audio / connection, within PROVIDER_LATENCY_WINDOW seconds) is over its stage's
+# *_SLOW_MS is tried after the others, and a call taking longer than the stage's *_TIMEOUT seconds
+# counts as failed and moves on to the next provider (a stage's only provider isn't tripped by timeouts)
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "5"))
+PROVIDER_RESET_TIMEOUT = float(os.getenv("PROVIDER_RESET_TIMEOUT", "30"))
+PROVIDER_LATENCY_WINDOW = float(os.getenv("PROVIDER_LATENCY_WINDOW", "30"))
+LLM_SLOW_MS = float(os.getenv("LLM_SLOW_MS", "2000"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "15"))
+TTS_SLOW_MS = float(os.getenv("TTS_SLOW_MS", "3000"))
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "20"))
+ASR_SLOW_MS = float(os.getenv("ASR_SLOW_MS", "3000"))
+ASR_TIMEOUT = float(os.getenv("ASR_TIMEOUT", "30"))
+# File transcription (/agent/chat, batch jobs) takes longer the longer the recording: its timeout is
+# ASR_TIMEOUT plus ASR_TIMEOUT_PER_MB seconds per MB of upload (a MB is ~30 s of 16 kHz WAV, minutes of MP3)
+ASR_TIMEOUT_PER_MB = float(os.getenv("ASR_TIMEOUT_PER_MB", "60"))
+
+# Hedged requests (opt-in, they can double upstream usage): a short request (up to HEDGE_MAX_CHARS of
+# text) also goes to the next provider once the first has taken longer than its recent HEDGE_PERCENTILE
+# latency (HEDGE_DELAY_MS until it has enough samples), and the first answer wins
+PROVIDER_HEDGING = os.getenv("PROVIDER_HEDGING", "false").lower() == "true"
+HEDGE_MAX_CHARS = int(os.getenv("HEDGE_MAX_CHARS", "200"))
+HEDGE_DELAY_MS = float(os.getenv("HEDGE_DELAY_MS", "1000"))
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+
+# Providers make their blocking SDK calls through the SDK pool, or the pool set in blocking_calls
+# (batch jobs use their own, so a large batch can't queue ahead of /agent/chat)
+blocking_calls = contextvars.ContextVar("blocking_calls", default=None)
+
+async def run_blocking(fn, *args, **kwargs):
+    return await (blocking_calls.get() or sdk_pool).run(fn, *args, **kwargs)
+
+def create_provider(stage: str, spec: str):
+    name, _, option = spec.strip().partition(":")
+    if stage == "llm" and name == "gemini":
+        return GeminiLLM(gemini_models, option or "gemini-1.5-flash", run_blocking=run_blocking)
+    if stage == "llm" and name == "template":
+        return TemplateLLM()
+    if stage == "tts" and name == "murf":
+        voice_config = {**MURF_VOICE_CONFIG, "voiceId": option or MURF_VOICE_CONFIG["voiceId"]}
+        return MurfTTS(murf_pool, murf_stream_url, voice_config, run_blocking, pooled=MURF_POOL_ENABLED)
+    if stage == "tts" and name == "tone":
+        return ToneTTS()
+    if stage == "asr" and name == "assemblyai":
+        return AssemblyAIASR(lambda: ASSEMBLYAI_WS_URL, run_blocking)
+    raise ValueError(f"Unknown {stage} provider: {spec!r}")
+
+def create_router(stage: str, specs: str, slow_ms: float, timeout: float) -> ProviderRouter:
+    return ProviderRouter(
+        stage, [create_provider(stage, spec) for spec in specs.split(",") if spec.strip()],
+        timeout=timeout, slow_ms=slow_ms, failure_threshold=PROVIDER_FAILURE_THRESHOLD,
+        reset_timeout=PROVIDER_RESET_TIMEOUT, window=PROVIDER_LATENCY_WINDOW, hedge_delay_ms=HEDGE_DELAY_MS,
+        hedge_percentile=HEDGE_PERCENTILE
+    )
+
+llm_router = create_router("llm", LLM_PROVIDERS, LLM_SLOW_MS, LLM_TIMEOUT)
+tts_router = create_router("tts", TTS_PROVIDERS, TTS_SLOW_MS, TTS_TIMEOUT)
+asr_router = create_router("asr", ASR_PROVIDERS, ASR_SLOW_MS, ASR_TIMEOUT)
+
+def transcribe_timeout(size_bytes: int) -> float:
+    return ASR_TIMEOUT + ASR_TIMEOUT_PER_MB * (size_bytes or 0) / 1024 ** 2
+
+# A hedge is only worth its duplicate upstream call for short requests
+def should_hedge(text: str) -> bool:
+    return PROVIDER_HEDGING and len(text) <= HEDGE_MAX_CHARS
+
 # Movie Database for Popular Bollywood Movies and Dialogues
 BOLLYWOOD_MOVIES_DB = {
     "sholay": {
@@ -92,139 +472,168 @@ BOLLYWOOD_MOVIES_DB = {
     }
 }
 
+# Application-lifetime HTTP client (created in lifespan, reused for every upstream lookup)
+http_client: httpx.AsyncClient = None
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("⚠️ HTTP2_ENABLED is set but the 'h2' package is missing; falling back to HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    # Normally set up by lifespan; created on demand when called outside the app (scripts, benchmarks)
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+    return http_client
+
+# GET with retries on transport errors, 429 and 5xx, using full-jitter exponential backoff
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+async def get_with_retry(url: str, params: dict = None, timeout: float = None, retries: int = None) -> httpx.Response:
+    retries = HTTP_RETRIES if retries is None else retries
+    client = get_http_client()
+    request_timeout = httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params, timeout=request_timeout)
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == retries:
+                return response
+            delay = float(response.headers.get("Retry-After", 0) or 0)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            delay = 0
+        await asyncio.sleep(max(delay, random.uniform(0, HTTP_BACKOFF_BASE * 2 ** attempt)))
+
+# Movie corpus: the built-in movies above plus an optional JSON/CSV file (MOVIES_DB_PATH), indexed on first use
+MOVIES_DB_PATH = os.getenv("MOVIES_DB_PATH")
+movie_index = LazyMovieIndex(BOLLYWOOD_MOVIES_DB, MOVIES_DB_PATH)
+
 # Function to search movie in TMDB API
-async def search_movie_tmdb(movie_name: str, tmdb_api_key: str = None):
-    """Search for movie in TMDB database"""
+async def search_movie_tmdb(movie_name: str, tmdb_api_key: str = None, raise_errors: bool = False):
+    """Search for movie in TMDB database (raise_errors tells a failed lookup apart from "no results")"""
     if not tmdb_api_key:
         return None
     
     try:
-        async with httpx.AsyncClient() as client:
-            url = "https://api.themoviedb.org/3/search/movie"
-            params = {
-                "api_key": tmdb_api_key,
-                "query": movie_name,
-                "language": "hi-IN"
-            }
-            
-            response = await client.get(url, params=params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data["results"]:
-                    return data["results"][0]
+        url = f"{TMDB_API_URL}/search/movie"
+        params = {
+            "api_key": tmdb_api_key,
+            "query": movie_name,
+            "language": "hi-IN"
+        }
+        
+        response = await get_with_retry(url, params=params)
+        response.raise_for_status()
+        
+        data = response.json()
+        if data["results"]:
+            return data["results"][0]
     except Exception as e:
-        print(f"❌ TMDB API Error: {e}")
+        logger.error(f"❌ TMDB API Error: {e}")
+        if raise_errors:
+            raise
     
     return None
 
+# Reply used whenever a movie can't be resolved
+MOVIE_NOT_FOUND = {
+    "found": False,
+    "message": "Arre bidu, yeh movie apun ko pata nahi hai. Koi aur famous picture ka naam bolo na!"
+}
+
 # Function to get movie dialogue
 async def get_movie_dialogue(movie_query: str, gemini_api_key: str = None, tmdb_api_key: str = None):
     """Get a famous dialogue from the requested movie"""
     movie_query_lower = movie_query.lower().strip()
     
-    # First check our local Bollywood database
-    for key, movie_data in BOLLYWOOD_MOVIES_DB.items():
-        if key in movie_query_lower or movie_data["title"].lower() in movie_query_lower:
-            dialogue = random.choice(movie_data["dialogues"])
-            return {
-                "found": True,
-                "movie": movie_data["title"],
-                "dialogue": dialogue,
-                "source": "local_db"
-            }
+    # First check our local movie database
+    movie_data = (await movie_index.aget()).lookup(movie_query_lower)
+    if movie_data:
+        dialogue = random.choice(movie_data["dialogues"])
+        return {
+            "found": True,
+            "movie": movie_data["title"],
+            "dialogue": dialogue,
+            "source": "local_db"
+        }
     
     # If not found locally, search in TMDB (if API key is available)
     if tmdb_api_key:
-        tmdb_result = await search_movie_tmdb(movie_query, tmdb_api_key)
-        if tmdb_result:
-            movie_title = tmdb_result["title"]
-            
-            # Generate dialogue using Gemini for the found movie (if API key is available)
-            if gemini_api_key:
-                try:
-                    genai.configure(api_key=gemini_api_key)
-                    model = genai.GenerativeModel('gemini-1.5-flash')
-                    
-                    dialogue_prompt = f"""
-                    Movie: {movie_title}
-                    
-                    Mumbai tapori style mein iss movie ka ek famous dialogue ya quote batao. 
-                    Agar original dialogue nahi pata toh movie ke theme ke hisaab se ek tapori style dialogue create kar de.
-                    Sirf dialogue return karo, koi extra explanation nahi chahiye.
-                    """
-                    
-                    response = await model.generate_content_async(dialogue_prompt)
-                    generated_dialogue = response.text.strip()
-                    
-                    return {
-                        "found": True,
-                        "movie": movie_title,
-                        "dialogue": generated_dialogue,
-                        "source": "tmdb_generated"
-                    }
-                except Exception as e:
-                    print(f"❌ Error generating dialogue: {e}")
+        cache_key = f"{' '.join(movie_query_lower.split())}|gemini={bool(gemini_api_key)}"
+        try:
+            return await dialogue_cache.get_or_fetch(
+                cache_key,
+                lambda: resolve_movie_dialogue(movie_query, gemini_api_key, tmdb_api_key),
+                is_negative=lambda result: not result["found"]
+            )
+        except Exception as e:
+            logger.error(f"❌ Error resolving movie dialogue: {e}")
+    
+    return MOVIE_NOT_FOUND
+
+# TMDB search + Gemini dialogue generation; raises on upstream failures so they aren't cached as "not found"
+async def resolve_movie_dialogue(movie_query: str, gemini_api_key: str, tmdb_api_key: str):
+    tmdb_result = await search_movie_tmdb(movie_query, tmdb_api_key, raise_errors=True)
+    if not tmdb_result or not gemini_api_key:
+        return MOVIE_NOT_FOUND
+    
+    movie_title = tmdb_result["title"]
+    
+    # Generate dialogue using Gemini for the found movie
+    model = await gemini_models.aget(gemini_api_key)
+    
+    dialogue_prompt = f"""
+    Movie: {movie_title}
+    
+    Mumbai tapori style mein iss movie ka ek famous dialogue ya quote batao. 
+    Agar original dialogue nahi pata toh movie ke theme ke hisaab se ek tapori style dialogue create kar de.
+    Sirf dialogue return karo, koi extra explanation nahi chahiye.
+    """
+    
+    response = await model.generate_content_async(dialogue_prompt)
+    generated_dialogue = response.text.strip()
     
     return {
-        "found": False,
-        "message": "Arre bidu, yeh movie apun ko pata nahi hai. Koi aur famous picture ka naam bolo na!"
+        "found": True,
+        "movie": movie_title,
+        "dialogue": generated_dialogue,
+        "source": "tmdb_generated"
     }
 
 # Function to perform calculations
 def perform_calculation(calculation_query: str):
-    """Perform basic arithmetic calculations"""
+    """Perform arithmetic on a spoken query (digits or Hindi/English number words)"""
     try:
-        # Clean the query and convert to lowercase
-        query = calculation_query.lower().strip()
-        
-        # Replace words with operators
-        query = query.replace("plus", "+").replace("add", "+").replace("jod", "+")
-        query = query.replace("minus", "-").replace("subtract", "-").replace("ghata", "-")
-        query = query.replace("times", "*").replace("multiply", "*").replace("guna", "*")
-        query = query.replace("divided by", "/").replace("divide", "/").replace("bhag", "/")
-        
-        # Remove all non-numeric and non-operator characters
-        query = re.sub(r'[^\d+\-*/().]', '', query)
-        
-        # Evaluate the expression safely
-        result = eval(query)
+        expression, result = calculate(calculation_query)
         
         return {
             "success": True,
-            "expression": query,
+            "expression": expression,
             "result": result,
-            "response": f"Bidu, calculation ho gaya! {query} ka result hai {result}. Ekdum correct hai na? 😎"
+            "response": f"Bidu, calculation ho gaya! {expression} ka result hai {result}. Ekdum correct hai na? 😎"
         }
-    except Exception as e:
+    except CalculationError as e:
         return {
             "success": False,
             "error": str(e),
             "response": "Arre boss, apun ko samajh nahi aaya. Calculation clear se bolo na, jaise '2 plus 3' ya '10 times 5'."
         }
 
-# Function to detect if user is asking for calculation
-def is_calculation_query(user_query: str) -> bool:
-    """Check if user is asking for a calculation"""
-    query_lower = user_query.lower()
-    
-    calculation_keywords = [
-        'calculate', 'calculation', 'math', 'add', 'plus', 'jod', 'sum',
-        'subtract', 'minus', 'ghata', 'difference', 
-        'multiply', 'times', 'guna', 'product',
-        'divide', 'divided by', 'bhag', 'quotient',
-        'equal', 'result', 'answer', 'kitna', 'kya hota hai'
-    ]
-    
-    # Check for numbers and calculation keywords
-    has_numbers = any(char.isdigit() for char in query_lower)
-    has_calculation_words = any(keyword in query_lower for keyword in calculation_keywords)
-    
-    # Check for mathematical operators
-    has_operators = any(op in query_lower for op in ['+', '-', '*', '/', '×', '÷'])
-    
-    return (has_numbers and has_calculation_words) or has_operators
-
 # Enhanced system prompt with movie dialogue skill
 system_prompt = """
 "You are CynicAI, a sarcastic robot assistant with web search and calculator capabilities. "
@@ -252,303 +661,848 @@ def split_text(text, limit=2900):
     if text: chunks.append(text)
     return chunks
 
-# Function to detect if user is asking for movie dialogue
-def is_movie_dialogue_query(user_query: str) -> tuple[bool, str]:
-    """Check if user is asking for movie dialogue and extract movie name"""
-    query_lower = user_query.lower()
-    
-    movie_keywords = ['dialogue', 'dialog', 'line', 'quote', 'movie', 'film', 'picture', 'suna', 'batao', 'bolo']
-    movie_indicators = any(keyword in query_lower for keyword in movie_keywords)
-    
-    if movie_indicators:
-        # Try to extract movie name
-        words = user_query.split()
-        # Remove common words to isolate movie name
-        stop_words = {'ka', 'ki', 'ke', 'se', 'me', 'mein', 'dialogue', 'dialog', 'movie', 'film', 'picture', 'suna', 'batao', 'bolo', 'famous', 'best'}
-        movie_words = [word for word in words if word.lower() not in stop_words and len(word) > 2]
-        
-        if movie_words:
-            return True, ' '.join(movie_words)
-    
-    return False, ""
+# Sentence/clause boundaries used to cut streamed LLM text into TTS segments
+SENTENCE_BOUNDARY = re.compile(r'[.!?।]+["\')\]]*\s+|\n+')
+CLAUSE_BOUNDARY = re.compile(r'[,;:]\s+')
+
+class SentenceSegmenter:
+    """Cut streamed LLM text into sentence/clause segments as soon as they are complete"""
+
+    def __init__(self, min_chars: int = 20, clause_chars: int = 80):
+        # Segments shorter than min_chars are merged into the next one so Murf
+        # doesn't get a string of tiny requests; clause_chars is how long a
+        # sentence may run before we cut it at a comma/semicolon instead.
+        self.min_chars = min_chars
+        self.clause_chars = clause_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> list[str]:
+        self.buffer += text
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            segment, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:]
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> list[str]:
+        segment, self.buffer = self.buffer.strip(), ""
+        return [segment] if segment else []
+
+    def _find_cut(self):
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            if len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                return match.end()
+        if len(self.buffer) >= self.clause_chars:
+            for match in CLAUSE_BOUNDARY.finditer(self.buffer):
+                if len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                    return match.end()
+        return None
+
+# Async iterator over the segments an LLM producer puts on a queue (None ends the stream)
+async def iter_segments(segment_queue: asyncio.Queue):
+    while True:
+        segment = await segment_queue.get()
+        if segment is None:
+            return
+        yield segment
+
+# Intent routing: every skill registers its keywords here and a transcript is classified in one pass
+intent_router = IntentRouter(fallback="chat")
+
+CALCULATION_KEYWORDS = [
+    'calculate', 'calculation', 'math', 'add', 'plus', 'jod', 'sum',
+    'subtract', 'minus', 'ghata', 'difference', 
+    'multiply', 'times', 'guna', 'product',
+    'divide', 'divided by', 'bhag', 'quotient',
+    'equal', 'result', 'answer', 'kitna', 'kya hota hai'
+]
+
+MOVIE_KEYWORDS = ['dialogue', 'dialog', 'line', 'quote', 'movie', 'film', 'picture', 'suna', 'batao', 'bolo']
+
+# Words removed from a movie request to isolate the movie name
+MOVIE_STOP_WORDS = {'ka', 'ki', 'ke', 'se', 'me', 'mein', 'dialogue', 'dialog', 'movie', 'film', 'picture', 'suna', 'batao', 'bolo', 'famous', 'best'}
+
+# Calculation skill: numbers (digits or number words) plus a calculation word, or an explicit operator
+@intent_router.skill(
+    "calculation",
+    keywords=CALCULATION_KEYWORDS,
+    condition=lambda f: f.has_operators or (bool(f.keywords("calculation")) and (f.has_digits or has_number_words(f.text))),
+    confidence=lambda f: 1.0 if f.has_operators and f.has_digits else 0.9 if f.has_digits else 0.6
+)
+def calculation_slots(user_query: str, features) -> dict:
+    return {"expression": user_query}
+
+# Movie dialogue skill: a movie word plus something that could be the movie name
+@intent_router.skill("movie_dialogue", keywords=MOVIE_KEYWORDS)
+def movie_dialogue_slots(user_query: str, features):
+    # Formatted transcripts end in punctuation ("... batao."), which isn't part of any title
+    words = [word.strip(".,!?;:\"'") for word in user_query.split()]
+    movie_words = [word for word in words if word.lower() not in MOVIE_STOP_WORDS and len(word) > 2]
+    if not movie_words:
+        return None
+    return {"movie_name": ' '.join(movie_words)}
 
 # Home route to serve the main HTML page
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+# Synthesize reply chunks concurrently (up to `fanout` at a time) but hand them back in order
+async def synthesize_chunks(text_chunks: list, murf_api_key: str, fanout: int = None, cache_kind: str = None, hedge: bool = True):
+    """Yield (index, audio_url, timing) for each chunk, in chunk order.
+
+    With a cache_kind (fixed phrases, skill replies) chunks are served from the
+    audio cache when present, and stored there (and served from /tts-cache) when not.
+    """
+    semaphore = asyncio.Semaphore(fanout or TTS_FANOUT)
+    started = time.perf_counter()
+    # Cached audio is in the preferred voice; a chunk another provider voiced isn't stored under it
+    primary = tts_router.primary
+
+    async def synthesize(chunk):
+        key = audio_cache.make_key(chunk, primary.voice_config, TTS_REST_FORMAT) if cache_kind and audio_cache is not None else None
+        if key and audio_cache.lookup(key, cache_kind):
+            ready_ms = round((time.perf_counter() - started) * 1000, 1)
+            return f"/tts-cache/{key}", {"chars": len(chunk), "queued_ms": ready_ms, "synth_ms": 0.0,
+                                         "ready_ms": ready_ms, "cached": True}
+        async with semaphore:
+            began = time.perf_counter()
+            tts, response_murf = await tts_router.call(
+                lambda tts: tts.synthesize(chunk, murf_api_key, encode=bool(key)), hedge=hedge and should_hedge(chunk))
+        finished = time.perf_counter()
+        audio_url = response_murf.audio_file
+        encoded_audio = getattr(response_murf, "encoded_audio", None)
+        if key and encoded_audio and tts is primary:
+            await audio_cache.aput(key, base64.b64decode(encoded_audio))
+            audio_url = f"/tts-cache/{key}"
+        return audio_url, {
+            "chars": len(chunk),
+            "queued_ms": round((began - started) * 1000, 1),
+            "synth_ms": round((finished - began) * 1000, 1),
+            "ready_ms": round((finished - started) * 1000, 1),
+            "cached": False
+        }
+
+    tasks = [asyncio.create_task(synthesize(chunk)) for chunk in text_chunks]
+    try:
+        for index, task in enumerate(tasks):
+            audio_url, timing = await task
+            yield index, audio_url, timing
+    finally:
+        # The caller stopped early (error or client gone): don't start the remaining chunks
+        for task in tasks:
+            task.cancel()
+
+# NDJSON body for /agent/chat?stream=true: the reply first, then each audio chunk as soon as it is ready
+async def stream_chat_audio(admission, user_query: str, llm_text: str, text_chunks: list, cache_kind: str = None):
+    try:
+        yield json.dumps({"type": "reply", "user_query": user_query, "llm_response": llm_text,
+                          "chunks": len(text_chunks)}) + "\n"
+        async for index, audio_url, timing in synthesize_chunks(text_chunks, MURF_API_KEY, cache_kind=cache_kind):
+            yield json.dumps({"type": "audio", "index": index, "audio_url": audio_url,
+                              "text": text_chunks[index], "timing": timing}) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+    except Exception as e:
+        logger.error(f"❌ [Murf] Streaming chunk synthesis failed: {e}")
+        yield json.dumps({"type": "error", "error": "Audio generation failed"}) + "\n"
+    finally:
+        admission.release()
+
+# Reply text for a transcribed question: a skill (calculation, movie dialogue) or Gemini, without history
+async def answer_query(user_query: str, hedge: bool = True):
+    if not user_query:
+        return StaticText(NO_SPEECH_REPLY, "no_speech")
+    route = intent_router.route(user_query)
+
+    # Check if user is asking for calculation first
+    if route.intent == "calculation":
+        logger.info(f"🧮 Calculation request detected: {user_query}")
+        calculation_result = perform_calculation(user_query)
+        return StaticText(calculation_result["response"], "calculation")
+
+    # Check if user is asking for movie dialogue
+    if route.intent == "movie_dialogue":
+        movie_name = route.slots["movie_name"]
+        logger.info(f"🎬 Movie dialogue request detected for: {movie_name}")
+        dialogue_result = await get_movie_dialogue(movie_name, GEMINI_API_KEY, TMDB_API_KEY)
+
+        if dialogue_result["found"]:
+            return StaticText(movie_dialogue_reply(dialogue_result['movie'], dialogue_result['dialogue']), "movie_dialogue")
+        return StaticText(dialogue_result["message"], "movie_dialogue")
+
+    # Regular Gemini response for other queries (each request is context-free, so always cacheable)
+    llm_text = response_cache.lookup(user_query) if response_cache is not None else None
+    if llm_text is None:
+        llm, llm_text = await llm_router.call(
+            lambda llm: llm.complete(user_query, system_prompt, GEMINI_API_KEY), hedge=hedge and should_hedge(user_query))
+        # A fallback's reply (the template LLM's "try again later") isn't an answer to replay once Gemini is back
+        if response_cache is not None and llm is llm_router.primary:
+            response_cache.store(user_query, llm_text)
+    return llm_text
+
 # Error handling
 @app.post("/agent/chat/{session_id}")
-async def agent_chat(session_id: str, file: UploadFile = File(...)):
+async def agent_chat(session_id: str, file: UploadFile = File(...), stream: bool = False):
+    # Turn requests away up front when the SDK pool is saturated or the session is already busy
+    try:
+        admission = sdk_pool.admit(session_id)
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 [SDK Pool] Rejected request for {session_id}: {e}", extra={"session_id": session_id})
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    streaming = False
     try:
         # Get API keys from request or use environment variables
         # This endpoint is kept for backward compatibility but uses env vars
         if not all([ASSEMBLYAI_API_KEY, MURF_API_KEY, GEMINI_API_KEY]):
             raise Exception("Server is missing one or more API keys.")
 
-        # Initialize transcriber with environment key
-        aai.settings.api_key = ASSEMBLYAI_API_KEY
-        transcriber = aai.Transcriber(config=aai.TranscriptionConfig(speech_model=aai.SpeechModel.best))
-        
-        audio_data = await file.read()
-        transcript = transcriber.transcribe(audio_data)
-        if transcript.status == aai.TranscriptStatus.error:
-            raise Exception(f"Transcription failed: {transcript.error}")
+        # Starlette spools the upload (in memory up to 1 MB, then on disk); the SDK streams it from there
+        _, user_query = await asr_router.call(lambda asr: asr.transcribe(file.file, ASSEMBLYAI_API_KEY),
+                                              timeout=transcribe_timeout(file.size))
+        llm_text = await answer_query(user_query)
         
-        user_query = transcript.text
-        if not user_query:
-            user_query = ""
-            llm_text = "Arre bidu, apun ko kuch sunai nahi diya. Wapas se bolo na, jhakas awaaz mein!"
-        else:
-            # Check if user is asking for calculation first
-            if is_calculation_query(user_query):
-                print(f"🧮 Calculation request detected: {user_query}")
-                calculation_result = perform_calculation(user_query)
-                
-                if calculation_result["success"]:
-                    llm_text = calculation_result["response"]
-                else:
-                    llm_text = calculation_result["response"]
-            
-            # Check if user is asking for movie dialogue
-            elif is_movie_dialogue_query(user_query)[0]:
-                movie_name = is_movie_dialogue_query(user_query)[1]
-                print(f"🎬 Movie dialogue request detected for: {movie_name}")
-                dialogue_result = await get_movie_dialogue(movie_name, GEMINI_API_KEY, TMDB_API_KEY)
-                
-                if dialogue_result["found"]:
-                    llm_text = f"Arre boss! '{dialogue_result['movie']}' picture ka dialogue? Ekdum jhakas! \n\n🎭 \"{dialogue_result['dialogue']}\" 🎭\n\nBole toh, yeh dialogue hai dum ke saath! Kya bolti public? 😎"
-                else:
-                    llm_text = dialogue_result["message"]
-            else:
-                # Regular Gemini response for other queries
-                genai.configure(api_key=GEMINI_API_KEY)
-                model = genai.GenerativeModel('gemini-1.5-flash')
-                full_prompt = f"{system_prompt}\n\nUser ka question: {user_query}"
-                response_llm = model.generate_content(full_prompt)
-                llm_text = response_llm.text
-        
-        text_chunks = split_text(llm_text)
-        client_murf = Murf(api_key=MURF_API_KEY)
+        text_chunks = split_text(llm_text, TTS_CHUNK_CHARS)
+        # Fixed phrases and skill replies have cacheable audio; Gemini replies don't
+        cache_kind = getattr(llm_text, "kind", None)
+        if stream:
+            # The stream releases the admission after the last chunk (the background task covers a body never iterated)
+            streaming = True
+            return StreamingResponse(stream_chat_audio(admission, user_query, llm_text, text_chunks, cache_kind),
+                                     media_type="application/x-ndjson", background=BackgroundTask(admission.release))
+
         audio_urls = []
-        for chunk in text_chunks:
-            response_murf = client_murf.text_to_speech.generate(
-                text=chunk, 
-                voice_id="en-US-carter",
-                style="Conversational",
-                multiNativeLocale="hi-IN"
-            )
-            audio_urls.append(response_murf.audio_file)
+        chunk_timings = []
+        async for index, audio_url, timing in synthesize_chunks(text_chunks, MURF_API_KEY, cache_kind=cache_kind):
+            audio_urls.append(audio_url)
+            chunk_timings.append(timing)
+        if len(text_chunks) > 1:
+            logger.info(f"🎵 [Murf] Synthesized {len(text_chunks)} chunks in {chunk_timings[-1]['ready_ms']:.0f} ms",
+                        extra={"session_id": session_id})
 
         return {
             "audio_urls": audio_urls, "user_query": user_query,
-            "llm_response": llm_text, "message": "Conversational response generated successfully"
+            "llm_response": llm_text, "message": "Conversational response generated successfully",
+            "chunk_timings": chunk_timings
         }
     except Exception as e:
-        print(f"An error occurred in the main chat pipeline: {e}") 
+        logger.error(f"❌ [Chat] Error in the chat pipeline: {e}", extra={"session_id": session_id})
         try:
-            client_murf = Murf(api_key=MURF_API_KEY)
-            error_text = "Arre bidu, apun ko kuch technical problem aa rahi hai. Thoda baad mein try karo na, boss!"
-            response_murf = client_murf.text_to_speech.generate(
-                text=error_text, 
-                voice_id="en-US-carter",
-                style="Conversational",
-                multiNativeLocale="hi-IN"
-            )
+            # Served from the audio cache when pre-warmed, so the fallback doesn't depend on Murf while things are failing
+            async for _, audio_url, _ in synthesize_chunks([FALLBACK_ERROR_REPLY], MURF_API_KEY, cache_kind="error_fallback"):
+                break
             return JSONResponse(status_code=503, content={
-                    "audio_urls": [response_murf.audio_file], "llm_response": error_text,
+                    "audio_urls": [audio_url], "llm_response": FALLBACK_ERROR_REPLY,
                     "message": "A fallback audio response was generated due to an internal error."
             })
         except Exception as murf_error:
-            print(f"CRITICAL: Failed to generate fallback audio: {murf_error}")
+            logger.critical(f"❌ [Murf] Failed to generate fallback audio: {murf_error}", extra={"session_id": session_id})
             raise HTTPException(status_code=500, detail="A critical internal error occurred.")
+    finally:
+        if not streaming:
+            admission.release()
+
+# One batch file through the /agent/chat pipeline, on the batch pool and within the per-upstream limits
+# (no hedging: a batch wants throughput, not the fastest single answer)
+async def process_batch_file(job, item) -> dict:
+    blocking_calls.set(batch_pool)
+    limits = batch_runner.limits
+    async with limits["asr"]:
+        with open(item.path, "rb") as audio:
+            _, user_query = await asr_router.call(lambda asr: asr.transcribe(audio, ASSEMBLYAI_API_KEY),
+                                                  timeout=transcribe_timeout(item.size))
+    async with limits["llm"]:
+        llm_text = await answer_query(user_query, hedge=False)
+    result = {"user_query": user_query, "llm_response": llm_text}
+    if job.options.get("synthesize"):
+        text_chunks = split_text(llm_text, TTS_CHUNK_CHARS)
+        async with limits["tts"]:
+            result["audio_urls"] = [audio_url async for _, audio_url, _ in synthesize_chunks(
+                text_chunks, MURF_API_KEY, fanout=1, cache_kind=getattr(llm_text, "kind", None), hedge=False)]
+    return result
+
+batch_runner = BatchRunner(
+    process_batch_file,
+    workers=BATCH_WORKERS,
+    limits={"asr": BATCH_ASR_CONCURRENCY, "llm": BATCH_LLM_CONCURRENCY, "tts": BATCH_TTS_CONCURRENCY},
+    spool_dir=BATCH_SPOOL_DIR,
+    max_active_jobs=BATCH_MAX_ACTIVE_JOBS,
+    job_ttl=BATCH_JOB_TTL
+)
+
+def batch_status(job) -> dict:
+    return {**job.stats(), "status_url": f"/agent/batch/{job.id}", "results_url": f"/agent/batch/{job.id}/results"}
+
+# Batch job: any number of recordings as file fields of one multipart upload, streamed to disk as they
+# arrive; ?synthesize=false skips the reply audio. Answers 202 with the job's status
+@app.post("/agent/batch")
+async def create_batch_job(request: Request, synthesize: bool = True):
+    if not all([ASSEMBLYAI_API_KEY, GEMINI_API_KEY] + ([MURF_API_KEY] if synthesize else [])):
+        raise HTTPException(status_code=503, detail="Server is missing one or more API keys.")
+    try:
+        job = batch_runner.create_job({"synthesize": synthesize})
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 [Batch] Rejected job: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    try:
+        items = await spool_multipart(request.stream(), request.headers.get("content-type", ""), job.directory,
+                                      BATCH_MAX_FILES, BATCH_MAX_UPLOAD_BYTES)
+        if not items:
+            raise UploadRejected("no files in the upload")
+    except UploadRejected as e:
+        batch_runner.discard(job.id)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except BaseException:
+        # Client gone mid-upload: drop what was spooled
+        batch_runner.discard(job.id)
+        raise
+    batch_runner.submit(job, items)
+    logger.info(f"📦 [Batch] Job {job.id} queued with {len(items)} files")
+    return JSONResponse(status_code=202, content=batch_status(job))
+
+# Batch job progress, for polling
+@app.get("/agent/batch/{job_id}")
+async def get_batch_job(job_id: str):
+    job = batch_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return batch_status(job)
+
+# Batch results as NDJSON, one line per file in the order they finish; follows a running job until it is done
+@app.get("/agent/batch/{job_id}/results")
+async def get_batch_results(job_id: str):
+    job = batch_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return StreamingResponse(job.follow(), media_type="application/x-ndjson")
+
+# Cancel a batch job and delete its files and results
+@app.delete("/agent/batch/{job_id}")
+async def delete_batch_job(job_id: str):
+    if not batch_runner.discard(job_id):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return {"job_id": job_id, "status": "deleted"}
+
+# Cached speech (content-addressed, so it never changes under its URL)
+@app.get("/tts-cache/{key}")
+async def tts_cache_audio(key: str):
+    try:
+        path = audio_cache.path(key) if audio_cache is not None else None
+    except ValueError:
+        path = None
+    try:
+        stat_result = await asyncio.to_thread(os.stat, path) if path is not None else None
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Audio not cached")
+    # The file is streamed from disk (page cache) in chunks rather than copied into one response body
+    return FileResponse(path, media_type="audio/wav", stat_result=stat_result,
+                        headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+# Send a cached reply's audio the way a live Murf stream delivers it (same messages, same chunking)
+async def replay_cached_audio(audio, websocket: ClientWriter, turn_id: int, audio_transport: str, trace: TurnTrace):
+    chunk_ms = []
+    with audio:
+        for seq, chunk in enumerate(iter_chunks(audio)):
+            trace.mark("first_audio")
+            elapsed_ms = round((time.perf_counter() - trace.started) * 1000, 1)
+            if audio_transport == "binary":
+                await websocket.send_bytes(pack_audio_frame(turn_id, seq, chunk), "MurfAudioChunk")
+            else:
+                await websocket.send_message({ "type": "MurfAudioChunk", "audio": base64.b64encode(chunk).decode(), "turn_id": turn_id, "seq": seq, "server_ms": elapsed_ms })
+            chunk_ms.append(elapsed_ms)
+    trace.mark("last_audio")
+    await websocket.send_message({
+        "type": "MurfStreamComplete", "total_chunks": len(chunk_ms), "turn_id": turn_id,
+        "first_audio_ms": chunk_ms[0] if chunk_ms else None, "chunk_ms": chunk_ms, "cached": True
+    })
 
 # Enhanced streaming logic with API key handling
-async def stream_to_murf_websocket(text_stream, session_id: str, websocket: WebSocket, murf_api_key: str):
+async def stream_to_murf_websocket(text_stream, session_id: str, websocket: ClientWriter, murf_api_key: str, audio_transport: str = "json", trace: TurnTrace = None):
+    """Stream TTS audio for a full reply (str) or for an async iterator of text segments"""
+    # Chunk timings are reported relative to the end of the user's turn when the caller traces it
+    trace = trace or TurnTrace(session_id)
+    log = {"session_id": session_id}
     try:
-        print(f"🎵 [Murf] Starting Murf WebSocket streaming for session: {session_id}")
+        logger.info(f"🎵 [Murf] Starting Murf WebSocket streaming for session: {session_id}", extra=log)
         
         # Use provided API key or fallback to environment variable
         murf_key = murf_api_key or MURF_API_KEY
         if not murf_key:
-            await websocket.send_text(json.dumps({
+            await websocket.send_message({
                 "type": "APIKeyError", 
                 "error": "Murf API key is required but not provided"
-            }))
+            })
             return
         
-        murf_ws_url = f"wss://api.murf.ai/v1/speech/stream-input?api-key={murf_key}&sample_rate=44100&channel_type=MONO&format=WAV"
-        context_id = f"context_{session_id}"
+        if isinstance(text_stream, str):
+            full_text = text_stream
+            async def single_segment():
+                yield full_text
+            text_stream = single_segment()
         
-        async with websockets.connect(murf_ws_url) as murf_ws:
-            print("✅ [Murf] Connected to Murf WebSocket successfully!")
-            
-            voice_config_msg = {
-                "voice_config": {
-                    "voiceId": "en-US-carter",
-                    "style": "Conversational",
-                    "multiNativeLocale": "hi-IN"
-                },
-                "context_id": context_id
-            }
-            await murf_ws.send(json.dumps(voice_config_msg))
+        # Every turn gets its own context id so turns can share a pooled connection
+        turn_id = next(murf_context_ids)
+        context_id = f"context_{session_id}_{turn_id}"
+        trace.turn_id = log["turn_id"] = turn_id
+        
+        # A fixed reply (StaticText) is replayed from the audio cache when present, else its audio is captured for it
+        cached = {"replay": None, "key": None}
+        
+        async with tts_router.context(lambda tts: tts.context(murf_key, context_id)) as (tts, murf_ctx):
+            trace.mark("murf_connected")
+            logger.info(f"✅ [Murf] {tts.name} context ready!", extra=log)
             
-            text_msg = { "text": text_stream, "context_id": context_id, "end": True }
-            await murf_ws.send(json.dumps(text_msg))
+            # Push each segment into the open context as soon as the LLM completes it,
+            # while the loop below is already receiving audio for earlier segments
+            async def send_segments():
+                segments_sent = 0
+                async for segment in text_stream:
+                    if segments_sent == 0 and audio_cache is not None and isinstance(segment, StaticText):
+                        key = audio_cache.make_key(segment, tts.voice_config, TTS_STREAM_FORMAT)
+                        replay = await audio_cache.aopen(key) if audio_cache.lookup(key, segment.kind) else None
+                        if replay is not None:
+                            cached["replay"] = replay
+                            murf_ctx.abort()
+                            return
+                        cached["key"] = key
+                    else:
+                        # Mixed with other text, the audio no longer belongs to the fixed phrase alone
+                        cached["key"] = None
+                    await murf_ctx.send_text(segment)
+                    segments_sent += 1
+                if segments_sent:
+                    await murf_ctx.end()
+                    logger.info(f"📤 [Murf] Sent {segments_sent} text segment(s) to Murf", extra=log)
+                else:
+                    # Nothing to synthesize (e.g. the LLM failed); release the receiver
+                    murf_ctx.abort()
+
+            sender = asyncio.create_task(send_segments())
             
-            print(f"🎧 [Murf] Receiving audio chunks from Murf...")
+            logger.debug("🎧 [Murf] Receiving audio chunks from Murf...", extra=log)
             
             audio_chunks_count = 0
-            while True:
-                try:
-                    response = await murf_ws.recv()
-                    data = json.loads(response)
-                    
-                    if "audio" in data:
-                        base64_audio = data["audio"]
-                        audio_chunks_count += 1
-                        await websocket.send_text(json.dumps({ "type": "MurfAudioChunk", "audio": base64_audio }))
-                    
-                    if data.get("final"):
-                        print(f"✅ [Murf] Murf WebSocket streaming complete! Total chunks: {audio_chunks_count}")
-                        await websocket.send_text(json.dumps({ "type": "MurfStreamComplete", "total_chunks": audio_chunks_count }))
-                        break
+            chunk_ms = []
+            captured = []
+            try:
+                while True:
+                    try:
+                        data = await murf_ctx.recv()
                         
-                except websockets.exceptions.ConnectionClosed:
-                    print("🔌 [Murf] Murf WebSocket connection closed")
-                    break
-                except Exception as e:
-                    print(f"❌ [Murf] Error receiving from Murf: {e}")
-                    break
+                        if "audio" in data:
+                            base64_audio = data["audio"]
+                            trace.mark("first_audio")
+                            elapsed_ms = round((time.perf_counter() - trace.started) * 1000, 1)
+                            if cached["key"]:
+                                captured.append(base64.b64decode(base64_audio))
+                            if audio_transport == "binary":
+                                await websocket.send_bytes(pack_audio_frame(turn_id, audio_chunks_count, base64.b64decode(base64_audio)), "MurfAudioChunk")
+                            else:
+                                await websocket.send_message({ "type": "MurfAudioChunk", "audio": base64_audio, "turn_id": turn_id, "seq": audio_chunks_count, "server_ms": elapsed_ms })
+                            chunk_ms.append(elapsed_ms)
+                            audio_chunks_count += 1
+                        
+                        if data.get("final"):
+                            trace.mark("last_audio")
+                            logger.info(f"✅ [Murf] Murf WebSocket streaming complete! Total chunks: {audio_chunks_count}", extra=log)
+                            if cached["key"] and captured:
+                                await audio_cache.aput(cached["key"], pack_chunks(captured))
+                            await websocket.send_message({
+                                "type": "MurfStreamComplete", "total_chunks": audio_chunks_count, "turn_id": turn_id,
+                                "first_audio_ms": chunk_ms[0] if chunk_ms else None, "chunk_ms": chunk_ms
+                            })
+                            break
+                            
+                    except MurfContextClosed:
+                        if cached["replay"] is None:
+                            logger.warning("🔌 [Murf] Murf context closed", extra=log)
+                        break
+                    except Exception as e:
+                        logger.error(f"❌ [Murf] Error receiving from Murf: {e}", extra=log)
+                        tts_router.record_failure(tts, e)
+                        break
+            finally:
+                if not sender.done():
+                    sender.cancel()
+                await asyncio.gather(sender, return_exceptions=True)
+        
+        if cached["replay"] is not None:
+            logger.info("💾 [TTS Cache] Replaying cached audio", extra=log)
+            await replay_cached_audio(cached["replay"], websocket, turn_id, audio_transport, trace)
             
     except Exception as e:
-        error_msg = f"❌ [Murf] Error in Murf WebSocket streaming: {e}"
-        print(error_msg)
-        await websocket.send_text(json.dumps({"type": "MurfStreamError", "error": str(e)}))
+        logger.error(f"❌ [Murf] Error in Murf WebSocket streaming: {e}", extra=log)
+        await websocket.send_message({"type": "MurfStreamError", "error": str(e)})
+
+# The replies that are known ahead of time: the fixed phrases and every built-in movie dialogue
+def static_replies() -> list:
+    replies = [StaticText(NO_SPEECH_REPLY, "no_speech"), StaticText(FALLBACK_ERROR_REPLY, "error_fallback"),
+               StaticText(MOVIE_NOT_FOUND["message"], "movie_dialogue")]
+    for movie in BOLLYWOOD_MOVIES_DB.values():
+        for dialogue in movie["dialogues"]:
+            replies.append(StaticText(movie_dialogue_reply(movie["title"], dialogue), "movie_dialogue"))
+    return replies
+
+# Synthesize the static replies that aren't on disk yet, in both formats (REST for /agent/chat, stream for /ws)
+async def prewarm_tts_cache(murf_key: str, concurrency: int = 2):
+    semaphore = asyncio.Semaphore(concurrency)
+    # Pre-warmed audio is in the preferred voice, which is what the cache keys are made for
+    tts = tts_router.primary
+    stored = 0
+
+    async def rest_audio(text):
+        response_murf = await tts.synthesize(text, murf_key, encode=True)
+        return base64.b64decode(response_murf.encoded_audio)
+
+    async def stream_audio(text):
+        chunks = []
+        async with tts.context(murf_key, f"prewarm_{next(murf_context_ids)}") as murf_ctx:
+            await murf_ctx.send_text(text)
+            await murf_ctx.end()
+            while True:
+                data = await murf_ctx.recv()
+                if "audio" in data:
+                    chunks.append(base64.b64decode(data["audio"]))
+                if data.get("final"):
+                    return pack_chunks(chunks)
+
+    async def prewarm(text, audio_format, synthesize):
+        nonlocal stored
+        key = audio_cache.make_key(text, tts.voice_config, audio_format)
+        if key in audio_cache:
+            return
+        async with semaphore:
+            try:
+                await audio_cache.aput(key, await synthesize(text))
+                stored += 1
+            except Exception as e:
+                logger.error(f"❌ [TTS Cache] Pre-warm failed for {text[:40]!r}: {e}")
+
+    started = time.perf_counter()
+    jobs = []
+    for text in static_replies():
+        jobs.append(prewarm(text, TTS_REST_FORMAT, rest_audio))
+        if text.kind == "movie_dialogue":
+            # The no-speech and error replies only ever come from /agent/chat
+            jobs.append(prewarm(text, TTS_STREAM_FORMAT, stream_audio))
+    await asyncio.gather(*jobs)
+    logger.info(f"💾 [TTS Cache] Pre-warmed {stored} phrase(s) in {time.perf_counter() - started:.1f} s, {len(audio_cache.entries)} cached")
+
+# Where a chat (Gemini) reply comes from: the response cache, or a new Gemini stream on the session's history
+async def open_chat_reply(user_query: str, session_id: str, gemini_key: str, history: list, log: dict):
+    """(use_cache, cached_reply, response_stream) for a turn that isn't handled by a skill; use_cache means a
+    new reply may be stored, which is only when it comes from the primary LLM"""
+    # Only context-free turns share answers: a follow-up means something different in every conversation
+    use_cache = response_cache is not None and not history
+    cached_reply = response_cache.lookup(user_query) if use_cache else None
+    if cached_reply is not None:
+        logger.info(f"♻️ [Response Cache] Replaying cached reply for: {user_query}", extra=log)
+        return use_cache, cached_reply, replay_reply(cached_reply)
+    if not history:
+        logger.info(f"✨ [Gemini] Creating new chat session for {session_id}", extra=log)
+    llm, response_stream = await llm_router.stream(
+        lambda llm: llm.stream(user_query, history, system_prompt, gemini_key), hedge=should_hedge(user_query))
+    # Same as answer_query: a fallback's reply is served this once but not cached
+    return use_cache and llm is llm_router.primary, None, response_stream
+
+# A reply started on AssemblyAI's unformatted transcript (SPECULATIVE_REPLY): routed at once, with the
+# Gemini stream (buffered until the turn is committed) or the movie lookup already running
+class PreparedReply:
+    def __init__(self, transcript: str, session_id: str, gemini_key: str, tmdb_key: str):
+        self.transcript = transcript
+        self.route = intent_router.route(transcript)
+        self.history = None
+        self.reply = None
+        self.opened = asyncio.Event()
+        self.chunks = asyncio.Queue()
+        self.task = None
+        # A prefetched chat reply can still be found stale when the turn gets to it (chat_reply commits it)
+        self.deferred_commit = False
+        self.commit = None
+        log = {"session_id": session_id}
+        logger.debug(f"🔮 [Speculation] Starting {self.route.intent} reply on: {transcript}", extra=log)
+        if self.route.intent == "movie_dialogue":
+            # The dialogue cache is single-flight, so the committed turn joins this lookup
+            self.task = asyncio.create_task(get_movie_dialogue(self.route.slots["movie_name"], gemini_key, tmdb_key))
+        elif self.route.intent == intent_router.fallback and gemini_key:
+            self.task = asyncio.create_task(self._prefetch(session_id, gemini_key, log))
+            self.deferred_commit = True
+
+    async def _prefetch(self, session_id: str, gemini_key: str, log: dict):
+        try:
+            self.history = await session_store.get_history(session_id)
+            use_cache, cached_reply, response_stream = await open_chat_reply(self.transcript, session_id, gemini_key, self.history, log)
+            self.reply = (use_cache, cached_reply, self._buffered())
+            self.opened.set()
+            async for chunk in response_stream:
+                self.chunks.put_nowait(chunk)
+        except Exception as e:
+            self.chunks.put_nowait(e)
+        finally:
+            self.opened.set()
+            self.chunks.put_nowait(None)
+
+    async def _buffered(self):
+        while True:
+            chunk = await self.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def chat_reply(self, history: list):
+        """The prefetched (use_cache, cached_reply, response_stream), or None if the turn has to start over"""
+        if self.task is None:
+            return None
+        await self.opened.wait()
+        if self.reply is None or self.history != history:
+            # The previous reply finished (and was added to the history) after this one was started
+            speculation_stats.stale += 1
+            self.cancel()
+            return None
+        if self.commit is not None:
+            self.commit()
+        return self.reply
+
+    def cancel(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+# A speculative reply only stands if the formatted transcript routes to the same skill with the same slots
+def same_route(prepared: PreparedReply, final_transcript: str) -> bool:
+    def key(route):
+        return route.intent, {name: normalize_text(str(value)) for name, value in route.slots.items()}
+    return key(intent_router.route(final_transcript)) == key(prepared.route)
 
 # Enhanced LLM streaming with API key handling
-async def stream_llm_response(user_query: str, session_id: str, websocket: WebSocket, gemini_api_key: str, tmdb_api_key: str):
+async def stream_llm_response(user_query: str, session_id: str, websocket: ClientWriter, gemini_api_key: str, tmdb_api_key: str, segment_queue: asyncio.Queue = None, trace: TurnTrace = None, prepared: "PreparedReply" = None):
+    """Stream the reply to the client; if segment_queue is given, also feed it TTS segments as they complete"""
+    segmenter = SentenceSegmenter()
+    trace = trace or TurnTrace(session_id)
+    log = {"session_id": session_id}
+
+    async def push_segments(segments):
+        if segment_queue is not None:
+            for segment in segments:
+                await segment_queue.put(segment)
+
+    async def push_static(text: StaticText):
+        # With the audio cache on, a fixed reply goes to Murf whole, so its audio can be cached and replayed as one
+        await push_segments([text] if audio_cache is not None else segmenter.feed(text))
+
     try:
-        print(f"🤖 [Gemini] Starting streaming LLM response for: {user_query}")
+        logger.info(f"🤖 [Gemini] Starting streaming LLM response for: {user_query}", extra=log)
 
         # Use provided API key or fallback to environment variable
         gemini_key = gemini_api_key or GEMINI_API_KEY
         if not gemini_key:
-            await websocket.send_text(json.dumps({
+            await websocket.send_message({
                 "type": "APIKeyError", 
                 "error": "Gemini API key is required but not provided"
-            }))
+            })
             return None
 
+        route = intent_router.route(user_query)
+        trace.mark("intent_routed")
+        logger.info(f"🧭 [Router] Intent: {route.intent} (confidence {route.confidence})", extra={**log, "intent": route.intent})
+        
         # Check if user is asking for calculation first
-        if is_calculation_query(user_query):
-            print(f"🧮 [Calculation Skill] Calculation request detected: {user_query}")
+        if route.intent == "calculation":
+            logger.info(f"🧮 [Calculation Skill] Calculation request detected: {user_query}", extra=log)
             
-            await websocket.send_text(json.dumps({
+            await websocket.send_message({
                 "type": "CalculationSkillActivated",
                 "query": user_query
-            }))
+            })
             
             calculation_result = perform_calculation(user_query)
-            
-            if calculation_result["success"]:
-                current_llm_response = calculation_result["response"]
-            else:
-                current_llm_response = calculation_result["response"]
+            current_llm_response = StaticText(calculation_result["response"], "calculation")
             
             # Send the complete calculation response at once
-            await websocket.send_text(json.dumps({
+            trace.mark("llm_first_token")
+            await websocket.send_message({
                 "type": "LLMStreamChunk",
                 "text": current_llm_response
-            }))
+            })
+            await push_static(current_llm_response)
             
-            await websocket.send_text(json.dumps({
+            trace.mark("llm_complete")
+            await websocket.send_message({
                 "type": "LLMStreamComplete", 
                 "complete_response": current_llm_response
-            }))
+            })
             
             return current_llm_response
 
         # Check if user is asking for movie dialogue
-        is_movie_query, movie_name = is_movie_dialogue_query(user_query)
-        
-        if is_movie_query and movie_name:
-            print(f"🎬 [Movie Skill] Movie dialogue request detected: {movie_name}")
+        if route.intent == "movie_dialogue":
+            movie_name = route.slots["movie_name"]
+            logger.info(f"🎬 [Movie Skill] Movie dialogue request detected: {movie_name}", extra=log)
             
-            await websocket.send_text(json.dumps({
+            await websocket.send_message({
                 "type": "MovieSkillActivated",
                 "movie_name": movie_name
-            }))
+            })
             
             dialogue_result = await get_movie_dialogue(movie_name, gemini_key, tmdb_api_key)
             
             if dialogue_result["found"]:
-                current_llm_response = f"Arre boss! '{dialogue_result['movie']}' picture ka dialogue? Ekdum jhakas! \n\n🎭 \"{dialogue_result['dialogue']}\" 🎭\n\nBole toh, yeh dialogue hai dum ke saath! Kya bolti public? 😎"
+                current_llm_response = StaticText(movie_dialogue_reply(dialogue_result['movie'], dialogue_result['dialogue']), "movie_dialogue")
             else:
-                current_llm_response = dialogue_result["message"]
+                current_llm_response = StaticText(dialogue_result["message"], "movie_dialogue")
             
             # Send the complete movie response at once
-            await websocket.send_text(json.dumps({
+            trace.mark("llm_first_token")
+            await websocket.send_message({
                 "type": "LLMStreamChunk",
                 "text": current_llm_response
-            }))
+            })
+            await push_static(current_llm_response)
             
-            await websocket.send_text(json.dumps({
+            trace.mark("llm_complete")
+            await websocket.send_message({
                 "type": "LLMStreamComplete", 
                 "complete_response": current_llm_response
-            }))
+            })
             
             return current_llm_response
 
-        # Regular Gemini streaming for other queries
-        if session_id not in chat_histories:
-            print(f"✨ [Gemini] Creating new chat session for {session_id}")
-            genai.configure(api_key=gemini_key)
-            model = genai.GenerativeModel(
-                'gemini-1.5-flash',
-                system_instruction=system_prompt
-            )
-            chat_histories[session_id] = model.start_chat(history=[])
-        
-        chat_session = chat_histories[session_id]
-        response_stream = await chat_session.send_message_async(user_query, stream=True)
+        # Regular Gemini streaming for other queries; the chat is rebuilt from the stored
+        # (windowed) history every turn, so any worker can serve any session
+        history = await session_store.get_history(session_id)
+        reply = await prepared.chat_reply(history) if prepared is not None else None
+        if reply is not None:
+            logger.info(f"🔮 [Speculation] Using the reply started on: {prepared.transcript}", extra=log)
+        else:
+            reply = await open_chat_reply(user_query, session_id, gemini_key, history, log)
+        use_cache, cached_reply, response_stream = reply
         
         current_llm_response = ""
         
-        print(f"🔥 [Gemini] LLM Streaming Response:")
-        
         async for chunk in response_stream:
             if chunk.text:
+                trace.mark("llm_first_token")
                 current_llm_response += chunk.text
-                print(chunk.text, end="", flush=True)
+                logger.debug(f"🔥 [Gemini] {chunk.text}", extra=log)
                 
-                await websocket.send_text(json.dumps({
+                await websocket.send_message({
                     "type": "LLMStreamChunk",
                     "text": chunk.text
-                }))
+                })
+                await push_segments(segmenter.feed(chunk.text))
         
-        print(f"\n✅ [Gemini] Complete LLM Response: {current_llm_response}")
+        trace.mark("llm_complete")
+        logger.info(f"✅ [Gemini] Complete LLM Response: {current_llm_response}", extra=log)
+        await session_store.append(session_id, user_query, current_llm_response)
+        if use_cache and cached_reply is None:
+            response_cache.store(user_query, current_llm_response)
         
-        await websocket.send_text(json.dumps({
+        await websocket.send_message({
             "type": "LLMStreamComplete",
             "complete_response": current_llm_response
-        }))
+        })
         
         return current_llm_response
         
     except Exception as e:
-        error_msg = f"❌ [Gemini] Error in streaming LLM response: {e}"
-        print(error_msg)
-        await websocket.send_text(json.dumps({"type": "LLMStreamError", "error": str(e)}))
+        logger.error(f"❌ [Gemini] Error in streaming LLM response: {e}", extra=log)
+        await websocket.send_message({"type": "LLMStreamError", "error": str(e)})
         return None
+    finally:
+        if prepared is not None:
+            prepared.cancel()
+        if segment_queue is not None:
+            for segment in segmenter.flush():
+                await segment_queue.put(segment)
+            await segment_queue.put(None)
+
+# Stop the reply in progress (if any) and tell the client to drop the audio it has queued
+async def cancel_reply(scheduler: TurnScheduler, websocket: ClientWriter, reason: str):
+    cancel_ms = await scheduler.interrupt()
+    if cancel_ms is None:
+        return
+    # The cancelled reply's text and audio that the client hasn't been sent yet never will be
+    websocket.discard(REPLY_MESSAGE_TYPES)
+    logger.info(f"✋ [Barge-in] Cancelled reply for {scheduler.session_id} ({reason}) in {cancel_ms:.1f} ms",
+                extra={"session_id": scheduler.session_id, "reason": reason, "cancel_ms": round(cancel_ms, 1)})
+    await websocket.send_message({ "type": "TurnCancelled", "reason": reason, "cancel_ms": round(cancel_ms, 1) })
+
+# Text messages sent by the browser over /ws
+async def handle_client_message(text: str, session_id: str, websocket: ClientWriter = None, scheduler: TurnScheduler = None):
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        logger.warning(f"⚠️ Ignoring non-JSON client message from {session_id}", extra={"session_id": session_id})
+        return
+    if data.get("type") == "PlaybackMetrics":
+        record_playback_metrics(session_id, data)
+    elif data.get("type") == "Interrupt" and scheduler is not None:
+        await cancel_reply(scheduler, websocket, "client")
+    elif data.get("type") == "CaptureMetrics":
+        try:
+            ingest_stats.record_client(data)
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"⚠️ [Audio Ingest] Ignoring malformed capture metrics from {session_id}: {data}",
+                           extra={"session_id": session_id})
+    else:
+        logger.info(f"🔍 Unhandled client message type: {data.get('type')}", extra={"session_id": session_id})
+
+# Local speech start/end from the VAD gate, ahead of AssemblyAI's Turn messages
+async def handle_vad_event(event: str, stream_ms: int, session_id: str, websocket: ClientWriter, aai_ws):
+    if event == "speech_start":
+        logger.info(f"🗣️ [VAD] Speech started at {stream_ms} ms ({session_id})", extra={"session_id": session_id})
+        await websocket.send_message({ "type": "SpeechStarted", "stream_ms": stream_ms })
+    else:
+        logger.info(f"🤫 [VAD] Speech ended at {stream_ms} ms ({session_id})", extra={"session_id": session_id})
+        await websocket.send_message({ "type": "SpeechEnded", "stream_ms": stream_ms })
+        if VAD_FORCE_ENDPOINT:
+            # Any hangover audio still in the coalescer is silence, so it may trail the endpoint
+            vad_stats.forced_endpoints += 1
+            await aai_ws.send(json.dumps({ "type": "ForceEndpoint" }))
+
+# Run the LLM -> TTS pipeline for one finished user turn
+async def respond_to_turn(transcript: str, session_id: str, websocket: ClientWriter, gemini_key: str, murf_key: str, tmdb_key: str, audio_transport: str = "json", prepared: PreparedReply = None):
+    trace = turn_telemetry.start(session_id)
+    outcome = "failed"
+    try:
+        if INCREMENTAL_TTS:
+            # Murf connects while Gemini starts generating, and each completed sentence is
+            # synthesized while the rest of the reply is still streaming in
+            segment_queue = asyncio.Queue()
+            await asyncio.gather(
+                stream_llm_response(transcript, session_id, websocket, gemini_key, tmdb_key, segment_queue=segment_queue, trace=trace, prepared=prepared),
+                stream_to_murf_websocket(iter_segments(segment_queue), session_id, websocket, murf_key, audio_transport, trace)
+            )
+        else:
+            llm_response = await stream_llm_response(transcript, session_id, websocket, gemini_key, tmdb_key, trace=trace, prepared=prepared)
+            if llm_response:
+                await stream_to_murf_websocket(llm_response, session_id, websocket, murf_key, audio_transport, trace)
+        if "last_audio" in trace.marks:
+            outcome = "completed"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        turn_telemetry.finish(trace, outcome)
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    print("🔴 WebSocket client connected for full pipeline.")
-    
-    session_id = f"ws_{id(websocket)}"
+    # Random, so a reused object address or another worker sharing the session store can never pick up this history
+    session_id = f"ws_{uuid.uuid4().hex}"
+    log = {"session_id": session_id}
+    logger.info("🔴 WebSocket client connected for full pipeline.", extra=log)
+    client = ClientWriter(websocket, session_id, max_queue=WS_SEND_QUEUE, coalesce_ms=WS_COALESCE_MS,
+                          stall_timeout=WS_STALL_TIMEOUT, stats=writer_stats).start()
     
     # Fix: Convert query_params to string before parsing
     query_string = str(websocket.query_params)
@@ -566,50 +1520,98 @@ async def websocket_endpoint(websocket: WebSocket):
     gemini_key = gemini_key or GEMINI_API_KEY
     tmdb_key = tmdb_key or TMDB_API_KEY
     
+    # Audio transport: binary frames if the client asks for them and the server allows it
+    requested_transport = query_params.get('audio_transport', ['json'])[0]
+    audio_transport = "binary" if requested_transport == "binary" and BINARY_AUDIO_ENABLED else "json"
+    await client.send_message({
+        "type": "SessionConfig",
+        "audio_transport": audio_transport,
+        "audio_frame_header_bytes": AUDIO_FRAME_HEADER.size
+    })
+    
     # Validate required API keys
     if not assemblyai_key:
-        await websocket.send_text(json.dumps({
+        await client.send_message({
             "type": "APIKeyError", 
             "error": "AssemblyAI API key is required but not provided"
-        }))
+        })
+        await client.close()
         await websocket.close()
         return
     
     if not murf_key:
-        await websocket.send_text(json.dumps({
+        await client.send_message({
             "type": "APIKeyError", 
             "error": "Murf API key is required but not provided"
-        }))
+        })
+        await client.close()
         await websocket.close()
         return
     
     if not gemini_key:
-        await websocket.send_text(json.dumps({
+        await client.send_message({
             "type": "APIKeyError", 
             "error": "Gemini API key is required but not provided"
-        }))
+        })
+        await client.close()
         await websocket.close()
         return
     
+    # Warm up a Murf connection while the user is still speaking their first turn
+    if MURF_POOL_ENABLED:
+        start_background(tts_router.primary.prewarm(murf_key), f"{tts_router.primary.name} pre-warm for {session_id}")
+    
+    scheduler = TurnScheduler(session_id, cancel_timeout=BARGE_IN_CANCEL_TIMEOUT, stats=turn_stats)
+    speculator = Speculator(
+        lambda text: PreparedReply(text, session_id, gemini_key, tmdb_key), min_similarity=SPECULATIVE_MIN_SIMILARITY,
+        stable_partials=SPECULATIVE_STABLE_PARTIALS, accept=same_route, stats=speculation_stats
+    ) if SPECULATIVE_REPLY else None
+    
     try:
-        print("🔗 [AssemblyAI] Connecting to AssemblyAI Universal Streaming service...")
+        logger.info("🔗 [AssemblyAI] Connecting to AssemblyAI Universal Streaming service...", extra=log)
         
         CONNECTION_PARAMS = { "sample_rate": 16000, "format_turns": True }
-        url = f"wss://streaming.assemblyai.com/v3/ws?{urlencode(CONNECTION_PARAMS)}"
-        headers = { "Authorization": assemblyai_key }
         
-        async with websockets.connect(url, additional_headers=headers) as aai_ws:
-            print("✅ [AssemblyAI] Successfully connected to AssemblyAI Universal Streaming!")
+        async with asr_router.context(lambda asr: asr.connect(assemblyai_key, CONNECTION_PARAMS)) as (asr, aai_ws):
+            logger.info("✅ [AssemblyAI] Successfully connected to AssemblyAI Universal Streaming!", extra=log)
             
             async def forward_audio():
+                coalescer = PcmCoalescer(
+                    aai_ws.send, sample_rate=CONNECTION_PARAMS["sample_rate"], min_ms=INGEST_MIN_MS,
+                    max_ms=INGEST_MAX_MS, max_buffered_ms=INGEST_MAX_BUFFERED_MS, stats=ingest_stats
+                ).start()
+                gate = VoiceActivityGate(
+                    sample_rate=CONNECTION_PARAMS["sample_rate"], snr_db=VAD_SNR_DB, min_rms=VAD_MIN_RMS,
+                    hangover_ms=VAD_HANGOVER_MS, preroll_ms=VAD_PREROLL_MS, stats=vad_stats
+                ) if VAD_ENABLED else None
                 try:
                     while True:
-                        audio_data = await websocket.receive_bytes()
-                        await aai_ws.send(audio_data)
+                        # Binary frames are microphone audio; text frames are client control/metrics messages
+                        message = await websocket.receive()
+                        if message["type"] == "websocket.disconnect":
+                            raise WebSocketDisconnect(message.get("code", 1000))
+                        if message.get("bytes") is not None:
+                            if gate is None:
+                                await coalescer.push(message["bytes"])
+                                continue
+                            audio, events = gate.process(message["bytes"])
+                            if audio:
+                                await coalescer.push(audio)
+                            for event, stream_ms in events:
+                                await handle_vad_event(event, stream_ms, session_id, client, aai_ws)
+                        elif message.get("text"):
+                            await handle_client_message(message["text"], session_id, client, scheduler)
                 except WebSocketDisconnect:
-                    print(f"🔌 Client disconnected from WebSocket (session: {session_id})")
+                    logger.info(f"🔌 Client disconnected from WebSocket (session: {session_id})", extra=log)
                 except Exception as e:
-                    print(f"❌ [Audio Forwarder] Error forwarding audio: {e}")
+                    logger.error(f"❌ [Audio Forwarder] Error forwarding audio: {e}", extra=log)
+                finally:
+                    await coalescer.close()
+                    # Without this the AssemblyAI stream (and this handler) outlive the client until AssemblyAI times out
+                    try:
+                        await aai_ws.send(json.dumps({ "type": "Terminate" }))
+                    except websockets.exceptions.ConnectionClosed:
+                        pass
 
             async def handle_responses():
                 try:
@@ -619,21 +1621,27 @@ async def websocket_endpoint(websocket: WebSocket):
                         
                         if msg_type == "Turn" and data.get('turn_is_formatted') is True:
                             transcript = data.get('transcript', '')
+                            # A reply started on the unformatted transcript is kept only if this one still matches it
+                            prepared = speculator.take(transcript) if speculator is not None else None
                             if transcript:
-                                print(f"✅ [AssemblyAI] End of Turn: {transcript}")
-                                await websocket.send_text(json.dumps({ "text": transcript, "type": "EndOfTurnTranscript" }))
+                                logger.info(f"✅ [AssemblyAI] End of Turn: {transcript}", extra=log)
+                                # The user spoke over the previous reply: drop it before starting the new one
+                                await cancel_reply(scheduler, client, "new_turn")
+                                await client.send_message({ "text": transcript, "type": "EndOfTurnTranscript" })
                                 
                                 if transcript.strip():
-                                    llm_response = await stream_llm_response(transcript, session_id, websocket, gemini_key, tmdb_key)
-                                    if llm_response:
-                                        await stream_to_murf_websocket(llm_response, session_id, websocket, murf_key)
+                                    # Runs in the background so Turn messages keep flowing while we reply
+                                    await scheduler.start(respond_to_turn, transcript, session_id, client, gemini_key, murf_key, tmdb_key, audio_transport, prepared)
                                         
+                        elif msg_type == "Turn" and speculator is not None:
+                            speculator.observe(data)
+                        
                         elif msg_type == "Termination":
-                            print(f"🔚 [AssemblyAI] Session Terminated by AssemblyAI.")
+                            logger.info("🔚 [AssemblyAI] Session Terminated by AssemblyAI.", extra=log)
                             break
                             
                 except Exception as e:
-                    print(f"❌ [AssemblyAI] Error handling AssemblyAI responses: {e}")
+                    logger.error(f"❌ [AssemblyAI] Error handling AssemblyAI responses: {e}", extra=log)
 
             await asyncio.gather(
                 forward_audio(),
@@ -641,16 +1649,108 @@ async def websocket_endpoint(websocket: WebSocket):
             )
             
     except Exception as e:
-        print(f"💥 Error in WebSocket handler: {e}")
+        logger.error(f"💥 Error in WebSocket handler: {e}", extra=log)
         if not websocket.client_state == WebSocketDisconnect:
             await websocket.close()
             
     finally:
-        if session_id in chat_histories:
-            del chat_histories[session_id]
-        print(f"🔚 WebSocket session for {session_id} ended.")
+        await scheduler.close()
+        if speculator is not None:
+            speculator.close()
+        await client.close()
+        await session_store.delete(session_id)
+        logger.info(f"🔚 WebSocket session for {session_id} ended.", extra=log)
+
 
 
+# Runtime stats for shared upstream resources
+@app.get("/stats")
+async def runtime_stats():
+    return {
+        "murf_pool": murf_pool.stats(),
+        "sdk_pool": sdk_pool.stats(),
+        "batch": {**batch_runner.stats(), "pool": batch_pool.stats()},
+        "sessions": await session_store.stats(),
+        "playback": playback_stats(),
+        "audio_ingest": ingest_stats.stats(),
+        "vad": vad_stats.stats(),
+        "turns": turn_stats.stats(),
+        "client_writer": writer_stats.stats(),
+        "speculation": speculation_stats.stats() if SPECULATIVE_REPLY else None,
+        "dialogue_cache": dialogue_cache.stats(),
+        "movie_index": movie_index.stats(),
+        "gemini_models": gemini_models.stats(),
+        "sdk_modules": sdk_loader.stats(),
+        "providers": {"asr": asr_router.stats(), "llm": llm_router.stats(), "tts": tts_router.stats()},
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "tts_cache": audio_cache.stats() if audio_cache is not None else None
+    }
+
+# Murf pool connect latency (kept in ms buckets by the pool) in Prometheus histogram form
+def murf_connect_metrics() -> list:
+    latency = murf_pool.stats()["connect_latency_ms"]
+    name = "murf_connect_seconds"
+    lines = [f"# HELP {name} Murf WebSocket connect latency", f"# TYPE {name} histogram"]
+    for bound, count in latency["buckets"].items():
+        le = bound if bound == "+Inf" else float(bound) / 1000
+        lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+    lines.append(f"{name}_sum {latency['sum'] / 1000}")
+    lines.append(f"{name}_count {latency['count']}")
+    return lines
+
+# TTS audio cache lookups by reply kind and result, plus its size on disk
+def tts_cache_metrics() -> list:
+    if audio_cache is None:
+        return []
+    stats = audio_cache.stats()
+    name = "tts_cache_lookups_total"
+    lines = [f"# HELP {name} TTS audio cache lookups", f"# TYPE {name} counter"]
+    for kind, counts in sorted(stats["by_kind"].items()):
+        lines.append(f'{name}{{kind="{kind}",result="hit"}} {counts["hits"]}')
+        lines.append(f'{name}{{kind="{kind}",result="miss"}} {counts["misses"]}')
+    lines += ["# HELP tts_cache_bytes TTS audio cache size on disk", "# TYPE tts_cache_bytes gauge",
+              f"tts_cache_bytes {stats['bytes']}"]
+    return lines
+
+# Outbound /ws queue depth and what happened to the messages handed to the per-connection writers
+def client_writer_metrics() -> list:
+    stats = writer_stats.stats()
+    name = "ws_outbound_messages_total"
+    lines = ["# HELP ws_send_queue_depth Messages waiting in /ws writer queues", "# TYPE ws_send_queue_depth gauge",
+             f"ws_send_queue_depth {stats['queue_depth']}",
+             f"# HELP {name} Outbound /ws messages by outcome", f"# TYPE {name} counter"]
+    for result in ("frames", "coalesced", "dropped", "discarded"):
+        lines.append(f'{name}{{result="{result}"}} {stats[result]}')
+    lines += ["# HELP ws_slow_clients_total /ws clients disconnected for not reading", "# TYPE ws_slow_clients_total counter",
+              f"ws_slow_clients_total {stats['slow_clients']}"]
+    return lines
+
+# Per-provider calls, hedges and circuit breaker state for each pipeline stage
+def provider_metrics() -> list:
+    families = {
+        "provider_calls_total": ("counter", "Provider calls by outcome", []),
+        "provider_hedges_total": ("counter", "Hedged calls started on a provider and how many it won", []),
+        "provider_circuit_open": ("gauge", "1 while the provider's circuit breaker keeps calls away", []),
+    }
+    for router in (asr_router, llm_router, tts_router):
+        for provider, stats in router.stats()["providers"].items():
+            labels = f'stage="{router.stage}",provider="{provider}"'
+            families["provider_calls_total"][2].extend([f'{{{labels},result="served"}} {stats["served"]}',
+                                                        f'{{{labels},result="failed"}} {stats["failures"]}'])
+            families["provider_hedges_total"][2].extend([f'{{{labels},result="started"}} {stats["hedges"]}',
+                                                         f'{{{labels},result="won"}} {stats["hedge_wins"]}'])
+            families["provider_circuit_open"][2].append(f'{{{labels}}} {int(stats["state"] == "open")}')
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + [name + sample for sample in samples]
+    return lines
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def prometheus_metrics():
+    lines = (turn_telemetry.render() + murf_connect_metrics() + tts_cache_metrics() + client_writer_metrics()
+             + provider_metrics())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
 
 # Test endpoint for movie dialogue skill
 @app.get("/test/movie/{movie_name}")
@@ -659,6 +1759,12 @@ async def test_movie_dialogue(movie_name: str):
     result = await get_movie_dialogue(movie_name, GEMINI_API_KEY, TMDB_API_KEY)
     return result
 
+# Test endpoint for intent routing
+@app.get("/test/intent/{text}")
+async def test_intent(text: str):
+    """Test endpoint to check which skill a transcript is routed to"""
+    return intent_router.route(text)._asdict()
+
 # Test endpoint for calculation skill
 @app.get("/test/calc/{expression}")
 async def test_calculation(expression: str):
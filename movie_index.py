@@ -0,0 +1,234 @@
+import asyncio
+import csv
+import difflib
+import json
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from ttl_cache import approx_size
+
+logger = logging.getLogger("voice_agent.movie_index")
+
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Spelling folds for romanized Hindi, so ASR variants land on the same key
+# ("sholey" -> "sholay", "dabang" -> "dabangg", "kabi" -> "kabhi")
+PHONETIC_RULES = [
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"([bdgjkpt])h"), r"\1"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"z"), "j"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"ee|ea"), "i"),
+    (re.compile(r"oo|ou"), "u"),
+    (re.compile(r"(ey|ai|ei)$"), "ay"),
+    (re.compile(r"(.)\1+"), r"\1"),
+]
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+@lru_cache(maxsize=65536)
+def fold_word(word: str) -> str:
+    for pattern, replacement in PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+def phonetic_key(text: str) -> str:
+    return " ".join(fold_word(word) for word in WORD_RE.findall(text.lower()))
+
+
+def trigrams(text: str) -> set:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MovieIndex:
+    """Title lookup over a movie corpus without scanning every entry.
+
+    Exact lookups hash every contiguous word n-gram of the query (up to the
+    longest indexed title) against normalized and phonetic title/alias keys.
+    If nothing matches, a character-trigram index over the phonetic keys
+    proposes candidates that are re-ranked with difflib, which catches ASR
+    misspellings like "sholey" or "dabang".
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.82, max_candidates: int = 20, posting_budget: int = 1500):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_candidates = max_candidates
+        self.posting_budget = posting_budget
+        self.movies = []
+        self.exact = {}
+        self.phonetic = {}
+        self.fuzzy_keys = []
+        self.postings = {}
+        self.max_words = 1
+        self.max_key_chars = 0
+        self.memory_bytes = 0
+        self.build_seconds = 0.0
+
+    def __len__(self):
+        return len(self.movies)
+
+    def add(self, title: str, dialogues: list, aliases=()):
+        movie_id = len(self.movies)
+        self.movies.append({"title": title, "dialogues": list(dialogues)})
+        for name in (title, *aliases):
+            key = normalize(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, movie_id)
+            sound = phonetic_key(key)
+            self.phonetic.setdefault(sound, movie_id)
+            self.max_words = max(self.max_words, key.count(" ") + 1)
+            self.max_key_chars = max(self.max_key_chars, len(sound))
+            key_id = len(self.fuzzy_keys)
+            self.fuzzy_keys.append((sound, movie_id))
+            for gram in trigrams(sound):
+                self.postings.setdefault(gram, array("I")).append(key_id)
+
+    def _spans(self, words: list):
+        # Longest spans first, so "munna bhai mbbs" beats "munna bhai"
+        for size in range(min(self.max_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                yield " ".join(words[start:start + size])
+
+    def lookup(self, query: str):
+        words = normalize(query).split()
+        if not words:
+            return None
+        for span in self._spans(words):
+            movie_id = self.exact.get(span)
+            if movie_id is None:
+                movie_id = self.phonetic.get(phonetic_key(span))
+            if movie_id is not None:
+                return self.movies[movie_id]
+        return self._fuzzy(words)
+
+    def _fuzzy(self, words: list):
+        best_score, best_id = 0.0, None
+        seen = set()
+        for span in self._spans(words[:8]):
+            sound = phonetic_key(span)
+            # A span much longer than any title can't reach the similarity threshold
+            if len(sound) < 4 or len(sound) > self.max_key_chars * 1.25 or sound in seen:
+                continue
+            seen.add(sound)
+            # Count candidates from the rarest trigrams only: they are the selective ones,
+            # and common trigrams would make every lookup touch a large part of the corpus
+            grams = sorted((self.postings.get(gram, ()) for gram in trigrams(sound)), key=len)
+            counts = Counter()
+            budget = self.posting_budget
+            for ids in grams:
+                if len(ids) > budget:
+                    break
+                counts.update(ids)
+                budget -= len(ids)
+            matcher = difflib.SequenceMatcher(None, b=sound)
+            for key_id, _ in counts.most_common(self.max_candidates):
+                candidate, movie_id = self.fuzzy_keys[key_id]
+                matcher.set_seq1(candidate)
+                # Cheap upper bounds first; only candidates that could still win get the full ratio
+                floor = max(best_score, self.fuzzy_threshold)
+                if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                    continue
+                score = matcher.ratio()
+                if score > best_score:
+                    best_score, best_id = score, movie_id
+        if best_score >= self.fuzzy_threshold:
+            return self.movies[best_id]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "movies": len(self.movies),
+            "keys": len(self.fuzzy_keys),
+            "trigrams": len(self.postings),
+            "memory_bytes": self.memory_bytes,
+            "build_seconds": self.build_seconds,
+        }
+
+
+def load_movie_file(path: str):
+    """Yield (title, dialogues, aliases) from a JSON or CSV corpus file.
+
+    JSON may be a list of {"title", "dialogues", "aliases"} objects or a
+    mapping shaped like BOLLYWOOD_MOVIES_DB. CSV needs a ``title`` column,
+    plus ``dialogue`` (one row per dialogue, or several separated by "|")
+    and optionally ``aliases`` ("|"-separated).
+    """
+    if path.lower().endswith(".csv"):
+        merged = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                title = (row.get("title") or "").strip()
+                if not title:
+                    continue
+                entry = merged.setdefault(title, ([], set()))
+                entry[0].extend(d.strip() for d in (row.get("dialogue") or "").split("|") if d.strip())
+                entry[1].update(a.strip() for a in (row.get("aliases") or "").split("|") if a.strip())
+        for title, (dialogues, aliases) in merged.items():
+            yield title, dialogues, sorted(aliases)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [dict(movie, aliases=[key, *movie.get("aliases", [])]) for key, movie in data.items()]
+    for movie in data:
+        yield movie["title"], movie.get("dialogues", []), movie.get("aliases", [])
+
+
+def build_movie_index(builtin: dict, path: str = None, **kwargs) -> MovieIndex:
+    """Index the built-in movies plus an optional corpus file, measuring build time and memory"""
+    started = time.perf_counter()
+
+    index = MovieIndex(**kwargs)
+    for key, movie in builtin.items():
+        index.add(movie["title"], movie["dialogues"], aliases=[key])
+    if path:
+        for title, dialogues, aliases in load_movie_file(path):
+            if dialogues:
+                index.add(title, dialogues, aliases)
+
+    index.build_seconds = time.perf_counter() - started
+    index.memory_bytes = approx_size([index.movies, index.exact, index.phonetic, index.fuzzy_keys, index.postings])
+    return index
+
+
+class LazyMovieIndex:
+    """Builds the index once, on first use or from a background thread at startup"""
+
+    def __init__(self, builtin: dict, path: str = None):
+        self.builtin = builtin
+        self.path = path
+        self.index = None
+        self.lock = threading.Lock()
+
+    def get(self) -> MovieIndex:
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = build_movie_index(self.builtin, self.path)
+                    logger.info(f"🎬 [Movie Index] Indexed {len(self.index)} movies in "
+                                f"{self.index.build_seconds * 1000:.0f} ms (~{self.index.memory_bytes / 1e6:.1f} MB)")
+        return self.index
+
+    async def aget(self) -> MovieIndex:
+        """get() for the event loop: while the index is still being built, wait for it in a worker thread"""
+        if self.index is not None:
+            return self.index
+        # A large MOVIES_DB_PATH takes a while, and blocking on the build lock here would stall every session
+        return await asyncio.to_thread(self.get)
+
+    def stats(self) -> dict:
+        return self.index.stats() if self.index is not None else {"loaded": False}
@@ -0,0 +1,318 @@
+import asyncio
+import bisect
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import websockets
+from websockets.protocol import State
+
+logger = logging.getLogger("voice_agent.murf_pool")
+
+
+# Connect latency histogram bucket bounds in milliseconds (last bucket is +Inf)
+CONNECT_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class MurfContextClosed(Exception):
+    """Raised by MurfContext.recv() when the context can't produce more messages"""
+
+
+class MurfConnection:
+    """One Murf stream-input WebSocket that can carry several contexts at once.
+
+    A single reader task demultiplexes incoming messages by ``context_id`` into
+    per-context queues, so concurrent turns never read each other's audio.
+    Messages for a context that is no longer open (audio Murf was still
+    sending when a barge-in closed it) are dropped and counted in ``dropped``.
+    """
+
+    def __init__(self, ws, pool_key):
+        self.ws = ws
+        self.pool_key = pool_key
+        self.contexts = {}
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.turns_served = 0
+        self.dropped = 0
+        self.reader = asyncio.create_task(self._read_loop())
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws.state is State.OPEN and not self.reader.done()
+
+    async def _read_loop(self):
+        try:
+            async for raw in self.ws:
+                data = json.loads(raw)
+                if "context_id" in data:
+                    queue = self.contexts.get(data["context_id"])
+                elif len(self.contexts) == 1:
+                    # Murf didn't echo the context id; there is only one place it can go
+                    queue = next(iter(self.contexts.values()))
+                else:
+                    queue = None
+                if queue is not None:
+                    queue.put_nowait(data)
+                else:
+                    # A closed context's leftovers must not reach whichever turn (or session) uses the connection next
+                    self.dropped += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"❌ [Murf Pool] Reader error: {e}")
+        finally:
+            for queue in self.contexts.values():
+                queue.put_nowait(None)
+
+    async def ping(self, timeout: float) -> bool:
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        self.reader.cancel()
+        await self.close_socket(self.ws)
+
+    @staticmethod
+    async def close_socket(ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+
+class MurfContext:
+    """A single turn's view of a (possibly shared) Murf connection"""
+
+    def __init__(self, connection: MurfConnection, context_id: str):
+        self.connection = connection
+        self.context_id = context_id
+        self.queue = asyncio.Queue()
+        self.finished = False
+
+    async def send_text(self, text: str):
+        await self.connection.ws.send(json.dumps({ "text": text, "context_id": self.context_id }))
+
+    async def end(self):
+        await self.connection.ws.send(json.dumps({ "context_id": self.context_id, "end": True }))
+
+    async def clear(self):
+        """Ask Murf to drop whatever is still queued for this context"""
+        try:
+            await self.connection.ws.send(json.dumps({ "context_id": self.context_id, "clear": True }))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def abort(self):
+        """Wake up a pending recv() without touching the connection"""
+        self.queue.put_nowait(None)
+
+    async def recv(self) -> dict:
+        data = await self.queue.get()
+        if data is None:
+            raise MurfContextClosed(self.context_id)
+        if data.get("final"):
+            self.finished = True
+        return data
+
+
+class MurfConnectionPool:
+    """Warm Murf WebSocket connections keyed by (url incl. API key, voice config).
+
+    Turns borrow a connection for the lifetime of one context and give it back
+    afterwards; up to ``max_contexts_per_connection`` turns share a connection
+    at once, each with its own ``context_id``. The voice config is sent once
+    when the connection is opened. A background task pings idle connections,
+    drops dead or long-idle ones and reconnects keys that were pre-warmed.
+    """
+
+    def __init__(self, max_connections_per_key: int = 4, max_contexts_per_connection: int = 8,
+                 idle_timeout: float = 300.0, health_interval: float = 20.0, ping_timeout: float = 5.0):
+        self.max_connections_per_key = max_connections_per_key
+        self.max_contexts_per_connection = max_contexts_per_connection
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.connections = {}
+        self.warm_keys = {}
+        self.locks = {}
+        self.health_task = None
+        self.hits = 0
+        self.misses = 0
+        self.connect_failures = 0
+        self.reconnects = 0
+        self.evictions = 0
+        self.connect_latency_buckets = [0] * (len(CONNECT_LATENCY_BUCKETS_MS) + 1)
+        self.connect_latency_sum_ms = 0.0
+        self.connect_latency_count = 0
+
+    @staticmethod
+    def make_key(url: str, voice_config: dict):
+        return (url, json.dumps(voice_config, sort_keys=True))
+
+    def start(self):
+        if self.health_task is None:
+            self.health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            await asyncio.gather(self.health_task, return_exceptions=True)
+            self.health_task = None
+        for conns in self.connections.values():
+            for conn in conns:
+                await conn.close()
+        self.connections.clear()
+
+    async def _connect(self, url: str, voice_config: dict, key) -> MurfConnection:
+        started = time.perf_counter()
+        ws = None
+        try:
+            ws = await websockets.connect(url)
+            await ws.send(json.dumps({ "voice_config": voice_config }))
+        except Exception:
+            self.connect_failures += 1
+            if ws is not None:
+                # Connected but the voice config didn't go out: nobody else holds the socket to close it
+                await MurfConnection.close_socket(ws)
+            raise
+        self._observe_connect_latency((time.perf_counter() - started) * 1000)
+        return MurfConnection(ws, key)
+
+    def _observe_connect_latency(self, elapsed_ms: float):
+        self.connect_latency_buckets[bisect.bisect_left(CONNECT_LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.connect_latency_sum_ms += elapsed_ms
+        self.connect_latency_count += 1
+
+    def _pick(self, key):
+        conns = [c for c in self.connections.get(key, []) if c.is_open]
+        self.connections[key] = conns
+        candidates = [c for c in conns if len(c.contexts) < self.max_contexts_per_connection]
+        if candidates:
+            return min(candidates, key=lambda c: len(c.contexts))
+        if conns and len(conns) >= self.max_connections_per_key:
+            # Every connection is busy and we're at the cap: double up on the least loaded one
+            return min(conns, key=lambda c: len(c.contexts))
+        return None
+
+    async def _checkout(self, url: str, voice_config: dict) -> MurfConnection:
+        key = self.make_key(url, voice_config)
+        conn = self._pick(key)
+        if conn is not None:
+            self.hits += 1
+            return conn
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another turn may have opened a connection while we waited for the lock
+            conn = self._pick(key)
+            if conn is not None:
+                self.hits += 1
+                return conn
+            self.misses += 1
+            conn = await self._connect(url, voice_config, key)
+            self.connections.setdefault(key, []).append(conn)
+            return conn
+
+    @asynccontextmanager
+    async def context(self, url: str, voice_config: dict, context_id: str, pooled: bool = True):
+        """Borrow a connection and open a Murf context on it for one turn"""
+        if pooled:
+            conn = await self._checkout(url, voice_config)
+        else:
+            conn = await self._connect(url, voice_config, self.make_key(url, voice_config))
+        ctx = MurfContext(conn, context_id)
+        conn.contexts[context_id] = ctx.queue
+        try:
+            yield ctx
+        finally:
+            conn.contexts.pop(context_id, None)
+            conn.last_used = time.monotonic()
+            conn.turns_served += 1
+            if not pooled:
+                await conn.close()
+            elif not ctx.finished and conn.is_open:
+                # The turn was abandoned mid-stream; stop Murf synthesizing into the void
+                await ctx.clear()
+
+    async def prewarm(self, url: str, voice_config: dict, count: int = 1, keep_warm: bool = False):
+        """Open connections ahead of the first turn; keep_warm makes the health loop hold them open"""
+        key = self.make_key(url, voice_config)
+        if keep_warm:
+            self.warm_keys[key] = (url, voice_config, max(count, self.warm_keys.get(key, (None, None, 0))[2]))
+        await self._refill(key, url, voice_config, count)
+
+    async def _refill(self, key, url: str, voice_config: dict, count: int):
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            conns = [c for c in self.connections.get(key, []) if c.is_open]
+            self.connections[key] = conns
+            while len(conns) < min(count, self.max_connections_per_key):
+                try:
+                    conns.append(await self._connect(url, voice_config, key))
+                except Exception as e:
+                    logger.error(f"❌ [Murf Pool] Pre-warm connect failed: {e}")
+                    return
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"❌ [Murf Pool] Health check failed: {e}")
+
+    async def check_health(self):
+        now = time.monotonic()
+        for key, conns in list(self.connections.items()):
+            warm_count = self.warm_keys.get(key, (None, None, 0))[2]
+            kept = 0
+            for conn in list(conns):
+                if conn.contexts:
+                    kept += 1
+                    continue
+                expired = now - conn.last_used > self.idle_timeout and kept >= warm_count
+                # The ping yields: turns may check this connection out, or open new ones for the key, meanwhile
+                if not expired and conn.is_open and (await conn.ping(self.ping_timeout) or conn.contexts):
+                    kept += 1
+                    continue
+                self.evictions += 1
+                # Remove it from the key's current list (_pick may have replaced the one iterated here), keeping the rest
+                current = self.connections.get(key, [])
+                if conn in current:
+                    current.remove(conn)
+                await conn.close()
+        for key, (url, voice_config, count) in self.warm_keys.items():
+            missing = count - len(self.connections.get(key, []))
+            if missing > 0:
+                self.reconnects += missing
+                await self._refill(key, url, voice_config, count)
+
+    def stats(self) -> dict:
+        conns = [c for conns in self.connections.values() for c in conns]
+        lookups = self.hits + self.misses
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(CONNECT_LATENCY_BUCKETS_MS + ("+Inf",), self.connect_latency_buckets):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "open_connections": sum(1 for c in conns if c.is_open),
+            "active_contexts": sum(len(c.contexts) for c in conns),
+            "connect_failures": self.connect_failures,
+            "reconnects": self.reconnects,
+            "evictions": self.evictions,
+            "dropped_messages": sum(c.dropped for c in conns),
+            "connect_latency_ms": {
+                "buckets": buckets,
+                "sum": self.connect_latency_sum_ms,
+                "count": self.connect_latency_count,
+            },
+        }
@@ -0,0 +1,589 @@
+import asyncio
+import base64
+import io
+import logging
+import re
+import time
+import wave
+import zlib
+from collections import OrderedDict, deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from types import SimpleNamespace
+from urllib.parse import urlencode
+
+import numpy as np
+import websockets
+
+from murf_pool import MurfContextClosed
+from sdk_loader import lazy_import
+
+logger = logging.getLogger("voice_agent.providers")
+
+aai = lazy_import("assemblyai")
+murf = lazy_import("murf")
+
+
+class ProviderUnavailable(Exception):
+    """Raised by ProviderRouter when no provider for a stage could serve a call"""
+
+    def __init__(self, stage: str, errors: dict):
+        detail = "; ".join(f"{name}: {error!r}" for name, error in errors.items()) or "every circuit breaker is open"
+        super().__init__(f"No {stage} provider available ({detail})")
+        self.stage = stage
+        self.errors = errors
+
+
+class LatencyWindow:
+    """Latencies (ms) of the last ``max_age`` seconds, at most ``max_samples`` of them"""
+
+    def __init__(self, max_age: float = 60.0, max_samples: int = 500):
+        self.max_age = max_age
+        self.samples = deque(maxlen=max_samples)
+
+    def add(self, ms: float):
+        self.samples.append((time.monotonic(), ms))
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    def __len__(self):
+        self._prune()
+        return len(self.samples)
+
+    def recent(self, count: int) -> list:
+        self._prune()
+        return [ms for _, ms in list(self.samples)[-count:]]
+
+    def percentile(self, q: float) -> float:
+        self._prune()
+        if not self.samples:
+            return 0.0
+        ordered = sorted(ms for _, ms in self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class CircuitBreaker:
+    """Closed until ``failure_threshold`` failures in a row, then open for ``reset_timeout`` seconds.
+
+    After that it is half-open: one trial call is let through, and its outcome
+    closes the breaker again or re-opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def begin(self):
+        if self.state == "half_open":
+            self.probing = True
+
+    def abandon(self):
+        """A call that was cancelled before it finished says nothing about the provider"""
+        self.probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+
+class ProviderHealth:
+    """Breaker, recent latency and counters for one provider of a stage"""
+
+    def __init__(self, breaker: CircuitBreaker, latency: LatencyWindow):
+        self.breaker = breaker
+        self.latency = latency
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.served = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.inflight = {}  # call -> perf_counter() when it started
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "trips": self.breaker.trips,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "served": self.served,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "inflight": len(self.inflight),
+            "latency_samples": len(self.latency),
+            "latency_ms_p50": round(self.latency.percentile(50), 1),
+            "latency_ms_p95": round(self.latency.percentile(95), 1),
+        }
+
+
+_EMPTY = object()
+_DEFAULT = object()
+
+
+def _consume(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+class ProviderRouter:
+    """Picks the provider for each call to one pipeline stage (ASR, LLM or TTS) and fails over between them.
+
+    Providers are tried in configured order, except that one running slow
+    goes behind those that aren't: the median of its last ``rank_samples``
+    latencies (within ``window`` seconds), counting calls still in flight past
+    ``slow_ms``, is above ``slow_ms``. One whose circuit breaker is open is
+    skipped. A
+    call that raises, or takes longer than ``timeout`` (or the call's own
+    timeout), counts against the provider and moves on to the next one. With
+    a single provider a timeout doesn't count towards opening its breaker:
+    there is nothing to fail over to, and one slow request (a long recording)
+    shouldn't turn away every other request to the stage. With ``hedge=True`` (meant for
+    short requests, where a duplicate is cheap) the next provider is started
+    as well once the first has taken longer than its recent
+    ``hedge_percentile`` latency (``hedge_delay_ms`` until it has
+    ``min_hedge_samples``), and whichever answers first wins; the other call
+    is cancelled. Blocking SDK calls can't be cancelled, so a hedge on those
+    holds its pool thread until the losing call returns.
+    """
+
+    def __init__(self, stage: str, providers: list, timeout: float = 20.0, slow_ms: float = 2000.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0, window: float = 30.0, rank_samples: int = 20,
+                 hedge_delay_ms: float = 1000.0, hedge_percentile: float = 95.0, min_hedge_samples: int = 20,
+                 min_hedge_delay_ms: float = 50.0):
+        if not providers:
+            raise ValueError(f"No {stage} providers configured")
+        self.stage = stage
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self.rank_samples = rank_samples
+        self.hedge_delay_ms = hedge_delay_ms
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_samples = min_hedge_samples
+        self.min_hedge_delay_ms = min_hedge_delay_ms
+        self.health = {
+            provider.name: ProviderHealth(CircuitBreaker(failure_threshold, reset_timeout), LatencyWindow(window))
+            for provider in self.providers
+        }
+        self.unavailable = 0
+
+    @property
+    def primary(self):
+        """The first configured provider; cached audio is keyed by its voice"""
+        return self.providers[0]
+
+    def slow(self, provider) -> bool:
+        health = self.health[provider.name]
+        now = time.perf_counter()
+        # A brownout shows in the calls still running long before any of them completes
+        overdue = [ms for ms in ((now - started) * 1000 for started in health.inflight.values()) if ms > self.slow_ms]
+        recent = health.latency.recent(self.rank_samples) + overdue
+        return len(recent) >= 3 and sorted(recent)[len(recent) // 2] > self.slow_ms
+
+    def ranked(self) -> list:
+        """Providers a call may use right now, in the order to try them"""
+        available = [p for p in self.providers if self.health[p.name].breaker.available()]
+        # Stable sort: configured order, with the slow ones moved to the back
+        return sorted(available, key=self.slow)
+
+    def hedge_delay(self, provider) -> float:
+        latency = self.health[provider.name].latency
+        delay_ms = latency.percentile(self.hedge_percentile) if len(latency) >= self.min_hedge_samples else self.hedge_delay_ms
+        return max(delay_ms, self.min_hedge_delay_ms) / 1000
+
+    def record_success(self, provider, latency_ms: float):
+        health = self.health[provider.name]
+        health.breaker.record_success()
+        health.latency.add(latency_ms)
+
+    def record_failure(self, provider, error: Exception):
+        health = self.health[provider.name]
+        health.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            health.timeouts += 1
+            if len(self.providers) == 1:
+                health.breaker.abandon()
+                return
+        was_closed = health.breaker.state == "closed"
+        health.breaker.record_failure()
+        if was_closed and health.breaker.state == "open":
+            logger.warning(f"⚡ [Providers] {self.stage} provider {provider.name} failing ({error!r}); circuit opened")
+
+    async def call(self, attempt, hedge: bool = False, timeout: float = _DEFAULT):
+        """(provider, result) from the first provider whose ``await attempt(provider)`` succeeds.
+
+        ``timeout`` replaces the stage's timeout for this call's attempts (None: no limit).
+        """
+        attempt_timeout = self.timeout if timeout is _DEFAULT else timeout
+        candidates = self.ranked()
+        if not candidates:
+            self.unavailable += 1
+            raise ProviderUnavailable(self.stage, {})
+        pending = {}
+        errors = {}
+
+        def launch(hedged: bool = False):
+            provider = candidates[len(errors) + len(pending)]
+            health = self.health[provider.name]
+            health.calls += 1
+            health.hedges += hedged
+            health.breaker.begin()
+            task = asyncio.create_task(asyncio.wait_for(attempt(provider), attempt_timeout))
+            pending[task] = (provider, time.perf_counter(), hedged)
+            health.inflight[task] = pending[task][1]
+            return provider
+
+        def hedge_deadline(provider):
+            more = len(errors) + len(pending) < len(candidates)
+            return time.perf_counter() + self.hedge_delay(provider) if hedge and more else None
+
+        hedge_at = hedge_deadline(launch())
+        try:
+            while pending:
+                timeout = max(0.0, hedge_at - time.perf_counter()) if hedge_at is not None else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch(hedged=True)
+                    hedge_at = None
+                    continue
+                for task in done:
+                    provider, started, hedged = pending.pop(task)
+                    self.health[provider.name].inflight.pop(task, None)
+                    finished = time.perf_counter()
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors[provider.name] = e
+                        self.record_failure(provider, e)
+                        continue
+                    self.record_success(provider, (finished - started) * 1000)
+                    health = self.health[provider.name]
+                    health.served += 1
+                    health.hedge_wins += hedged
+                    for other, other_started, other_hedged in pending.values():
+                        if not other_hedged:
+                            # Started first and still running: its latency is at least this long
+                            self.health[other.name].latency.add((finished - other_started) * 1000)
+                    return provider, result
+                if not pending and len(errors) < len(candidates):
+                    # Everything in flight failed: fail over to the next provider
+                    hedge_at = hedge_deadline(launch())
+            self.unavailable += 1
+            raise ProviderUnavailable(self.stage, errors)
+        finally:
+            for task, (provider, _, _) in pending.items():
+                task.cancel()
+                task.add_done_callback(_consume)
+                health = self.health[provider.name]
+                health.inflight.pop(task, None)
+                health.breaker.abandon()
+
+    async def stream(self, open_stream, hedge: bool = False):
+        """(provider, async iterator) for the first provider stream to deliver an item.
+
+        ``await open_stream(provider)`` returns an async iterable. The latency is
+        the time to its first item, and a failure later in the stream still
+        counts against the provider (there is no failing over once items are out).
+        """
+        async def first_item(provider):
+            iterator = (await open_stream(provider)).__aiter__()
+            try:
+                return iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return iterator, _EMPTY
+
+        provider, (iterator, first) = await self.call(first_item, hedge)
+        return provider, self._rest(provider, iterator, first)
+
+    async def _rest(self, provider, iterator, first):
+        if first is _EMPTY:
+            return
+        yield first
+        try:
+            async for item in iterator:
+                yield item
+        except Exception as e:
+            self.record_failure(provider, e)
+            raise
+
+    @asynccontextmanager
+    async def context(self, open_context):
+        """Enter ``open_context(provider)`` on the first provider that opens it within ``timeout``; yields (provider, value)"""
+        errors = {}
+        for provider in self.ranked():
+            health = self.health[provider.name]
+            health.calls += 1
+            health.breaker.begin()
+            stack = AsyncExitStack()
+            started = health.inflight[stack] = time.perf_counter()
+            try:
+                value = await asyncio.wait_for(stack.enter_async_context(open_context(provider)), self.timeout)
+            except Exception as e:
+                errors[provider.name] = e
+                self.record_failure(provider, e)
+                continue
+            except BaseException:
+                health.breaker.abandon()
+                raise
+            finally:
+                health.inflight.pop(stack, None)
+            self.record_success(provider, (time.perf_counter() - started) * 1000)
+            health.served += 1
+            async with stack:
+                yield provider, value
+            return
+        self.unavailable += 1
+        raise ProviderUnavailable(self.stage, errors)
+
+    def stats(self) -> dict:
+        return {
+            "order": [provider.name for provider in self.ranked()],
+            "unavailable": self.unavailable,
+            "providers": {name: health.stats() for name, health in self.health.items()},
+        }
+
+
+# --- LLM providers ---------------------------------------------------------------
+
+class GeminiLLM:
+    """Gemini through the SDK, with models from a GeminiModelRegistry (per-key clients, nothing global)"""
+
+    def __init__(self, registry, model_name: str = "gemini-1.5-flash", run_blocking=None):
+        self.registry = registry
+        self.model_name = model_name
+        self.run_blocking = run_blocking
+        self.name = f"gemini:{model_name}"
+
+    async def stream(self, user_query: str, history: list, system_prompt: str, api_key: str):
+        model = await self.registry.aget(api_key, self.model_name, system_instruction=system_prompt)
+        return await model.start_chat(history=history).send_message_async(user_query, stream=True)
+
+    async def complete(self, user_query: str, system_prompt: str, api_key: str) -> str:
+        model = await self.registry.aget(api_key, self.model_name, system_instruction=system_prompt)
+        response = await self.run_blocking(model.generate_content, user_query)
+        return response.text
+
+
+class TemplateLLM:
+    """Local CPU-only reference LLM: a canned reply picked by the question, streamed a few words at a time.
+
+    It doesn't answer anything; it lets the pipeline run with no network and
+    can stand last in LLM_PROVIDERS so a turn still gets a spoken reply.
+    """
+
+    name = "template"
+    replies = (
+        "Arre boss, '{topic}' pe abhi apun ka dimaag thoda slow chal raha hai. Thodi der mein wapas poochho na, ekdum jhakas jawab milega!",
+        "Bole toh '{topic}'? Sawaal mast hai, bidu, lekin abhi apun ka connection local train jaisa late chal raha hai. Ek minute mein phir se try karo!",
+        "'{topic}' ke baare mein poora gyaan dena hai, boss, par abhi line thodi busy hai. Chai pi lo, phir wapas baat karte hain!",
+    )
+
+    def __init__(self, words_per_chunk: int = 4):
+        self.words_per_chunk = words_per_chunk
+
+    def reply_for(self, user_query: str) -> str:
+        words = re.findall(r"\w+", user_query.lower())
+        topic = " ".join(words[:6]) or "yeh sawaal"
+        return self.replies[zlib.crc32(" ".join(words).encode()) % len(self.replies)].format(topic=topic)
+
+    async def _chunks(self, text: str):
+        words = re.findall(r"\S+\s*", text)
+        for i in range(0, len(words), self.words_per_chunk):
+            await asyncio.sleep(0)
+            yield SimpleNamespace(text="".join(words[i:i + self.words_per_chunk]))
+
+    async def stream(self, user_query: str, history: list, system_prompt: str, api_key: str):
+        return self._chunks(self.reply_for(user_query))
+
+    async def complete(self, user_query: str, system_prompt: str, api_key: str) -> str:
+        return self.reply_for(user_query)
+
+
+# --- TTS providers ---------------------------------------------------------------
+
+class MurfTTS:
+    """Murf: REST generate through the SDK (blocking, run with ``run_blocking``) and stream-input contexts from a MurfConnectionPool"""
+
+    def __init__(self, pool, stream_url, voice_config: dict, run_blocking, pooled: bool = True, max_clients: int = 16):
+        self.pool = pool
+        self.stream_url = stream_url
+        self.voice_config = voice_config
+        self.run_blocking = run_blocking
+        self.pooled = pooled
+        self.max_clients = max_clients
+        self.clients = OrderedDict()
+        self.name = f"murf:{voice_config['voiceId']}"
+
+    def client(self, api_key: str):
+        # SDK clients keep their HTTP connections, so they are reused per key
+        client = self.clients.get(api_key)
+        if client is None:
+            client = self.clients[api_key] = murf.Murf(api_key=api_key)
+            while len(self.clients) > self.max_clients:
+                self.clients.popitem(last=False)
+        self.clients.move_to_end(api_key)
+        return client
+
+    async def synthesize(self, text: str, api_key: str, encode: bool = False):
+        """Murf's generate response: ``audio_file`` (a URL) and, with encode, ``encoded_audio`` (base64 WAV)"""
+        return await self.run_blocking(
+            self.client(api_key).text_to_speech.generate,
+            text=text,
+            voice_id=self.voice_config["voiceId"],
+            style=self.voice_config["style"],
+            multiNativeLocale=self.voice_config["multiNativeLocale"],
+            **({"encode_as_base_64": True} if encode else {})
+        )
+
+    def context(self, api_key: str, context_id: str):
+        return self.pool.context(self.stream_url(api_key), self.voice_config, context_id, pooled=self.pooled)
+
+    async def prewarm(self, api_key: str, keep_warm: bool = False):
+        if self.pooled:
+            await self.pool.prewarm(self.stream_url(api_key), self.voice_config, keep_warm=keep_warm)
+
+
+class ToneContext:
+    """A ToneTTS stream, with the recv()/send_text()/end()/abort() interface of a Murf context"""
+
+    def __init__(self, tts, context_id: str):
+        self.tts = tts
+        self.context_id = context_id
+        self.queue = asyncio.Queue()
+        self.finished = False
+
+    async def send_text(self, text: str):
+        for chunk in self.tts.chunks(text):
+            self.queue.put_nowait({"audio": base64.b64encode(chunk).decode(), "context_id": self.context_id})
+
+    async def end(self):
+        self.queue.put_nowait({"final": True, "context_id": self.context_id})
+
+    async def clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def abort(self):
+        self.queue.put_nowait(None)
+
+    async def recv(self) -> dict:
+        data = await self.queue.get()
+        if data is None:
+            raise MurfContextClosed(self.context_id)
+        if data.get("final"):
+            self.finished = True
+        return data
+
+
+class ToneTTS:
+    """Local CPU-only reference TTS: a quiet sine tone lasting about as long as the text takes to say.
+
+    Same interface as MurfTTS, so the pipeline runs with no network; the REST
+    path hands back a data: URL instead of a link to Murf's storage.
+    """
+
+    name = "tone"
+
+    def __init__(self, sample_rate: int = 44100, ms_per_char: float = 60.0, chunk_ms: int = 250, frequency: float = 220.0):
+        self.sample_rate = sample_rate
+        self.ms_per_char = ms_per_char
+        self.chunk_samples = sample_rate * chunk_ms // 1000
+        self.frequency = frequency
+        self.voice_config = {"voiceId": "tone", "frequency": frequency, "ms_per_char": ms_per_char}
+
+    def render(self, text: str) -> np.ndarray:
+        samples = max(1, int(len(text.strip()) * self.ms_per_char * self.sample_rate / 1000))
+        t = np.arange(samples) / self.sample_rate
+        return (np.sin(2 * np.pi * self.frequency * t) * 3000).astype("<i2")
+
+    def wav(self, pcm: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(self.sample_rate)
+            out.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+
+    def chunks(self, text: str) -> list:
+        """The text's audio as WAV files of ``chunk_ms`` each, like Murf's stream-input chunks"""
+        pcm = self.render(text)
+        return [self.wav(pcm[i:i + self.chunk_samples]) for i in range(0, len(pcm), self.chunk_samples)]
+
+    async def synthesize(self, text: str, api_key: str = None, encode: bool = False):
+        encoded = base64.b64encode(self.wav(self.render(text))).decode()
+        return SimpleNamespace(audio_file=f"data:audio/wav;base64,{encoded}", encoded_audio=encoded if encode else None)
+
+    @asynccontextmanager
+    async def context(self, api_key: str, context_id: str):
+        yield ToneContext(self, context_id)
+
+    async def prewarm(self, api_key: str, keep_warm: bool = False):
+        pass
+
+
+# --- ASR providers ---------------------------------------------------------------
+
+class AssemblyAIASR:
+    """AssemblyAI: Universal Streaming over a WebSocket for /ws, and the batch transcriber (blocking SDK) for uploads"""
+
+    name = "assemblyai"
+
+    def __init__(self, stream_url, run_blocking, max_clients: int = 16):
+        self.stream_url = stream_url
+        self.run_blocking = run_blocking
+        self.max_clients = max_clients
+        self.transcribers = OrderedDict()
+
+    def connect(self, api_key: str, params: dict):
+        """The streaming WebSocket, as an async context manager"""
+        return websockets.connect(f"{self.stream_url()}?{urlencode(params)}", additional_headers={"Authorization": api_key})
+
+    def transcriber(self, api_key: str):
+        # Each key gets a transcriber with its own client, so a session's key never goes through the
+        # SDK's global settings where a concurrent transcription could pick it up; reused per key like MurfTTS
+        transcriber = self.transcribers.get(api_key)
+        if transcriber is None:
+            transcriber = self.transcribers[api_key] = aai.Transcriber(
+                api_key=api_key, config=aai.TranscriptionConfig(speech_model=aai.SpeechModel.best))
+            while len(self.transcribers) > self.max_clients:
+                self.transcribers.popitem(last=False)
+        self.transcribers.move_to_end(api_key)
+        return transcriber
+
+    async def transcribe(self, audio, api_key: str) -> str:
+        """``audio`` is bytes or a binary file, which the SDK uploads in chunks without reading it all in"""
+        if hasattr(audio, "seek"):
+            # An earlier attempt (another provider, a timed-out call) may have read part of it
+            audio.seek(0)
+        transcript = await self.run_blocking(self.transcriber(api_key).transcribe, audio)
+        if transcript.status == aai.TranscriptStatus.error:
+            raise RuntimeError(f"Transcription failed: {transcript.error}")
+        return transcript.text or ""
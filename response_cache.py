@@ -0,0 +1,167 @@
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Answers to these go stale (or depend on when/where they're asked), so they're never cached
+TIME_SENSITIVE = re.compile(
+    r"\b(?:today|tonight|tomorrow|yesterday|now|right now|currently|current|latest|recent|news|live|"
+    r"weather|forecast|temperature|score|price|rate|stock|time|date|day|week|month|year|"
+    r"aaj|kal|abhi|parso|mausam|khabar|samachar)\b"
+)
+
+NUMBER = re.compile(r"\d+")
+
+
+def normalize(text: str) -> str:
+    """Case, width, punctuation and whitespace-insensitive form of a question"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+# Function words (English and Hinglish) barely count towards similarity; content words carry it
+STOP_WORDS = frozenset("""
+a an the is are was were be been am do does did of to in on at for from with about by as and or but if
+what whats which who whom whose how why when where can could would should will shall may might must
+i me my you your we our he she it its they them their this that these those there here please tell
+give explain describe some any s t d ll re ve m
+kya hai hain ho tha thi the ka ki ke ko se me mein mujhe mera meri tum tu aap batao bata bolo kaise
+kyu kyun kaun kab kahan ye yeh woh wo aur ya bhi toh to na nahi
+""".split())
+
+
+def hashed_embedding(text: str, dims: int = 512) -> np.ndarray:
+    """Hashed bag of content words plus their character trigrams, L2-normalised.
+
+    Cheap and local. Content words dominate, so rewording around them ("what's
+    the capital of france" / "capital of france?") stays close while swapping
+    the word that matters ("france" / "spain") does not; the low-weight
+    trigrams absorb spelling variants ("ki" / "ka", "colour" / "color").
+    """
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in text.split():
+        if word in STOP_WORDS:
+            vector[zlib.crc32(word.encode()) % dims] += 0.1
+            continue
+        vector[zlib.crc32(word.encode()) % dims] += 1.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % dims] += 0.15
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """LLM replies keyed by normalised question, with an optional similarity index.
+
+    ``lookup`` tries the exact normalised text first. With ``similarity`` > 0
+    it then compares the question's embedding against every cached one (a
+    single matrix-vector product over a preallocated ``maxsize`` x ``dims``
+    array) and returns the best match at or above that cosine similarity.
+    Entries expire after ``ttl`` seconds and the least recently used one is
+    evicted beyond ``maxsize``. Questions matching ``skip_pattern`` (time
+    sensitive) are neither served from nor stored in the cache.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 21600.0, similarity: float = 0.0, dims: int = 512,
+                 skip_pattern=TIME_SENSITIVE, embed=hashed_embedding):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self.dims = dims
+        self.skip_pattern = skip_pattern
+        self.embed = embed
+        self.entries = OrderedDict()  # normalised text -> (response, expires_at, row)
+        self.vectors = np.zeros((maxsize, dims), dtype=np.float32) if similarity > 0 else None
+        self.row_keys = [None] * maxsize
+        self.free_rows = list(range(maxsize - 1, -1, -1))
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def cacheable(self, text: str) -> bool:
+        return bool(text) and not (self.skip_pattern and self.skip_pattern.search(text))
+
+    def _remove(self, key):
+        _, _, row = self.entries.pop(key)
+        self.row_keys[row] = None
+        if self.vectors is not None:
+            self.vectors[row] = 0
+        self.free_rows.append(row)
+
+    def _fresh(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def lookup(self, text: str):
+        """Cached reply for the question, or None"""
+        key = normalize(text)
+        if not self.cacheable(key):
+            self.skipped += 1
+            return None
+        response = self._fresh(key)
+        if response is not None:
+            self.exact_hits += 1
+            return response
+        if self.vectors is not None and self.entries:
+            scores = self.vectors @ self.embed(key, self.dims)
+            row = int(np.argmax(scores))
+            match = self.row_keys[row]
+            # Numbers are the one thing a near-duplicate must never differ in ("5 plus 7" / "5 plus 8")
+            if scores[row] >= self.similarity and match is not None and NUMBER.findall(match) == NUMBER.findall(key):
+                response = self._fresh(match)
+                if response is not None:
+                    self.similar_hits += 1
+                    return response
+        self.misses += 1
+        return None
+
+    def store(self, text: str, response: str):
+        key = normalize(text)
+        if not response or not self.cacheable(key):
+            return
+        if key in self.entries:
+            self._remove(key)
+        while len(self.entries) >= self.maxsize:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+        row = self.free_rows.pop()
+        self.row_keys[row] = key
+        if self.vectors is not None:
+            self.vectors[row] = self.embed(key, self.dims)
+        self.entries[key] = (response, time.time() + self.ttl, row)
+
+    def clear(self):
+        for key in list(self.entries):
+            self._remove(key)
+
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "similarity": self.similarity,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,83 @@
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger("voice_agent.sdk_loader")
+
+
+class LazyModule:
+    """Stand-in for a provider SDK module that is imported on first attribute access.
+
+    The SDKs are most of the time it takes to import main (google.generativeai
+    alone pulls in grpc, protobuf and IPython), and many processes never touch
+    some of them: a worker serving /ws has no use for assemblyai's REST client.
+    Attribute reads and writes go to the real module, so patching
+    ``providers.murf.Murf`` works as it did with a plain import.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+        object.__setattr__(self, "_load_ms", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            # The first turn may trigger this from the SDK thread pool while the pre-warm thread is importing too
+            with self._lock:
+                module = self._module
+                if module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, "_load_ms", (time.perf_counter() - started) * 1000)
+                    object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def _loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+# One proxy per module name, so every importer shares the same load
+_modules = {}
+_modules_lock = threading.Lock()
+
+
+def lazy_import(name: str) -> LazyModule:
+    with _modules_lock:
+        module = _modules.get(name)
+        if module is None:
+            module = _modules[name] = LazyModule(name)
+        return module
+
+
+def prewarm(names=None) -> dict:
+    """Import the given (default: all registered) lazy modules now; blocking, meant for a worker thread"""
+    timings = {}
+    for name in names or list(_modules):
+        try:
+            lazy_import(name)._load()
+            timings[name] = _modules[name]._load_ms
+        except Exception as e:
+            logger.error(f"❌ [SDK] Pre-warm import of {name} failed: {e}")
+    return timings
+
+
+def stats() -> dict:
+    return {
+        name: {"loaded": module._loaded,
+               "load_ms": round(module._load_ms, 1) if module._load_ms is not None else None}
+        for name, module in sorted(_modules.items())
+    }
@@ -0,0 +1,186 @@
+import json
+import time
+from collections import OrderedDict
+
+from ttl_cache import approx_size
+
+
+class MemorySessionBackend:
+    """Per-process session histories with LRU eviction past max_sessions and idle expiry"""
+
+    def __init__(self, max_sessions: int, idle_ttl: float):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.sessions = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, session_id: str):
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        history, last_seen = entry
+        if time.monotonic() - last_seen > self.idle_ttl:
+            del self.sessions[session_id]
+            self.expirations += 1
+            return None
+        return history
+
+    async def set(self, session_id: str, history: list):
+        self.sessions[session_id] = (history, time.monotonic())
+        self.sessions.move_to_end(session_id)
+        self._sweep()
+
+    async def delete(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+    def _sweep(self):
+        # Least recently used first, so idle sessions are always at the front
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.sessions:
+            session_id, (_, last_seen) = next(iter(self.sessions.items()))
+            if last_seen >= cutoff:
+                break
+            del self.sessions[session_id]
+            self.expirations += 1
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evictions += 1
+
+    async def stats(self) -> dict:
+        sizes = [approx_size(history) for history, _ in self.sessions.values()]
+        return {
+            "backend": "memory",
+            "sessions": len(sizes),
+            "memory_bytes": sum(sizes),
+            "max_session_bytes": max(sizes, default=0),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    async def close(self):
+        self.sessions.clear()
+
+
+class RedisSessionBackend:
+    """Histories in Redis so several uvicorn workers share sessions.
+
+    Each history is a JSON string under ``<prefix><session_id>`` with an
+    expiry of ``idle_ttl`` (refreshed on every write); a sorted set of
+    last-write times lets the store evict the oldest sessions past
+    ``max_sessions``. Takes any redis.asyncio-compatible client, including
+    ``fakeredis.FakeAsyncRedis``. ``stats`` sizes the histories with
+    pipelined STRLENs, ``stats_batch`` per round trip.
+    """
+
+    def __init__(self, client, max_sessions: int, idle_ttl: float, prefix: str = "chat:session:",
+                 stats_batch: int = 1000):
+        self.client = client
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+        self.index_key = f"{prefix}__index__"
+        self.stats_batch = stats_batch
+        self.evictions = 0
+
+    async def get(self, session_id: str):
+        raw = await self.client.get(self.prefix + session_id)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, session_id: str, history: list):
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(self.prefix + session_id, json.dumps(history), ex=max(1, int(self.idle_ttl)))
+            pipe.zadd(self.index_key, {session_id: now})
+            # Index entries whose key has expired are dropped here too
+            pipe.zremrangebyscore(self.index_key, "-inf", now - self.idle_ttl)
+            pipe.zcard(self.index_key)
+            *_, count = await pipe.execute()
+        if count > self.max_sessions:
+            oldest = await self.client.zrange(self.index_key, 0, count - self.max_sessions - 1)
+            if oldest:
+                oldest = [s.decode() if isinstance(s, bytes) else s for s in oldest]
+                await self.client.delete(*(self.prefix + s for s in oldest))
+                await self.client.zrem(self.index_key, *oldest)
+                self.evictions += len(oldest)
+
+    async def delete(self, session_id: str):
+        await self.client.delete(self.prefix + session_id)
+        await self.client.zrem(self.index_key, session_id)
+
+    async def stats(self) -> dict:
+        session_ids = await self.client.zrange(self.index_key, 0, -1)
+        sizes = []
+        # /stats is polled: one round trip per batch of sessions rather than one per session
+        for start in range(0, len(session_ids), self.stats_batch):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for session_id in session_ids[start:start + self.stats_batch]:
+                    session_id = session_id.decode() if isinstance(session_id, bytes) else session_id
+                    pipe.strlen(self.prefix + session_id)
+                sizes += [size for size in await pipe.execute() if size]
+        return {
+            "backend": "redis",
+            "sessions": len(sizes),
+            "memory_bytes": sum(sizes),
+            "max_session_bytes": max(sizes, default=0),
+            "evictions": self.evictions,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class SessionStore:
+    """Bounded chat history per session, kept as plain Gemini content dicts.
+
+    Histories are stored as ``[{"role": "user"|"model", "parts": [text]}, ...]``
+    so a chat can be rebuilt per turn with ``model.start_chat(history=...)``
+    on any worker. Only the last ``max_turns`` exchanges are kept, and older
+    exchanges are dropped further until the history fits in ``max_chars``,
+    which caps both memory and the prompt sent to Gemini on every turn.
+    """
+
+    def __init__(self, backend, max_turns: int = 12, max_chars: int = 8000):
+        self.backend = backend
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.turns_trimmed = 0
+
+    async def get_history(self, session_id: str) -> list:
+        return list(await self.backend.get(session_id) or [])
+
+    async def append(self, session_id: str, user_text: str, model_text: str) -> list:
+        history = await self.get_history(session_id)
+        history.append({"role": "user", "parts": [user_text]})
+        history.append({"role": "model", "parts": [model_text]})
+        history = self.window(history)
+        await self.backend.set(session_id, history)
+        return history
+
+    def window(self, history: list) -> list:
+        before = len(history)
+        history = history[-2 * self.max_turns:]
+        chars = sum(len(part) for message in history for part in message["parts"])
+        # Always keep the latest exchange, even if it alone is over max_chars
+        while chars > self.max_chars and len(history) > 2:
+            for message in history[:2]:
+                chars -= sum(len(part) for part in message["parts"])
+            history = history[2:]
+        self.turns_trimmed += (before - len(history)) // 2
+        return history
+
+    async def delete(self, session_id: str):
+        await self.backend.delete(session_id)
+
+    async def stats(self) -> dict:
+        stats = await self.backend.stats()
+        stats.update({
+            "max_turns": self.max_turns,
+            "max_chars": self.max_chars,
+            "turns_trimmed": self.turns_trimmed,
+            "avg_session_bytes": stats["memory_bytes"] // stats["sessions"] if stats["sessions"] else 0,
+        })
+        return stats
+
+    async def close(self):
+        await self.backend.close()
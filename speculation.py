@@ -0,0 +1,129 @@
+import difflib
+import time
+from functools import partial
+
+from response_cache import normalize
+
+
+class SpeculationStats:
+    """Totals across sessions for replies started before AssemblyAI's formatted transcript"""
+
+    def __init__(self):
+        self.started = 0
+        self.committed = 0
+        self.wasted = 0
+        self.stale = 0
+        self.head_start_ms_total = 0.0
+        self.head_start_ms_max = 0.0
+        self.by_trigger = {}  # trigger -> [started, committed]
+
+    def commit(self, trigger: str, head_start_ms: float):
+        self.committed += 1
+        self.by_trigger[trigger][1] += 1
+        self.head_start_ms_total += head_start_ms
+        self.head_start_ms_max = max(self.head_start_ms_max, head_start_ms)
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "committed": self.committed,
+            "wasted": self.wasted,
+            "stale": self.stale,
+            "commit_ratio": round(self.committed / self.started, 3) if self.started else 0.0,
+            "head_start_ms_avg": round(self.head_start_ms_total / self.committed, 1) if self.committed else 0.0,
+            "head_start_ms_max": round(self.head_start_ms_max, 1),
+            "by_trigger": {trigger: {"started": started, "committed": committed}
+                           for trigger, (started, committed) in self.by_trigger.items()},
+        }
+
+
+def similarity(a: str, b: str) -> float:
+    """How alike two transcripts are once case, punctuation and spacing are ignored (0..1)"""
+    a, b = normalize(a), normalize(b)
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class Speculator:
+    """Starts a session's next reply from AssemblyAI's unformatted transcript.
+
+    With ``format_turns`` AssemblyAI sends every end of turn twice: first
+    unformatted, then (a few hundred ms later) punctuated and cased. ``observe``
+    is fed the Turn messages that come before the formatted one. The
+    unformatted end of turn, or a partial transcript that stayed the same for
+    ``stable_partials`` messages in a row, calls ``prepare(transcript)``,
+    which starts the work (routing, the Gemini request) and returns an object
+    with a ``transcript`` and a ``cancel()``. A later trigger with different
+    words replaces it. ``take(final)`` hands the prepared reply over if the
+    formatted transcript is at least ``min_similarity`` alike and ``accept``
+    (if given) agrees, and cancels it otherwise. A prepared object with
+    ``deferred_commit`` set can still turn out unusable after that, so it is
+    only counted as committed when it calls the ``commit()`` take() gives it.
+    """
+
+    def __init__(self, prepare, min_similarity: float = 0.9, stable_partials: int = 4, accept=None,
+                 stats: SpeculationStats = None):
+        self.prepare = prepare
+        self.min_similarity = min_similarity
+        self.stable_partials = stable_partials
+        self.accept = accept
+        self.stats = stats or SpeculationStats()
+        self.prepared = None
+        self.started = 0.0
+        self.trigger = None
+        self.partial = None
+        self.partial_repeats = 0
+
+    def observe(self, data: dict):
+        transcript = data.get("transcript", "")
+        if not transcript.strip():
+            return
+        if data.get("end_of_turn"):
+            self._speculate(transcript, "end_of_turn")
+            return
+        key = normalize(transcript)
+        if key == self.partial:
+            self.partial_repeats += 1
+        else:
+            self.partial, self.partial_repeats = key, 1
+        if self.stable_partials and self.partial_repeats == self.stable_partials:
+            self._speculate(transcript, "stable_partial")
+
+    def _speculate(self, transcript: str, trigger: str):
+        if self.prepared is not None:
+            if similarity(transcript, self.prepared.transcript) >= self.min_similarity:
+                return
+            self._discard()
+        self.prepared = self.prepare(transcript)
+        self.started = time.perf_counter()
+        self.trigger = trigger
+        self.stats.started += 1
+        self.stats.by_trigger.setdefault(trigger, [0, 0])[0] += 1
+
+    def take(self, final: str):
+        """The prepared reply if it still fits the formatted transcript, else None"""
+        prepared, self.prepared = self.prepared, None
+        self.partial, self.partial_repeats = None, 0
+        if prepared is None:
+            return None
+        if similarity(final, prepared.transcript) < self.min_similarity or (
+                self.accept is not None and not self.accept(prepared, final)):
+            prepared.cancel()
+            self.stats.wasted += 1
+            return None
+        commit = partial(self.stats.commit, self.trigger, (time.perf_counter() - self.started) * 1000)
+        if getattr(prepared, "deferred_commit", False):
+            prepared.commit = commit
+        else:
+            commit()
+        return prepared
+
+    def _discard(self):
+        self.prepared.cancel()
+        self.prepared = None
+        self.stats.wasted += 1
+
+    def close(self):
+        if self.prepared is not None:
+            self._discard()
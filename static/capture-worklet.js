@@ -0,0 +1,64 @@
+// AudioWorklet that turns microphone input into 16-bit PCM frames of `frameMs` at `targetRate`.
+// Frames are written into preallocated buffers; the main thread transfers each one back
+// ("recycle") after handing it to the WebSocket, so steady-state capture allocates nothing.
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = (options && options.processorOptions) || {};
+        this.targetRate = opts.targetRate || 16000;
+        this.frameSamples = Math.round((this.targetRate * (opts.frameMs || 20)) / 1000);
+        this.ratio = sampleRate / this.targetRate;
+        this.pool = [];
+        for (let i = 0; i < (opts.poolSize || 8); i++) {
+            this.pool.push(new ArrayBuffer(this.frameSamples * 2));
+        }
+        this.frame = new Int16Array(this.takeBuffer());
+        this.fill = 0;
+        // Downsampling by averaging every input sample that falls into one output sample
+        this.sum = 0;
+        this.count = 0;
+        this.inputIndex = 0;
+        this.nextBoundary = this.ratio;
+        this.port.onmessage = (event) => {
+            const message = event.data;
+            if (message.type === "recycle" && message.buffer.byteLength === this.frameSamples * 2) {
+                this.pool.push(message.buffer);
+            }
+        };
+    }
+
+    takeBuffer() {
+        return this.pool.pop() || new ArrayBuffer(this.frameSamples * 2);
+    }
+
+    process(inputs) {
+        const input = inputs[0] && inputs[0][0];
+        if (!input) return true;
+        for (let i = 0; i < input.length; i++) {
+            this.sum += input[i];
+            this.count++;
+            this.inputIndex++;
+            if (this.inputIndex >= this.nextBoundary) {
+                const s = Math.max(-1, Math.min(1, this.sum / this.count));
+                this.frame[this.fill++] = s < 0 ? s * 0x8000 : s * 0x7fff;
+                this.sum = 0;
+                this.count = 0;
+                this.nextBoundary += this.ratio;
+                if (this.fill === this.frameSamples) {
+                    // Context time of the frame's last sample, so the main thread can measure the hand-off
+                    this.flush(currentTime + (i + 1) / sampleRate);
+                }
+            }
+        }
+        return true;
+    }
+
+    flush(endTime) {
+        const buffer = this.frame.buffer;
+        this.port.postMessage({ type: "frame", buffer, endTime }, [buffer]);
+        this.frame = new Int16Array(this.takeBuffer());
+        this.fill = 0;
+    }
+}
+
+registerProcessor("pcm-capture", PcmCaptureProcessor);
@@ -24,13 +24,38 @@ document.addEventListener('DOMContentLoaded', () => {
     let stream;
     let audioContext;
     let scriptProcessor;
+    let captureNode;
     let mediaStreamSource;
 
+    // Microphone capture: 16 kHz PCM frames of CAPTURE_FRAME_MS (20-50 ms) from an AudioWorklet
+    // (capture-worklet.js); the server coalesces them into the chunk sizes AssemblyAI wants
+    const CAPTURE_SAMPLE_RATE = 16000;
+    const CAPTURE_FRAME_MS = 20;
+    let captureMetrics = { frames: 0, handoffTotal: 0, handoffMax: 0 };
+
     let userTranscript = "";
     let llmResponse = "";
     let audioPlaying = false;
     let receivedAudioChunks = [];
     let combinedAudioBlob = null;
+    // Barge-in: a reply is "active" from the end of the user's turn until its audio finishes;
+    // after an interrupt, audio still in flight for the old reply is discarded
+    let replyActive = false;
+    let discardAudio = false;
+    // Murf audio arrives as binary frames (12-byte header: version, flags, pad, turn id, sequence)
+    // when the server accepts ?audio_transport=binary, otherwise as base64 in MurfAudioChunk messages
+    const AUDIO_FRAME_HEADER_BYTES = 12;
+    let audioTransport = "json";
+    let currentAudioTurn = null;
+
+    // Progressive playback: PCM goes to an AudioWorklet as it arrives (playback-worklet.js),
+    // falling back to play-after-complete where AudioWorklet isn't available
+    const PLAYBACK_SAMPLE_RATE = 44100;  // matches sample_rate in the server's Murf stream URL
+    const PLAYBACK_JITTER_MS = 120;
+    let playbackContext = null;
+    let playerNode = null;
+    let pcmCarry = null;
+    let turnMetrics = null;
     let chatHistory = [];
     let isRecording = false;
 
@@ -306,6 +331,7 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         } else {
              // If there's no audio, just reset the UI.
+            replyActive = false;
             recordBtn.disabled = false;
             recordBtn.classList.remove('processing');
             btnIcon.innerHTML = '<i class="fas fa-microphone"></i>';
@@ -314,9 +340,168 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Streaming playback setup; must start inside the click that opens the session (autoplay policy)
+    const setupPlayback = async () => {
+        if (playerNode || !window.AudioWorkletNode) return;
+        try {
+            playbackContext = new (window.AudioContext || window.webkitAudioContext)({ sampleRate: PLAYBACK_SAMPLE_RATE });
+            await playbackContext.audioWorklet.addModule('/static/playback-worklet.js');
+            playerNode = new AudioWorkletNode(playbackContext, 'stream-player', {
+                outputChannelCount: [1],
+                processorOptions: { jitterMs: PLAYBACK_JITTER_MS }
+            });
+            playerNode.port.onmessage = (event) => handlePlayerMessage(event.data);
+            playerNode.connect(playbackContext.destination);
+            if (playbackContext.state === 'suspended') await playbackContext.resume();
+        } catch (err) {
+            console.warn("Streaming playback unavailable, replies will play once complete:", err);
+            if (playbackContext) playbackContext.close();
+            playbackContext = playerNode = null;
+        }
+    };
+
+    // Offset of the PCM data in a WAV chunk (Murf sends a RIFF header at the start of a stream)
+    const wavDataOffset = (bytes) => {
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.length);
+        let offset = 12;
+        while (offset + 8 <= bytes.length) {
+            const id = String.fromCharCode(bytes[offset], bytes[offset + 1], bytes[offset + 2], bytes[offset + 3]);
+            if (id === 'data') return offset + 8;
+            offset += 8 + view.getUint32(offset + 4, true);
+        }
+        return Math.min(44, bytes.length);
+    };
+
+    // 16-bit little-endian PCM -> Float32 samples for the worklet
+    const feedPlayback = (buffer) => {
+        let bytes = new Uint8Array(buffer);
+        if (bytes.length >= 12 && String.fromCharCode(bytes[0], bytes[1], bytes[2], bytes[3]) === 'RIFF') {
+            bytes = bytes.subarray(wavDataOffset(bytes));
+        }
+        if (pcmCarry !== null) {
+            // A sample split across two chunks
+            const joined = new Uint8Array(bytes.length + 1);
+            joined[0] = pcmCarry;
+            joined.set(bytes, 1);
+            bytes = joined;
+            pcmCarry = null;
+        }
+        if (bytes.length % 2) {
+            pcmCarry = bytes[bytes.length - 1];
+            bytes = bytes.subarray(0, bytes.length - 1);
+        }
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.length);
+        const samples = new Float32Array(bytes.length / 2);
+        for (let i = 0; i < samples.length; i++) {
+            samples[i] = view.getInt16(i * 2, true) / 32768;
+        }
+        playerNode.port.postMessage({ type: "audio", samples }, [samples.buffer]);
+    };
+
+    // One audio chunk of the current reply, from either transport
+    const handleAudioChunk = (buffer, turnId) => {
+        if (discardAudio) return;
+        if (turnMetrics) {
+            turnMetrics.turnId = turnId;
+            turnMetrics.chunks++;
+            if (turnMetrics.firstChunkMs === null) {
+                turnMetrics.firstChunkMs = performance.now() - turnMetrics.endOfTurnAt;
+            }
+        }
+        if (playerNode) {
+            feedPlayback(buffer);
+        } else {
+            receivedAudioChunks.push(buffer);
+        }
+    };
+
+    const startTurnPlayback = () => {
+        turnMetrics = { endOfTurnAt: performance.now(), turnId: null, chunks: 0, firstChunkMs: null, ttfaMs: null, serverFirstAudioMs: null };
+        pcmCarry = null;
+        replyActive = true;
+        discardAudio = false;
+        if (playerNode) playerNode.port.postMessage({ type: "reset" });
+    };
+
+    // Stop the reply immediately: drop queued audio and anything still arriving for it
+    const flushReply = () => {
+        replyActive = false;
+        discardAudio = true;
+        turnMetrics = null;
+        pcmCarry = null;
+        if (playerNode) playerNode.port.postMessage({ type: "reset" });
+        if (audioPlaying) {
+            audioPlayer.pause();
+            audioPlaying = false;
+        }
+        receivedAudioChunks = [];
+        recordBtn.classList.remove('processing');
+        recordBtn.classList.add('recording');
+        btnIcon.innerHTML = '<i class="fas fa-stop"></i>';
+    };
+
+    // The user started talking over the reply: flush locally and have the server cancel it
+    const interruptReply = () => {
+        flushReply();
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ type: "Interrupt" }));
+        }
+    };
+
+    const handlePlayerMessage = (message) => {
+        if (message.type === "started") {
+            if (turnMetrics) turnMetrics.ttfaMs = performance.now() - turnMetrics.endOfTurnAt;
+            statusDisplay.innerHTML = `<i class="fas fa-volume-up"></i> Speaking...`;
+            statusDisplay.className = "status-success";
+        } else if (message.type === "drained") {
+            replyActive = false;
+            reportPlaybackMetrics(message.underruns);
+            console.log("✅ Streaming audio playback complete!");
+            statusDisplay.innerHTML = `<i class="fas fa-check-circle"></i> Audio response complete. Ready for next question.`;
+            statusDisplay.className = "status-success";
+            recordBtn.disabled = false;
+            recordBtn.classList.remove('processing');
+            btnIcon.innerHTML = '<i class="fas fa-microphone"></i>';
+        }
+    };
+
+    // Time-to-first-audio as the user heard it, sent back so the server can track it
+    const reportPlaybackMetrics = (underruns) => {
+        if (!turnMetrics || turnMetrics.ttfaMs === null) return;
+        const report = {
+            type: "PlaybackMetrics",
+            turn_id: turnMetrics.turnId,
+            ttfa_ms: Math.round(turnMetrics.ttfaMs),
+            first_chunk_ms: Math.round(turnMetrics.firstChunkMs),
+            server_first_audio_ms: turnMetrics.serverFirstAudioMs,
+            chunks: turnMetrics.chunks,
+            underruns: underruns,
+            jitter_ms: PLAYBACK_JITTER_MS
+        };
+        console.log("📈 Playback metrics:", report);
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(report));
+        }
+        turnMetrics = null;
+    };
+
+    // Capture hand-off latency since the last report, sent to the server once per user turn
+    const reportCaptureMetrics = () => {
+        if (!captureMetrics.frames || !socket || socket.readyState !== WebSocket.OPEN) return;
+        socket.send(JSON.stringify({
+            type: "CaptureMetrics",
+            frame_ms: CAPTURE_FRAME_MS,
+            frames: captureMetrics.frames,
+            handoff_ms_avg: captureMetrics.handoffTotal / captureMetrics.frames,
+            handoff_ms_max: captureMetrics.handoffMax
+        }));
+        captureMetrics = { frames: 0, handoffTotal: 0, handoffMax: 0 };
+    };
+
     // Audio player event listener
     audioPlayer.onended = () => {
         audioPlaying = false;
+        replyActive = false;
         if (audioPlayer.src.startsWith('blob:')) {
             URL.revokeObjectURL(audioPlayer.src);
         }
@@ -354,10 +539,12 @@ document.addEventListener('DOMContentLoaded', () => {
             // === FIX START ===
             // Determine WebSocket protocol based on page protocol (http vs https)
             const protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
-            const wsUrl = `${protocol}${window.location.host}/ws?assemblyai_key=${encodeURIComponent(apiKeys.assemblyai)}&murf_key=${encodeURIComponent(apiKeys.murf)}&gemini_key=${encodeURIComponent(apiKeys.gemini)}&tmdb_key=${encodeURIComponent(apiKeys.tmdb || '')}`;
+            const wsUrl = `${protocol}${window.location.host}/ws?assemblyai_key=${encodeURIComponent(apiKeys.assemblyai)}&murf_key=${encodeURIComponent(apiKeys.murf)}&gemini_key=${encodeURIComponent(apiKeys.gemini)}&tmdb_key=${encodeURIComponent(apiKeys.tmdb || '')}&audio_transport=binary`;
             // === FIX END ===
             
+            await setupPlayback();
             socket = new WebSocket(wsUrl);
+            socket.binaryType = "arraybuffer";
 
             socket.onopen = async () => {
                 console.log("WebSocket connection established for streaming.");
@@ -372,21 +559,43 @@ document.addEventListener('DOMContentLoaded', () => {
                     }
 
                     const inputSampleRate = audioContext.sampleRate;
-                    const outputSampleRate = 16000;
+                    const outputSampleRate = CAPTURE_SAMPLE_RATE;
                     mediaStreamSource = audioContext.createMediaStreamSource(stream);
-                    const bufferSize = 4096;
-                    scriptProcessor = audioContext.createScriptProcessor(bufferSize, 1, 1);
-
-                    scriptProcessor.onaudioprocess = (e) => {
-                        const inputData = e.inputBuffer.getChannelData(0);
-                        const downsampledData = downsampleBuffer(inputData, inputSampleRate, outputSampleRate);
-                        const pcmData = to16BitPCM(downsampledData);
-                        if (socket.readyState === WebSocket.OPEN) {
-                            socket.send(pcmData.buffer);
-                        }
-                    };
-                    mediaStreamSource.connect(scriptProcessor);
-                    scriptProcessor.connect(audioContext.destination);
+                    if (window.AudioWorkletNode) {
+                        await audioContext.audioWorklet.addModule('/static/capture-worklet.js');
+                        captureNode = new AudioWorkletNode(audioContext, 'pcm-capture', {
+                            numberOfOutputs: 0,
+                            processorOptions: { targetRate: outputSampleRate, frameMs: CAPTURE_FRAME_MS }
+                        });
+                        captureNode.port.onmessage = (event) => {
+                            const { buffer, endTime } = event.data;
+                            if (socket.readyState === WebSocket.OPEN) {
+                                socket.send(buffer);
+                            }
+                            // Time from the frame's last sample to it being handed to the socket
+                            const handoffMs = (audioContext.currentTime - endTime) * 1000;
+                            captureMetrics.frames++;
+                            captureMetrics.handoffTotal += handoffMs;
+                            captureMetrics.handoffMax = Math.max(captureMetrics.handoffMax, handoffMs);
+                            captureNode.port.postMessage({ type: "recycle", buffer }, [buffer]);
+                        };
+                        mediaStreamSource.connect(captureNode);
+                    } else {
+                        // Older browsers: ScriptProcessorNode on the main thread
+                        const bufferSize = 4096;
+                        scriptProcessor = audioContext.createScriptProcessor(bufferSize, 1, 1);
+
+                        scriptProcessor.onaudioprocess = (e) => {
+                            const inputData = e.inputBuffer.getChannelData(0);
+                            const downsampledData = downsampleBuffer(inputData, inputSampleRate, outputSampleRate);
+                            const pcmData = to16BitPCM(downsampledData);
+                            if (socket.readyState === WebSocket.OPEN) {
+                                socket.send(pcmData.buffer);
+                            }
+                        };
+                        mediaStreamSource.connect(scriptProcessor);
+                        scriptProcessor.connect(audioContext.destination);
+                    }
 
                     recordBtn.disabled = true; // Button is disabled while setting up
                     recordBtn.classList.add('recording');
@@ -403,8 +612,29 @@ document.addEventListener('DOMContentLoaded', () => {
             };
 
             socket.onmessage = (event) => {
+                if (event.data instanceof ArrayBuffer) {
+                    handleAudioFrame(event.data);
+                    return;
+                }
                 const data = JSON.parse(event.data);
                 switch (data.type) {
+                    case "SessionConfig":
+                        audioTransport = data.audio_transport;
+                        console.log(`🔧 Audio transport: ${audioTransport}`);
+                        break;
+
+                    case "SpeechStarted":
+                        // Server-side VAD heard speech; AssemblyAI's transcript follows later
+                        if (replyActive) interruptReply();
+                        statusDisplay.innerHTML = `<i class="fas fa-wave-square"></i> Listening...`;
+                        statusDisplay.className = "status-success";
+                        break;
+
+                    case "SpeechEnded":
+                        statusDisplay.innerHTML = `<i class="fas fa-hourglass-half"></i> Finishing your turn...`;
+                        statusDisplay.className = "";
+                        break;
+
                     case "EndOfTurnTranscript":
                         userTranscript = data.text;
                         if (userTranscript.trim()) {
@@ -419,6 +649,8 @@ document.addEventListener('DOMContentLoaded', () => {
                         llmResponse = "";
                         receivedAudioChunks = [];
                         combinedAudioBlob = null;
+                        startTurnPlayback();
+                        reportCaptureMetrics();
                         recordBtn.classList.remove('recording');
                         recordBtn.classList.add('processing');
                         btnIcon.innerHTML = '<i class="fas fa-sync-alt"></i>';
@@ -455,13 +687,24 @@ document.addEventListener('DOMContentLoaded', () => {
                             for (let i = 0; i < audioData.length; i++) {
                                 audioBytes[i] = audioData.charCodeAt(i);
                             }
-                            receivedAudioChunks.push(audioBytes.buffer);
+                            handleAudioChunk(audioBytes.buffer, data.turn_id);
                         }
                         break;
                     
+                    case "TurnCancelled":
+                        console.log(`✋ Reply cancelled (${data.reason}) in ${data.cancel_ms} ms`);
+                        flushReply();
+                        break;
+
                     case "MurfStreamComplete":
+                        if (discardAudio) break;
                         console.log(`🎉 Murf audio streaming complete!`);
-                        playFinalAudio();
+                        if (playerNode) {
+                            if (turnMetrics) turnMetrics.serverFirstAudioMs = data.first_audio_ms;
+                            playerNode.port.postMessage({ type: "end" });
+                        } else {
+                            playFinalAudio();
+                        }
                         break;
 
                     case "APIKeyError":
@@ -498,6 +741,23 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // Binary Murf audio frame: header + raw WAV bytes, no base64 decode needed
+    const handleAudioFrame = (buffer) => {
+        if (buffer.byteLength <= AUDIO_FRAME_HEADER_BYTES) return;
+        const header = new DataView(buffer, 0, AUDIO_FRAME_HEADER_BYTES);
+        if (header.getUint8(0) !== 1) {
+            console.warn("Unknown audio frame version:", header.getUint8(0));
+            return;
+        }
+        const turnId = header.getUint32(4);
+        if (currentAudioTurn !== turnId) {
+            // First frame of a new reply: drop anything left over from the previous one
+            currentAudioTurn = turnId;
+            receivedAudioChunks = [];
+        }
+        handleAudioChunk(buffer.slice(AUDIO_FRAME_HEADER_BYTES), turnId);
+    };
+
     // Stop streaming
     const stopStreaming = () => {
         console.log("⏹️ Stopping audio stream from microphone.");
@@ -510,10 +770,13 @@ document.addEventListener('DOMContentLoaded', () => {
     // Clean up resources
     const cleanUp = () => {
         if (scriptProcessor) scriptProcessor.disconnect();
+        if (captureNode) captureNode.port.onmessage = null;
         if (mediaStreamSource) mediaStreamSource.disconnect();
         if (audioContext) audioContext.close();
+        if (playbackContext) playbackContext.close();
         if (stream) stream.getTracks().forEach(track => track.stop());
-        scriptProcessor = mediaStreamSource = audioContext = stream = null;
+        scriptProcessor = captureNode = mediaStreamSource = audioContext = stream = null;
+        playbackContext = playerNode = null;
         recordBtn.disabled = false;
         recordBtn.classList.remove('recording', 'processing');
         btnIcon.innerHTML = '<i class="fas fa-microphone"></i>';
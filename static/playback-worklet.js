@@ -0,0 +1,113 @@
+// AudioWorklet that plays Murf PCM as it arrives.
+// Samples are queued in a growable ring buffer; playback starts (and restarts after
+// an underrun) only once `jitterMs` of audio is buffered, or the stream has ended.
+class StreamPlayerProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = (options && options.processorOptions) || {};
+        this.jitterSamples = Math.round(((opts.jitterMs || 120) / 1000) * sampleRate);
+        this.buffer = new Float32Array(sampleRate * 10);
+        this.readIndex = 0;
+        this.available = 0;
+        this.playing = false;
+        this.ended = false;
+        this.started = false;
+        this.underruns = 0;
+        this.dry = false;
+        this.port.onmessage = (event) => this.handleMessage(event.data);
+    }
+
+    handleMessage(message) {
+        switch (message.type) {
+            case "audio":
+                this.push(message.samples);
+                break;
+            case "end":
+                this.ended = true;
+                break;
+            case "reset":
+                // New turn (or barge-in): drop whatever is still queued
+                this.readIndex = 0;
+                this.available = 0;
+                this.playing = false;
+                this.ended = false;
+                this.started = false;
+                this.underruns = 0;
+                this.dry = false;
+                break;
+        }
+    }
+
+    push(samples) {
+        if (this.dry) {
+            // More audio after the buffer ran dry: playback really stalled mid-reply
+            this.underruns++;
+            this.dry = false;
+        }
+        if (this.available + samples.length > this.buffer.length) {
+            // Murf renders faster than real time, so a whole reply may queue up: grow instead of dropping
+            let capacity = this.buffer.length * 2;
+            while (capacity < this.available + samples.length) capacity *= 2;
+            const grown = new Float32Array(capacity);
+            for (let i = 0; i < this.available; i++) {
+                grown[i] = this.buffer[(this.readIndex + i) % this.buffer.length];
+            }
+            this.buffer = grown;
+            this.readIndex = 0;
+        }
+        let writeIndex = (this.readIndex + this.available) % this.buffer.length;
+        const firstPart = Math.min(samples.length, this.buffer.length - writeIndex);
+        this.buffer.set(samples.subarray(0, firstPart), writeIndex);
+        this.buffer.set(samples.subarray(firstPart), 0);
+        this.available += samples.length;
+    }
+
+    finish() {
+        this.ended = false;
+        this.started = false;
+        this.dry = false;
+        this.port.postMessage({ type: "drained", underruns: this.underruns });
+        this.underruns = 0;
+    }
+
+    process(inputs, outputs) {
+        const output = outputs[0][0];
+        if (!this.playing) {
+            if (this.available >= this.jitterSamples || (this.ended && this.available > 0)) {
+                this.playing = true;
+                if (!this.started) {
+                    this.started = true;
+                    this.port.postMessage({ type: "started", bufferedMs: (this.available / sampleRate) * 1000 });
+                }
+            } else {
+                if (this.ended && this.started) {
+                    // The end arrived after the buffer had already run dry
+                    this.finish();
+                }
+                output.fill(0);
+                return true;
+            }
+        }
+
+        const count = Math.min(output.length, this.available);
+        for (let i = 0; i < count; i++) {
+            output[i] = this.buffer[this.readIndex];
+            this.readIndex = (this.readIndex + 1) % this.buffer.length;
+        }
+        output.fill(0, count);
+        this.available -= count;
+
+        if (this.available === 0) {
+            this.playing = false;
+            if (this.ended) {
+                this.finish();
+            } else {
+                // Go back to buffering until the jitter buffer refills (or the end arrives)
+                this.dry = true;
+            }
+        }
+        return true;
+    }
+}
+
+registerProcessor("stream-player", StreamPlayerProcessor);
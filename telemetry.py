@@ -0,0 +1,175 @@
+import bisect
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+logger = logging.getLogger("voice_agent.telemetry")
+
+
+# Latency bucket bounds in seconds, from a fast skill reply to a slow Gemini + Murf turn
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+# Stages of a reply, marked as offsets from the end of the user's speech (AssemblyAI's final turn)
+TURN_STAGES = ("intent_routed", "llm_first_token", "llm_complete", "murf_connected", "first_audio", "last_audio")
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields (session_id, turn_id, ...) at top level"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(name: str, level: str = "INFO", fmt: str = "text"):
+    """Logger whose records are written by a background thread, so the event loop never blocks on stdout.
+
+    Returns (logger, listener); stop the listener on shutdown to flush what's queued.
+    """
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler)
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    listener.start()
+    return logger, listener
+
+
+class Histogram:
+    """Prometheus-style histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+        series["sum"] += value
+        series["count"] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            labels = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series["counts"]):
+                cumulative += count
+                bucket_labels = ",".join(labels + [f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f'{{{",".join(labels)}}}' if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {series['sum']}")
+            lines.append(f"{self.name}_count{suffix} {series['count']}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            labels = ",".join(f'{name}="{v}"' for name, v in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+class TurnTrace:
+    """Timeline of one reply turn: stage name -> seconds since the user's speech ended"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turn_id = None
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.marks = {}
+
+    def mark(self, stage: str):
+        # First occurrence wins (e.g. the first of many audio chunks)
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter() - self.started
+
+    def ms(self, stage: str):
+        return round(self.marks[stage] * 1000, 1) if stage in self.marks else None
+
+
+class TurnTelemetry:
+    """Turns finished TurnTraces into Prometheus histograms, a structured log line and (optionally) OTel spans"""
+
+    def __init__(self, logger: logging.Logger, tracer=None):
+        self.logger = logger
+        self.tracer = tracer
+        self.stage_seconds = Histogram(
+            "voice_turn_stage_seconds", "Time from the end of user speech to each reply stage", ["stage"])
+        self.turns = Counter("voice_turns_total", "Reply turns by outcome", ["outcome"])
+
+    def start(self, session_id: str) -> TurnTrace:
+        return TurnTrace(session_id)
+
+    def finish(self, trace: TurnTrace, outcome: str):
+        for stage, seconds in trace.marks.items():
+            self.stage_seconds.observe(seconds, stage=stage)
+        self.turns.inc(outcome=outcome)
+        self.logger.info(
+            f"⏱️ [Turn] {trace.session_id} turn {trace.turn_id} {outcome}: first audio {trace.ms('first_audio')} ms",
+            extra={"event": "turn", "session_id": trace.session_id, "turn_id": trace.turn_id, "outcome": outcome,
+                   **{f"{stage}_ms": trace.ms(stage) for stage in TURN_STAGES}})
+        if self.tracer is not None:
+            self._export_span(trace, outcome)
+
+    def _export_span(self, trace: TurnTrace, outcome: str):
+        # Spans are written after the fact, with the stages as timestamped events
+        end_ns = trace.started_ns + int(max(trace.marks.values(), default=0) * 1e9)
+        span = self.tracer.start_span("voice.turn", start_time=trace.started_ns, attributes={
+            "session.id": trace.session_id, "turn.id": trace.turn_id or 0, "turn.outcome": outcome})
+        for stage, seconds in sorted(trace.marks.items(), key=lambda item: item[1]):
+            span.add_event(stage, timestamp=trace.started_ns + int(seconds * 1e9))
+        span.end(end_time=end_ns)
+
+    def render(self) -> list:
+        return self.stage_seconds.render() + self.turns.render()
+
+
+def create_tracer(service_name: str):
+    """OpenTelemetry tracer if the API is installed; exporters are configured the usual OTel way (env / SDK)"""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("⚠️ [Telemetry] opentelemetry-api not installed, traces disabled")
+        return None
+    return trace.get_tracer(service_name)
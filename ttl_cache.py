@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("voice_agent.ttl_cache")
+
+
+def approx_size(value, _seen=None) -> int:
+    """Rough deep size in bytes of JSON-like data (dicts, lists, strings, numbers)"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k, _seen) + approx_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approx_size(v, _seen) for v in value)
+    return size
+
+
+class SqliteCacheBackend:
+    """On-disk second tier so cached entries survive restarts (values must be JSON-serializable)"""
+
+    def __init__(self, path: str, max_rows: int = 10000):
+        self.path = path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value, expires_at: float):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self.conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,)
+            )
+            self.conn.commit()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache")
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class AsyncTTLCache:
+    """Bounded in-memory cache with TTL, LRU eviction and single-flight fetches.
+
+    ``get_or_fetch`` returns a fresh cached value if there is one; otherwise it
+    runs ``fetch`` once per key no matter how many callers ask concurrently.
+    Values for which ``is_negative`` is true (e.g. "not found") are kept for the
+    shorter ``negative_ttl``. A fetch that raises is not cached. With a
+    ``backend`` (see SqliteCacheBackend) misses fall through to disk before
+    going upstream, and new entries are written through.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, negative_ttl: float = 300.0, backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.negative_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get_fresh(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, negative = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, expires_at, negative):
+        self.entries[key] = (value, expires_at, negative)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key: str, fetch, is_negative=lambda value: False):
+        entry = self._get_fresh(key)
+        if entry is not None:
+            self.hits += 1
+            if entry[2]:
+                self.negative_hits += 1
+            return entry[0]
+
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        # The fetch runs as its own task so a cancelled caller doesn't cancel it for the others
+        task = asyncio.ensure_future(self._load(key, fetch, is_negative))
+        self.inflight[key] = task
+        task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key, fetch, is_negative):
+        if self.backend is not None:
+            stored = await asyncio.to_thread(self.backend.get, key)
+            if stored is not None:
+                value, expires_at = stored
+                self.backend_hits += 1
+                self.hits += 1
+                self._store(key, value, expires_at, is_negative(value))
+                return value
+
+        self.misses += 1
+        value = await fetch()
+        negative = is_negative(value)
+        expires_at = time.time() + (self.negative_ttl if negative else self.ttl)
+        self._store(key, value, expires_at, negative)
+        if self.backend is not None:
+            try:
+                await asyncio.to_thread(self.backend.set, key, value, expires_at)
+            except Exception as e:
+                logger.error(f"❌ [Cache] Failed to persist entry: {e}")
+        return value
+
+    def invalidate(self, key: str):
+        self.entries.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        self.entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        # Callers that joined an in-flight fetch didn't go upstream either, so they count as hits
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "backend_hits": self.backend_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "memory_bytes": approx_size(self.entries),
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+        }
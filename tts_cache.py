@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from collections import OrderedDict
+
+
+# Cache keys are sha256 hex digests; anything else never touches the filesystem
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def pack_chunks(chunks) -> bytes:
+    """Length-prefixed audio chunks, so a streamed reply replays with its original chunking"""
+    return b"".join(struct.pack(">I", len(chunk)) + chunk for chunk in chunks)
+
+
+def iter_chunks(buffer):
+    offset = 0
+    while offset + 4 <= len(buffer):
+        (size,) = struct.unpack_from(">I", buffer, offset)
+        offset += 4
+        yield buffer[offset:offset + size]
+        offset += size
+
+
+class AudioCache:
+    """Synthesized speech on local disk, addressed by a hash of (text, voice config, audio format).
+
+    One file per entry under ``directory``; writes go to a temp file that is
+    renamed into place, so readers only ever see complete audio. Entries are
+    read through read-only memory maps, letting the OS page cache hold the
+    hot phrases. The least recently used entries are deleted once the total
+    size passes ``max_bytes``; file mtimes carry that order across restarts.
+    On the event loop use ``aopen``/``aput``, which do the file I/O in a
+    worker thread and only touch the index on the loop.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.by_kind = {}  # kind -> [hits, misses]
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def make_key(text: str, voice_config: dict, audio_format: str) -> str:
+        payload = json.dumps({"text": " ".join(text.split()), "voice": voice_config, "format": audio_format},
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"invalid audio cache key: {key!r}")
+        return os.path.join(self.directory, key[:2], f"{key}.audio")
+
+    def _load(self):
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Left behind by a write that never finished
+                    os.remove(path)
+                    continue
+                key, ext = os.path.splitext(name)
+                if ext == ".audio" and KEY_PATTERN.fullmatch(key):
+                    st = os.stat(path)
+                    found.append((st.st_mtime, key, st.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.bytes += size
+        self._delete(self._evict())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def lookup(self, key: str, kind: str = "other") -> bool:
+        """Whether the audio is cached (counted towards the hit rate and marked as recently used)"""
+        counts = self.by_kind.setdefault(kind, [0, 0])
+        if key in self.entries:
+            try:
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                self._forget(key)
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                counts[0] += 1
+                return True
+        self.misses += 1
+        counts[1] += 1
+        return False
+
+    def open(self, key: str):
+        """Read-only memory map of the entry, or None; close it (or use it in a with block) when done"""
+        audio = self._map(key)
+        if audio is None:
+            self._forget(key)
+        return audio
+
+    async def aopen(self, key: str):
+        audio = await asyncio.to_thread(self._map, key)
+        if audio is None:
+            self._forget(key)
+        return audio
+
+    def _map(self, key: str):
+        try:
+            with open(self.path(key), "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, data: bytes):
+        if not data or len(data) > self.max_bytes:
+            return
+        self._write(key, data)
+        self._delete(self._record(key, len(data)))
+
+    async def aput(self, key: str, data: bytes):
+        if not data or len(data) > self.max_bytes:
+            return
+        await asyncio.to_thread(self._write, key, data)
+        evicted = self._record(key, len(data))
+        if evicted:
+            await asyncio.to_thread(self._delete, evicted)
+
+    def _write(self, key: str, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _record(self, key: str, size: int) -> list:
+        """Index a stored entry; returns the keys evicted to make room, whose files still have to be deleted"""
+        self.bytes += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        self.stores += 1
+        return self._evict()
+
+    def _forget(self, key: str):
+        size = self.entries.pop(key, None)
+        if size is not None:
+            self.bytes -= size
+
+    def _evict(self) -> list:
+        evicted = []
+        while self.bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            evicted.append(key)
+        return evicted
+
+    def _delete(self, keys: list):
+        for key in keys:
+            # Stored again since it was evicted: the file is the new entry's
+            if key in self.entries:
+                continue
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "by_kind": {kind: {"hits": hits, "misses": misses} for kind, (hits, misses) in self.by_kind.items()},
+        }
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("voice_agent.turn_scheduler")
+
+
+class TurnStats:
+    """Totals across sessions for reply turns and barge-in cancellations"""
+
+    def __init__(self):
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.cancel_ms_total = 0.0
+        self.cancel_ms_max = 0.0
+        self.slow_cancels = 0
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "cancel_ms_avg": round(self.cancel_ms_total / self.cancelled, 2) if self.cancelled else 0.0,
+            "cancel_ms_max": round(self.cancel_ms_max, 2),
+            "slow_cancels": self.slow_cancels,
+        }
+
+
+class TurnScheduler:
+    """Runs one session's replies as cancellable tasks, one at a time, newest wins.
+
+    ``start`` returns as soon as the reply task is created, so the caller (the
+    AssemblyAI reader) keeps receiving messages while a reply is generated and
+    spoken. Starting a new turn, or calling ``interrupt``, cancels the running
+    reply and waits for it to unwind: the Gemini stream is abandoned and the
+    Murf context cleared by their own cleanup, and nothing from the old reply
+    can reach the client after ``interrupt`` returns. A cleanup that hangs is
+    given up on after ``cancel_timeout`` seconds.
+    """
+
+    def __init__(self, session_id: str, cancel_timeout: float = 2.0, stats: TurnStats = None):
+        self.session_id = session_id
+        self.cancel_timeout = cancel_timeout
+        self.stats = stats or TurnStats()
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def start(self, fn, *args, **kwargs):
+        """Cancel the running reply (if any) and run fn(*args, **kwargs) as the new one"""
+        async with self.lock:
+            await self._cancel()
+            self.stats.started += 1
+            self.task = asyncio.create_task(self._run(fn, *args, **kwargs))
+
+    async def interrupt(self):
+        """Cancel the running reply; returns how long it took in ms, or None if idle"""
+        async with self.lock:
+            return await self._cancel()
+
+    async def close(self):
+        await self.interrupt()
+
+    async def _cancel(self):
+        if not self.busy:
+            return None
+        started = time.perf_counter()
+        self.task.cancel()
+        done, _ = await asyncio.wait({self.task}, timeout=self.cancel_timeout)
+        if not done:
+            self.stats.slow_cancels += 1
+            logger.warning(f"⚠️ [Turns] Reply for {self.session_id} still unwinding after {self.cancel_timeout}s",
+                           extra={"session_id": self.session_id})
+        cancel_ms = (time.perf_counter() - started) * 1000
+        self.stats.cancelled += 1
+        self.stats.cancel_ms_total += cancel_ms
+        self.stats.cancel_ms_max = max(self.stats.cancel_ms_max, cancel_ms)
+        self.task = None
+        return cancel_ms
+
+    async def _run(self, fn, *args, **kwargs):
+        try:
+            await fn(*args, **kwargs)
+            self.stats.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats.failed += 1
+            logger.error(f"❌ [Turns] Reply for {self.session_id} failed: {e}", extra={"session_id": self.session_id})
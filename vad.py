@@ -0,0 +1,126 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class VadStats:
+    """Totals across sessions for the silence gate in front of AssemblyAI"""
+
+    def __init__(self):
+        self.streams = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.speech_segments = 0
+        self.forced_endpoints = 0
+        self.process_ms = 0.0
+
+    def stats(self) -> dict:
+        audio_seconds = self.bytes_in / 32000
+        return {
+            "streams": self.streams,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "saved_ratio": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+            "speech_segments": self.speech_segments,
+            "forced_endpoints": self.forced_endpoints,
+            "cpu_ms_per_audio_s": round(self.process_ms / audio_seconds, 3) if audio_seconds else 0.0,
+        }
+
+
+class VoiceActivityGate:
+    """Energy/zero-crossing VAD over 16-bit PCM that only lets speech through.
+
+    Audio is cut into ``frame_ms`` frames (vectorised with NumPy, so a whole
+    chunk is classified at once). A frame counts as speech when its RMS is
+    ``snr_db`` above a noise floor tracked from the quietest recent frames (and above ``min_rms``), or is
+    moderately loud with a zero-crossing rate typical of fricatives. Speech
+    starts after ``start_ms`` of speech frames and ends after ``hangover_ms``
+    without any; the last ``preroll_ms`` of silence is kept and sent along
+    when speech starts, so word onsets aren't clipped. Everything else is
+    dropped. ``process`` returns the bytes to forward plus any
+    ``("speech_start" | "speech_end", stream_ms)`` events.
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, snr_db: float = 10.0, min_rms: float = 200.0,
+                 start_ms: int = 60, hangover_ms: int = 1000, preroll_ms: int = 300, stats: VadStats = None):
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.frame_ms = frame_ms
+        self.snr = 10 ** (snr_db / 20)
+        self.fricative_snr = 10 ** (snr_db / 40)
+        self.floor_rise = 1.3 ** (frame_ms / 1000)
+        self.min_rms = min_rms
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.preroll = deque(maxlen=max(1, preroll_ms // frame_ms))
+        self.noise_rms = None
+        self.remainder = b""
+        self.speaking = False
+        self.speech_run = 0
+        self.silence_run = 0
+        self.frames_seen = 0
+        self.stats = stats or VadStats()
+        self.stats.streams += 1
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Speech/non-speech per row of a (n_frames, frame_samples) int16 array"""
+        samples = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_samples
+        if self.noise_rms is None:
+            self.noise_rms = max(float(rms.min()), 1.0)
+        threshold = max(self.min_rms, self.noise_rms * self.snr)
+        loud = rms > threshold
+        # Fricatives ("s", "sh") are quiet but noisy: accept them at half the margin over the floor.
+        # Background hiss has a high zero-crossing rate too, but stays close to the floor
+        fricative = (rms > max(self.min_rms / 2, self.noise_rms * self.fricative_snr)) & (zcr > 0.25)
+        # Minimum statistics: the floor drops quickly to quieter frames and creeps up
+        # slowly (~30%/s), so gaps between syllables keep it pinned to the background
+        quietest = float(rms.min())
+        if quietest < self.noise_rms:
+            self.noise_rms = 0.8 * self.noise_rms + 0.2 * quietest
+        else:
+            self.noise_rms *= self.floor_rise ** len(rms)
+        return loud | fricative
+
+    def process(self, chunk: bytes):
+        started = time.perf_counter()
+        self.stats.bytes_in += len(chunk)
+        data = self.remainder + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self.remainder = data[usable:]
+        if not usable:
+            self.stats.process_ms += (time.perf_counter() - started) * 1000
+            return b"", []
+        frames = np.frombuffer(data[:usable], dtype="<i2").reshape(-1, self.frame_samples)
+        speech = self.classify(frames)
+
+        out = []
+        events = []
+        for index, is_speech in enumerate(speech.tolist()):
+            frame = data[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            self.frames_seen += 1
+            if self.speaking:
+                out.append(frame)
+                self.silence_run = 0 if is_speech else self.silence_run + 1
+                if self.silence_run >= self.hangover_frames:
+                    self.speaking = False
+                    self.speech_run = 0
+                    events.append(("speech_end", self.frames_seen * self.frame_ms))
+                continue
+            self.speech_run = self.speech_run + 1 if is_speech else 0
+            self.preroll.append(frame)
+            if self.speech_run >= self.start_frames:
+                self.speaking = True
+                self.silence_run = 0
+                self.stats.speech_segments += 1
+                out.extend(self.preroll)
+                self.preroll.clear()
+                events.append(("speech_start", (self.frames_seen - self.speech_run) * self.frame_ms))
+
+        forwarded = b"".join(out)
+        self.stats.bytes_out += len(forwarded)
+        self.stats.process_ms += (time.perf_counter() - started) * 1000
+        return forwarded, events